@@ -0,0 +1,58 @@
+# Start-up time of the command-line tool, against a bare interpreter and the
+# GUI modules it avoids. Each command runs in a fresh interpreter; the median
+# of --runs runs is reported.
+#
+#   python -m benchmarks.bench_cli_startup [--runs 10]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.pyufodb import Relative_DB
+
+
+def time_command(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, result.stderr.decode(errors="replace").strip().splitlines()[-1]
+    return statistics.median(times), ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.ufo")
+        db = Relative_DB()
+        db.create_table("sightings", ["city", "shape", "duration"], {"duration": "int"})
+        db.insert_many("sightings", [{"city": f"c{i % 100}", "shape": "disk", "duration": i} for i in range(10_000)])
+        db.save_to_file(path, version=2)
+
+        cases = [
+            ("python -c pass", ["-c", "pass"]),
+            ("cli --help", ["-m", "src.cli", "--help"]),
+            ("cli stats (10k rows)", ["-m", "src.cli", "stats", path]),
+            ("cli query (10k rows)", ["-m", "src.cli", "query", path,
+                                      "SELECT city, COUNT(*) FROM sightings GROUP BY city"]),
+            ("import src.ui (GUI)", ["-c", "import src.ui"]),
+        ]
+        print(f"{'command':<24} | {'median ms':>9}")
+        for name, command in cases:
+            elapsed, error = time_command(command, args.runs)
+            if elapsed is None:
+                print(f"{name:<24} | {'n/a':>9}  ({error})")
+            else:
+                print(f"{name:<24} | {elapsed * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Stress-checks ConcurrentDB and measures its throughput with 1, 4 and 8
+# threads, for a read-heavy mix on one shared table and for writers that each
+# own a table.
+#
+#   python -m benchmarks.bench_concurrency [--threads 1 4 8] [--ops 20000] [--rows 100000]
+#   python -m benchmarks.bench_concurrency --stress-seconds 5
+#
+# CPython runs one thread at a time, so more threads do not add throughput;
+# the numbers show what the locking costs and that readers and writers keep
+# making progress side by side.
+import argparse
+import random
+import threading
+import time
+
+from src.concurrency import ConcurrentDB
+
+ACCOUNTS = 100
+BALANCE = 1000
+
+
+def run_threads(count, target):
+    errors = []
+
+    def guarded(i):
+        try:
+            target(i)
+        except Exception as e:  # reported after join
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def stress(seconds, threads):
+    # Transfers move money between accounts inside transactions, so the total
+    # never changes; readers check it through locked reads and snapshots while
+    # other threads insert and delete events.
+    db = ConcurrentDB()
+    db.create_table("accounts", ["owner", "balance"], {"balance": "int"})
+    db.insert_many("accounts", [{"owner": f"o{i}", "balance": BALANCE} for i in range(ACCOUNTS)])
+    db.create_table("events", ["kind", "n"], {"n": "int"})
+    db.create_index("events", "kind")
+    deadline = time.perf_counter() + seconds
+    inserted = [0] * threads
+    deleted = [0] * threads
+    checks = [0] * threads
+
+    def transfer(_):
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            a, b = rng.sample(range(1, ACCOUNTS + 1), 2)
+            amount = rng.randint(1, 50)
+            with db.transaction() as tx:
+                table = tx.tables["accounts"]
+                tx.update("accounts", a, {"balance": table.get_record(a).get_value("balance") - amount})
+                tx.update("accounts", b, {"balance": table.get_record(b).get_value("balance") + amount})
+
+    def ingest(i):
+        rng = random.Random(i)
+        while time.perf_counter() < deadline:
+            record_id = db.insert("events", {"kind": rng.choice("abc"), "n": inserted[i]})
+            inserted[i] += 1
+            if rng.random() < 0.3 and db.delete_record("events", record_id):
+                deleted[i] += 1
+
+    def read(i):
+        while time.perf_counter() < deadline:
+            total = db.aggregate("accounts", ["SUM(balance)"]).rows[0][0]
+            assert total == ACCOUNTS * BALANCE, f"locked read saw a total of {total}"
+            # Dropped at once: until then the next write to the table copies it.
+            snapshot = db.snapshot(["accounts"])
+            total = snapshot.aggregate("accounts", ["SUM(balance)"]).rows[0][0]
+            del snapshot
+            assert total == ACCOUNTS * BALANCE, f"snapshot saw a total of {total}"
+            rows = db.query("SELECT kind, n FROM events WHERE kind = 'a'").rows
+            assert all(kind == "a" for kind, _ in rows)
+            checks[i] += 1
+
+    roles = [transfer, ingest, read]
+    run_threads(threads, lambda i: roles[i % len(roles)](i))
+    expected = sum(inserted) - sum(deleted)
+    assert db.count("events") == expected, f"{db.count('events')} events, expected {expected}"
+    assert db.aggregate("accounts", ["SUM(balance)"]).rows[0][0] == ACCOUNTS * BALANCE
+    print(f"stress: {threads} threads, {seconds}s, {sum(inserted)} inserts, {sum(deleted)} deletes, "
+          f"{sum(checks)} consistency checks passed")
+
+
+def bench_shared_table(threads, ops, rows):
+    # 90% point reads, 10% updates, all on one table.
+    db = ConcurrentDB()
+    db.create_table("bench", ["name", "value"], {"value": "int"})
+    db.insert_many("bench", [{"name": f"n{i}", "value": i} for i in range(rows)])
+    per_thread = ops // threads
+
+    def work(i):
+        rng = random.Random(i)
+        for _ in range(per_thread):
+            record_id = rng.randint(1, rows)
+            if rng.random() < 0.1:
+                db.update("bench", record_id, {"value": rng.randint(0, rows)})
+            else:
+                db.get_record("bench", record_id)
+
+    start = time.perf_counter()
+    run_threads(threads, work)
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def bench_table_per_writer(threads, ops):
+    db = ConcurrentDB()
+    for i in range(threads):
+        db.create_table(f"t{i}", ["name", "value"], {"value": "int"})
+    per_thread = ops // threads
+
+    def work(i):
+        for j in range(per_thread):
+            db.insert(f"t{i}", {"name": f"n{j}", "value": j})
+
+    start = time.perf_counter()
+    run_threads(threads, work)
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--stress-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    stress(args.stress_seconds, max(args.threads + [3]))
+    print(f"{'threads':>7} | {'shared table ops/s':>18} | {'table per writer ops/s':>22}")
+    for threads in args.threads:
+        shared = bench_shared_table(threads, args.ops, args.rows)
+        separate = bench_table_per_writer(threads, args.ops)
+        print(f"{threads:>7} | {shared:>18,.0f} | {separate:>22,.0f}")
+
+
+if __name__ == "__main__":
+    main()
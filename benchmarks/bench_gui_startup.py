@@ -0,0 +1,124 @@
+# Time to first window of the GUI: each run starts a fresh interpreter that
+# imports src.menu, builds StartWindow and waits until it is drawn. Reports
+# the median import, build and total time (from process launch), and which
+# heavy modules got imported before the window was up.
+#
+#   python -m benchmarks.bench_gui_startup [--runs 5] [--cold] [--record startup.jsonl]
+#
+# --cold removes the cached splash image before the first run and reports that
+# run on its own. --record appends the medians to a JSON-lines file and
+# compares them with the previous entry; the exit status is 1 when the time to
+# first window grew by more than --tolerance percent. Building the window needs
+# a display; without one only the import is measured.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Should stay out of start-up; each is imported when its feature is first used.
+HEAVY_MODULES = ["gradio_client", "src.ai", "src.account", "src.ui", "src.dbEditor", "src.query"]
+
+CHILD = """
+import json, sys, time
+launched = float(sys.argv[1])
+start = time.perf_counter()
+import src.menu
+result = {"import": time.perf_counter() - start, "build": None, "first_window": None,
+          "eager": [name for name in sys.argv[2:] if name in sys.modules]}
+try:
+    start = time.perf_counter()
+    window = src.menu.StartWindow()
+    window.update()
+    window.wait_visibility()
+    result["build"] = time.perf_counter() - start
+    result["first_window"] = time.time() - launched
+    window.destroy()
+except Exception as e:  # tkinter.TclError without a display
+    result["error"] = str(e).splitlines()[0]
+print(json.dumps(result))
+"""
+
+
+def run_once():
+    output = subprocess.run([sys.executable, "-c", CHILD, repr(time.time())] + HEAVY_MODULES,
+                            cwd=ROOT, capture_output=True, text=True)
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "no output")
+    return json.loads(lines[-1])
+
+
+def median(results, key):
+    values = [result[key] for result in results if result[key] is not None]
+    return statistics.median(values) if values else None
+
+
+def show(label, value):
+    print(f"{label:<24} | " + (f"{value * 1000:>9.1f}" if value is not None else f"{'n/a':>9}"))
+
+
+def record(path, medians, tolerance):
+    previous = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        previous = entries[-1] if entries else None
+    entry = dict(medians, date=time.strftime("%Y-%m-%d %H:%M:%S"), python=sys.version.split()[0])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    if previous is None:
+        return True
+    ok = True
+    for key in ("import", "build", "first_window"):
+        if medians[key] is None or previous.get(key) is None:
+            continue
+        change = (medians[key] / previous[key] - 1) * 100
+        print(f"{key:<24} | {change:>+8.1f}% vs {previous['date']}")
+        if key == "first_window" and change > tolerance:
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first window of the GUI.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="start without the cached splash image")
+    parser.add_argument("--record", metavar="FILE", help="append the medians to FILE and compare")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    try:
+        if args.cold:
+            from src.menu import SPLASH_CACHE
+            cache = os.path.join(ROOT, SPLASH_CACHE)
+            if os.path.exists(cache):
+                os.remove(cache)
+            cold = run_once()
+        results = [run_once() for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"start-up failed: {e}")
+        sys.exit(1)
+
+    print(f"{'stage (median)':<24} | {'ms':>9}")
+    if args.cold:
+        show("first window, cold", cold["first_window"])
+    medians = {key: median(results, key) for key in ("import", "build", "first_window")}
+    show("import src.menu", medians["import"])
+    show("build StartWindow", medians["build"])
+    show("first window", medians["first_window"])
+    if "error" in results[-1]:
+        print(f"window not built: {results[-1]['error']}")
+    eager = results[-1]["eager"]
+    print("heavy modules at start-up: " + (", ".join(eager) if eager else "none"))
+    if args.record and not record(args.record, medians, args.tolerance):
+        print(f"time to first window grew by more than {args.tolerance:g}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
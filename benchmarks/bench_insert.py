@@ -0,0 +1,66 @@
+# Compares one-at-a-time Relative_DB.insert with insert_many, and times the
+# streaming CSV importer.
+#
+#   python -m benchmarks.bench_insert [--rows 100000 300000] [--columns 10]
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from src.pyufodb import Relative_DB
+from src.storage import import_csv
+
+
+def make_rows(n, columns):
+    return [{col: f"{col}-{i}" for col in columns} for i in range(n)]
+
+
+def bench_insert_loop(rows, columns):
+    db = Relative_DB()
+    db.create_table("bench", list(columns))
+    start = time.perf_counter()
+    for row in rows:
+        db.insert("bench", row)
+    return time.perf_counter() - start
+
+
+def bench_insert_many(rows, columns):
+    db = Relative_DB()
+    db.create_table("bench", list(columns))
+    start = time.perf_counter()
+    db.insert_many("bench", rows)
+    return time.perf_counter() - start
+
+
+def bench_csv_import(rows, columns, workdir):
+    csv_path = os.path.join(workdir, "bench.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row[col] for col in columns)
+    start = time.perf_counter()
+    import_csv(csv_path, os.path.join(workdir, "bench.ufo"))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 300_000])
+    parser.add_argument("--columns", type=int, default=10)
+    args = parser.parse_args()
+
+    columns = [f"c{j}" for j in range(args.columns)]
+    print(f"{'rows':>10} | {'insert loop s':>13} | {'insert_many s':>13} | {'speedup':>7} | {'csv import s':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.rows:
+            rows = make_rows(n, columns)
+            loop = bench_insert_loop(rows, columns)
+            many = bench_insert_many(rows, columns)
+            imported = bench_csv_import(rows, columns, workdir)
+            print(f"{n:>10} | {loop:>13.3f} | {many:>13.3f} | {loop / many:>6.1f}x | {imported:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
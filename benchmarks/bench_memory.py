@@ -0,0 +1,62 @@
+# Compares the memory used by the legacy row layout (one UFORecords dict per
+# row) with the columnar UFOTable layout.
+#
+#   python -m benchmarks.bench_memory [--rows 100000 1000000] [--columns 5]
+import argparse
+import gc
+import time
+import tracemalloc
+
+from src.pyufodb import UFORecords, UFOTable
+
+
+def make_row(i, columns):
+    return {col: f"{col}-{i % 1000}" for col in columns}
+
+
+def build_rows(n, columns):
+    records = []
+    for i in range(n):
+        record = UFORecords()
+        for key, value in make_row(i, columns).items():
+            record.add(key, value)
+        record.add("id", str(i + 1))
+        records.append(record)
+    return records
+
+
+def build_columnar(n, columns):
+    table = UFOTable("bench", list(columns))
+    for i in range(n):
+        table.insert_record(make_row(i, columns))
+    return table
+
+
+def measure(builder, n, columns):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = builder(n, columns)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--columns", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = [f"c{j}" for j in range(args.columns)]
+    print(f"{'rows':>10} | {'layout':<8} | {'MiB':>9} | {'bytes/row':>9} | {'build s':>8}")
+    for n in args.rows:
+        for name, builder in (("rows", build_rows), ("columnar", build_columnar)):
+            used, elapsed = measure(builder, n, columns)
+            print(f"{n:>10} | {name:<8} | {used / 2**20:>9.1f} | {used / n:>9.0f} | {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Benchmark suite for the storage engine: Relative_DB.insert, select_where,
+# update, delete_record, save_to_file and load_from_file, plus
+# commands.execute_command, on synthetic tables of 1e3 to 1e6 rows and 5 to 50
+# columns. Needs no display.
+#
+#   python -m benchmarks.suite run [--rows 1000 10000 100000 1000000] [--columns 5 50] [--output results.json]
+#   python -m benchmarks.suite compare base.json new.json [--threshold 10]
+#
+# Every result is the time per operation, the best of --repeat rounds. Sizes
+# with more than --max-cells cells (rows x columns) are skipped. compare lists
+# the change of each result and exits with status 1 when any got slower by
+# more than --threshold percent.
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from src.commands import execute_command
+from src.pyufodb import Relative_DB
+
+TABLE = "bench"
+
+# Formula kinds for execute_command: c0 and c1 are int columns.
+FORMULAS = {
+    "cell": "={1}c0 + {2}c1 * {3}c0",
+    "range": "={*}c0 + {*}c1",
+    "aggregate": "=SUM(c1)",
+    "assign": "c3 = {*}c0 * {*}c1",
+}
+
+
+def make_table(rows, columns):
+    # c0, c1: ints; c2: 1000 distinct keys (hash indexed); the rest: unique text.
+    names = [f"c{j}" for j in range(columns)]
+    db = Relative_DB()
+    db.create_table(TABLE, names, {"c0": "int", "c1": "int"})
+    db.insert_many(TABLE, ([i, i * 7 % 1000, f"k{i % 1000}"] + [f"v{i}-{j}" for j in range(3, columns)]
+                           for i in range(rows)))
+    db.create_index(TABLE, "c2")
+    return db
+
+
+def timed(run, ops, repeat):
+    # Seconds per operation, best of repeat rounds; run(round) does ops operations.
+    best = None
+    for round_number in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(round_number)
+        elapsed = (time.perf_counter() - start) / ops
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_size(rows, columns, repeat, workdir):
+    results = {}
+    names = [f"c{j}" for j in range(columns)]
+    start = time.perf_counter()
+    db = make_table(rows, columns)
+    results["insert_many"] = (time.perf_counter() - start) / rows
+    rng = random.Random(rows * 100 + columns)
+    ops = min(rows, 10_000)
+
+    new_row = {name: f"n-{name}" for name in names}
+    new_row.update(c0="1", c1="2")
+    results["insert"] = timed(lambda _: [db.insert(TABLE, new_row) for _ in range(ops)], ops, repeat)
+
+    keys = [f"k{rng.randrange(1000)}" for _ in range(ops)]
+    results["select_where indexed"] = timed(lambda _: [db.select_where(TABLE, "c2", key) for key in keys],
+                                            ops, repeat)
+    scans = max(1, min(20, 1_000_000 // rows))
+    values = [f"v{rng.randrange(rows)}-3" for _ in range(scans)] if columns > 3 else ["x"] * scans
+    column = "c3" if columns > 3 else "c1"
+    results["select_where scan"] = timed(lambda _: [db.select_where(TABLE, column, value) for value in values],
+                                         scans, repeat)
+
+    ids = [rng.randint(1, rows) for _ in range(ops)]
+    results["update"] = timed(lambda r: [db.update(TABLE, record_id, {"c1": str(r), names[-1]: "u"})
+                                         for record_id in ids], ops, repeat)
+
+    table = db.tables[TABLE]
+    for kind, formula in FORMULAS.items():
+        count = ops if kind == "cell" else max(1, min(20, 1_000_000 // rows))
+        results[f"execute_command {kind}"] = timed(
+            lambda _: [execute_command(formula, table, db) for _ in range(count)], count, repeat)
+
+    # Each round deletes its own ids, so every call finds a row.
+    victims = rng.sample(range(1, rows + 1), min(rows // 2, ops * repeat))
+    per_round = len(victims) // repeat
+    results["delete_record"] = timed(
+        lambda r: [db.delete_record(TABLE, record_id) for record_id in victims[r * per_round:(r + 1) * per_round]],
+        per_round, repeat)
+
+    for version in (1, 2):
+        path = os.path.join(workdir, f"bench_v{version}.ufo")
+        results[f"save_to_file v{version}"] = timed(lambda _: db.save_to_file(path, version), 1, repeat)
+        results[f"load_from_file v{version}"] = timed(lambda _: Relative_DB().load_from_file(path), 1, repeat)
+        os.remove(path)
+    return results
+
+
+def run(args):
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    print(f"{'benchmark':<26} | {'rows':>9} | {'cols':>4} | {'per op':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            for columns in args.columns:
+                if rows * columns > args.max_cells:
+                    print(f"{'(skipped)':<26} | {rows:>9} | {columns:>4} | over --max-cells")
+                    continue
+                for name, seconds in bench_size(rows, columns, args.repeat, workdir).items():
+                    report["results"][f"{name} {rows}x{columns}"] = seconds
+                    print(f"{name:<26} | {rows:>9} | {columns:>4} | {format_time(seconds):>11}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            return show_comparison(json.load(f), report, args.threshold)
+    return 0
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+def show_comparison(base, new, threshold):
+    # Returns the exit status: 1 if anything got slower than threshold percent.
+    regressions = 0
+    print(f"base: {base['meta']['date']} (Python {base['meta']['python']}), "
+          f"new: {new['meta']['date']} (Python {new['meta']['python']})")
+    print(f"{'benchmark':<44} | {'base':>11} | {'new':>11} | {'change':>8}")
+    for key, seconds in new["results"].items():
+        before = base["results"].get(key)
+        if before is None:
+            continue
+        change = (seconds / before - 1) * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<44} | {format_time(before):>11} | {format_time(seconds):>11} | {change:>+7.1f}%{flag}")
+    missing = len(set(base["results"]) - set(new["results"]))
+    if missing:
+        print(f"{missing} result(s) of the base run are not in the new one")
+    print(f"{regressions} regression(s) over {threshold:g}%")
+    return 1 if regressions else 0
+
+
+def compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    return show_comparison(base, new, args.threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the storage engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runner = commands.add_parser("run", help="run the suite")
+    runner.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    runner.add_argument("--columns", type=int, nargs="+", default=[5, 50])
+    runner.add_argument("--repeat", type=int, default=3)
+    runner.add_argument("--max-cells", type=int, default=10_000_000, help="skip larger tables")
+    runner.add_argument("--output", metavar="FILE", help="write the results as JSON")
+    runner.add_argument("--compare", metavar="FILE", help="compare with an earlier JSON result")
+    runner.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    runner.set_defaults(run=run)
+
+    comparer = commands.add_parser("compare", help="compare two JSON results")
+    comparer.add_argument("base")
+    comparer.add_argument("new")
+    comparer.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    comparer.set_defaults(run=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.run(args))
+
+
+if __name__ == "__main__":
+    main()
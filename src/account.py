@@ -1,8 +1,10 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from . import metrics
 
 class UserProfileApp(ctk.CTkToplevel):
+    STATS_POLL_MS = 1000
+
     def __init__(self, master): 
         super().__init__(master)
         self.title("User Profile")
@@ -14,7 +16,7 @@ class UserProfileApp(ctk.CTkToplevel):
         self.profile_frame = ctk.CTkFrame(self)
         self.profile_frame.pack(fill='both', expand=True, padx=20, pady=10)
 
-        self.profile_frame.rowconfigure((0, 1, 2, 3, 4, 5, 6), weight=1)
+        self.profile_frame.rowconfigure((0, 1, 2, 3, 4, 5, 6, 7), weight=1)
         self.profile_frame.columnconfigure(0, weight=1)
         self.profile_frame.columnconfigure(1, weight=1)
 
@@ -42,19 +44,64 @@ class UserProfileApp(ctk.CTkToplevel):
         self.stats_label = ctk.CTkLabel(self.profile_frame, text="Statistics:", font=("Arial", 18, "bold"))
         self.stats_label.grid(row=4, column=0, columnspan=2, pady=10, padx=10, sticky="w")
 
-        self.stats_display = ctk.CTkTextbox(self.profile_frame, wrap="word", state="disabled", width=200, font=("Arial", 14))
+        self.stats_display = ctk.CTkTextbox(self.profile_frame, wrap="none", state="disabled", width=200, font=("Consolas", 12))
         self.stats_display.grid(row=5, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
-        self.stats_display.insert("0.0", "No statistics available.")
+
+        stats_buttons = ctk.CTkFrame(self.profile_frame, fg_color="transparent")
+        stats_buttons.grid(row=6, column=0, columnspan=2, padx=10, sticky="w")
+        self.metrics_button = ctk.CTkButton(stats_buttons, command=self.toggle_metrics, width=130)
+        self.metrics_button.pack(side="left", padx=(0, 5))
+        ctk.CTkButton(stats_buttons, text="Reset", command=self.reset_metrics, width=80).pack(side="left", padx=5)
+        ctk.CTkButton(stats_buttons, text="Export JSON", command=self.export_metrics, width=100).pack(side="left", padx=5)
 
         self.theme_button = ctk.CTkButton(self.profile_frame, text="Switch to Light Theme", command=self.toggle_theme, width=150)
-        self.theme_button.grid(row=6, column=0, columnspan=2, pady=(20, 10), sticky="s")
+        self.theme_button.grid(row=7, column=0, columnspan=2, pady=(20, 10), sticky="s")
 
         self.dark_theme = True
+        self.stats_poll_id = None
+        self.poll_stats()
+
+    def poll_stats(self):
+        # Metrics of the storage engine (see metrics.py), refreshed while the window is open.
+        if self.stats_poll_id is not None:
+            self.after_cancel(self.stats_poll_id)
+        if not self.winfo_exists():
+            return
+        self.refresh_stats()
+        self.stats_poll_id = self.after(self.STATS_POLL_MS, self.poll_stats)
+
+    def refresh_stats(self):
+        self.metrics_button.configure(text="Disable metrics" if metrics.enabled() else "Enable metrics")
+        self.stats_display.configure(state="normal")
+        self.stats_display.delete("1.0", "end")
+        self.stats_display.insert("1.0", metrics.report())
+        self.stats_display.configure(state="disabled")
+
+    def toggle_metrics(self):
+        if metrics.enabled():
+            metrics.disable()
+        else:
+            metrics.enable()
+        self.refresh_stats()
+
+    def reset_metrics(self):
+        metrics.reset()
+        self.refresh_stats()
+
+    def export_metrics(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                                 initialfile="metrics.json")
+        if file_path:
+            try:
+                metrics.export_json(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not export metrics: {e}")
 
     def upload_avatar(self):
         file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
         if file_path:
             try:
+                from PIL import Image, ImageTk  # only needed once an avatar is chosen
                 img = Image.open(file_path)
                 img = img.resize((150, 150), Image.ANTIALIAS)
                 self.avatar_image = ImageTk.PhotoImage(img)
@@ -0,0 +1,233 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import re
+
+from .pyufodb import UFOTable
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; every aggregate has a pure-Python path.
+    np = None
+
+# SUM, AVG, MIN, MAX, COUNT and COUNT DISTINCT over UFOTable columns, optionally
+# grouped by one or more columns. With NumPy installed typed (int/float/bool)
+# columns are aggregated in a single vectorized pass straight from their array
+# storage; text columns and installs without NumPy use a one-pass Python loop.
+# Empty text values count as missing, as NULL would in SQL.
+
+FUNCTIONS = ("SUM", "AVG", "MIN", "MAX", "COUNT", "COUNT DISTINCT")
+SPEC_RE = re.compile(r"^\s*(SUM|AVG|MIN|MAX|COUNT)\s*\(\s*(DISTINCT\s+)?(\*|[^\s()]+)\s*\)\s*$", re.IGNORECASE)
+NUMPY_TYPES = {"int": "int64", "float": "float64", "bool": "int8"}
+
+
+class AggregateSpec:
+    def __init__(self, func: str, column: str):
+        func = " ".join(func.upper().split())
+        if func not in FUNCTIONS:
+            raise ValueError(f"Unknown aggregate '{func}'. Use one of: {', '.join(FUNCTIONS)}.")
+        if column == "*" and func != "COUNT":
+            raise ValueError(f"{func}(*) is not supported.")
+        self.func = func
+        self.column = column
+
+    @property
+    def name(self) -> str:
+        if self.func == "COUNT DISTINCT":
+            return f"COUNT(DISTINCT {self.column})"
+        return f"{self.func}({self.column})"
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+def parse_spec(spec: Union[str, Tuple[str, str], AggregateSpec]) -> AggregateSpec:
+    if isinstance(spec, AggregateSpec):
+        return spec
+    if isinstance(spec, tuple):
+        return AggregateSpec(*spec)
+    match = SPEC_RE.match(spec)
+    if not match:
+        raise ValueError(f"Invalid aggregate '{spec}'. Use e.g. SUM(col), COUNT(*) or COUNT(DISTINCT col).")
+    func = match.group(1) + (" DISTINCT" if match.group(2) else "")
+    return AggregateSpec(func, match.group(3))
+
+
+def _to_number(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"Cannot aggregate non-numeric value {value!r}.")
+
+
+def _check_columns(table: UFOTable, columns: Iterable[str]) -> None:
+    for column in columns:
+        if column != "*" and column != "id" and column not in table.columns:
+            raise ValueError(f"Column '{column}' not found.")
+
+
+def _gather(table: UFOTable, column: str, positions: Sequence[int]) -> list:
+    data = table._ids if column == "id" else table._column(column)
+    return [data[pos] for pos in positions]
+
+
+def _column_type(table: UFOTable, column: str) -> str:
+    return "int" if column == "id" else table.types.get(column, "str")
+
+
+# --- pure Python -----------------------------------------------------------------
+
+def _group_codes(table: UFOTable, group_by: List[str], positions: Sequence[int]) -> Tuple[List[int], List[tuple]]:
+    if not group_by:
+        return [0] * len(positions), [()]
+    columns = [_gather(table, column, positions) for column in group_by]
+    mapping: Dict[tuple, int] = {}
+    codes = [mapping.setdefault(key, len(mapping)) for key in zip(*columns)]
+    return codes, list(mapping)
+
+
+def _aggregate_python(table: UFOTable, spec: AggregateSpec, codes: List[int], groups: int,
+                      positions: Sequence[int]) -> List[Any]:
+    if spec.column == "*":
+        counts = [0] * groups
+        for code in codes:
+            counts[code] += 1
+        return counts
+    values = _gather(table, spec.column, positions)
+    text = _column_type(table, spec.column) == "str"
+    pairs = [(code, value) for code, value in zip(codes, values) if value != ""] if text else zip(codes, values)
+    if spec.func == "COUNT":
+        counts = [0] * groups
+        for code, _ in pairs:
+            counts[code] += 1
+        return counts
+    if spec.func == "COUNT DISTINCT":
+        seen = [set() for _ in range(groups)]
+        for code, value in pairs:
+            seen[code].add(value)
+        return [len(values) for values in seen]
+    if spec.func in ("MIN", "MAX"):
+        better = (lambda a, b: a < b) if spec.func == "MIN" else (lambda a, b: a > b)
+        best: List[Any] = [None] * groups
+        for code, value in pairs:
+            if best[code] is None or better(value, best[code]):
+                best[code] = value
+        return best
+    totals: List[Any] = [None] * groups
+    counts = [0] * groups
+    for code, value in pairs:
+        value = _to_number(value) if text else value
+        totals[code] = value if totals[code] is None else totals[code] + value
+        counts[code] += 1
+    if spec.func == "SUM":
+        return totals
+    return [None if count == 0 else total / count for total, count in zip(totals, counts)]
+
+
+# --- NumPy -----------------------------------------------------------------------
+
+def _numpy_column(table: UFOTable, column: str, positions) -> Any:
+    # Copies the selected values of a typed column out of its array storage;
+    # the temporary view is dropped at once so the array can still grow.
+    data = table._ids if column == "id" else table._column(column)
+    dtype = NUMPY_TYPES[_column_type(table, column)]
+    if len(data) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(data, dtype=dtype)[positions]
+
+
+def _group_codes_numpy(table: UFOTable, group_by: List[str], positions) -> Tuple[Any, List[tuple]]:
+    if not group_by:
+        return np.zeros(len(positions), dtype=np.int64), [()]
+    column_codes = []
+    column_keys = []
+    for column in group_by:
+        if _column_type(table, column) == "str":
+            mapping: Dict[Any, int] = {}
+            codes = [mapping.setdefault(value, len(mapping)) for value in _gather(table, column, positions.tolist())]
+            column_codes.append(np.array(codes, dtype=np.int64))
+            column_keys.append(list(mapping))
+        else:
+            keys, codes = np.unique(_numpy_column(table, column, positions), return_inverse=True)
+            column_codes.append(codes.reshape(-1))
+            column_keys.append(keys.tolist())
+    if len(column_codes) == 1:
+        codes = column_codes[0]
+        return codes, [(key,) for key in column_keys[0]]
+    combined, codes = np.unique(np.stack(column_codes, axis=1), axis=0, return_inverse=True)
+    groups = [tuple(keys[i] for keys, i in zip(column_keys, row)) for row in combined.tolist()]
+    return codes.reshape(-1), groups
+
+
+def _reduce_groups(ufunc, codes, values, groups: int) -> List[Any]:
+    # Sort once by group, then reduce each contiguous run with one ufunc call.
+    result: List[Any] = [None] * groups
+    if len(values) == 0:
+        return result
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    reduced = ufunc.reduceat(values[order], starts)
+    for code, value in zip(sorted_codes[starts].tolist(), reduced.tolist()):
+        result[code] = value
+    return result
+
+
+def _aggregate_numpy(table: UFOTable, spec: AggregateSpec, codes, groups: int, positions) -> List[Any]:
+    if spec.column == "*":
+        return np.bincount(codes, minlength=groups).tolist()
+    if _column_type(table, spec.column) == "str":
+        return _aggregate_python(table, spec, codes.tolist(), groups, positions.tolist())
+    values = _numpy_column(table, spec.column, positions)
+    if spec.func == "COUNT":
+        return np.bincount(codes, minlength=groups).tolist()
+    if spec.func == "COUNT DISTINCT":
+        pairs = np.unique(np.stack([codes, values.astype(np.float64)], axis=1), axis=0)
+        return np.bincount(pairs[:, 0].astype(np.int64), minlength=groups).tolist()
+    if spec.func == "MIN":
+        return _reduce_groups(np.minimum, codes, values, groups)
+    if spec.func == "MAX":
+        return _reduce_groups(np.maximum, codes, values, groups)
+    if values.dtype == np.int8:
+        values = values.astype(np.int64)
+    totals = _reduce_groups(np.add, codes, values, groups)
+    if spec.func == "SUM":
+        return totals
+    counts = np.bincount(codes, minlength=groups).tolist()
+    return [None if count == 0 else total / count for total, count in zip(totals, counts)]
+
+
+# --- entry point -----------------------------------------------------------------
+
+def aggregate(table: UFOTable, specs: List[Union[str, tuple, AggregateSpec]], group_by: Optional[List[str]] = None,
+              positions: Optional[Sequence[int]] = None, use_numpy: Optional[bool] = None):
+    # Returns a QueryResult with one row per group (sorted by group key), laid
+    # out as the group columns followed by one column per aggregate.
+    from .query import QueryResult
+
+    specs = [parse_spec(spec) for spec in specs]
+    group_by = list(group_by or [])
+    _check_columns(table, group_by + [spec.column for spec in specs])
+    # Only live positions are read, so deleted rows need no compaction first.
+    vectorized = np is not None if use_numpy is None else (use_numpy and np is not None)
+    if vectorized:
+        if positions is None:
+            positions = np.flatnonzero(_numpy_column(table, "id", slice(None)))
+        else:
+            positions = np.asarray(positions, dtype=np.int64)
+        codes, groups = _group_codes_numpy(table, group_by, positions)
+        results = [_aggregate_numpy(table, spec, codes, len(groups), positions) for spec in specs]
+    else:
+        if positions is None:
+            positions = table._live_positions()
+        codes, groups = _group_codes(table, group_by, positions)
+        results = [_aggregate_python(table, spec, codes, len(groups), positions) for spec in specs]
+    if group_by and len(positions) == 0:
+        groups, results = [], [[] for _ in specs]
+    rows = [tuple(key) + tuple(result[i] for result in results) for i, key in enumerate(groups)]
+    if group_by:
+        rows.sort(key=lambda row: row[:len(group_by)])
+    return QueryResult(group_by + [spec.name for spec in specs], rows, f"Aggregate {specs} by {group_by}")
@@ -0,0 +1,64 @@
+from typing import Any, Callable, Optional
+import threading
+
+from .pyufodb import OperationCancelled
+
+
+class BackgroundTask:
+    # Runs work(progress, cancel) on a worker thread. Tk widgets may only be
+    # used from the main loop, so the owning widget polls the task with
+    # after(); progress, the result or the error are delivered there.
+    POLL_MS = 50
+
+    def __init__(self, widget, work: Callable[[Callable[[float], None], threading.Event], Any],
+                 on_done: Callable[[Any], None], on_error: Optional[Callable[[Exception], None]] = None,
+                 on_progress: Optional[Callable[[float], None]] = None,
+                 on_cancel: Optional[Callable[[], None]] = None):
+        self.widget = widget
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.cancel_event = threading.Event()
+        self.progress = 0.0
+        self._outcome = None  # ("done" | "error" | "cancelled", value) once the worker finished
+        self._thread = threading.Thread(target=self._run, args=(work,), daemon=True)
+
+    def start(self) -> "BackgroundTask":
+        self._thread.start()
+        self.widget.after(self.POLL_MS, self._poll)
+        return self
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def _set_progress(self, fraction: float) -> None:
+        self.progress = fraction
+
+    def _run(self, work) -> None:
+        try:
+            self._outcome = ("done", work(self._set_progress, self.cancel_event))
+        except OperationCancelled:
+            self._outcome = ("cancelled", None)
+        except Exception as e:  # handed to on_error on the main thread
+            self._outcome = ("error", e)
+
+    def _poll(self) -> None:
+        if not self.widget.winfo_exists():
+            self.cancel_event.set()
+            return
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+        if self._outcome is None:
+            self.widget.after(self.POLL_MS, self._poll)
+            return
+        kind, value = self._outcome
+        if kind == "done":
+            self.on_done(value)
+        elif kind == "cancelled":
+            if self.on_cancel is not None:
+                self.on_cancel()
+        elif self.on_error is not None:
+            self.on_error(value)
+        else:
+            raise value
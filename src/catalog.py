@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+
+from .journal import Journal
+from .storage import HEADER, LENGTH, MAGIC, VERSION
+
+# Metadata for the .ufo files of a directory (the editor's saves folder),
+# read from the file headers only: table names, column and row counts come
+# from the v2 directory block or from the v1 table headers, whose record
+# lines are skipped by counting newlines instead of being parsed. Entries are
+# cached by (mtime_ns, size), so a refresh is one os.scandir pass that only
+# reopens files that changed. Row counts are as of the last save or
+# checkpoint; `pending` tells whether a journal holds later changes.
+
+SKIP_CHUNK = 1 << 20
+
+
+class SavesEntry:
+    def __init__(self, path: str, stamp: Tuple[int, int]):
+        self.path = path
+        self.name = os.path.basename(path)[:-len(".ufo")]
+        self.mtime = stamp[0] / 1e9
+        self.size = stamp[1]
+        self.stamp = stamp
+        self.version = 1
+        self.tables: List[Tuple[str, int, int]] = []  # (name, columns, rows)
+        self.pending = False
+        self.error: Optional[str] = None
+
+    @property
+    def rows(self) -> int:
+        return sum(rows for _, _, rows in self.tables)
+
+    def __repr__(self) -> str:
+        return f"SavesEntry({self.name!r}, tables={self.tables!r})"
+
+
+def _skip_lines(f, count: int) -> None:
+    # Moves past `count` lines of a file opened in binary mode.
+    while count > 0:
+        start = f.tell()
+        chunk = f.read(SKIP_CHUNK)
+        if not chunk:
+            raise ValueError("Unexpected end of file.")
+        found = chunk.count(b"\n")
+        if found < count:
+            count -= found
+            continue
+        end = -1
+        for _ in range(count):
+            end = chunk.index(b"\n", end + 1)
+        f.seek(start + end + 1)
+        return
+
+
+def _read_line(f) -> str:
+    line = f.readline()
+    if not line:
+        raise ValueError("Unexpected end of file.")
+    return line.decode("utf-8").strip()
+
+
+def _read_v1_tables(f) -> List[Tuple[str, int, int]]:
+    tables = []
+    for _ in range(int(_read_line(f))):
+        name = _read_line(f)
+        num_columns = int(_read_line(f))
+        _skip_lines(f, num_columns + 1)  # column names and next_id
+        num_records = int(_read_line(f))
+        _skip_lines(f, num_records)
+        tables.append((name, num_columns, num_records))
+    return tables
+
+
+def _read_v2_tables(f) -> List[Tuple[str, int, int]]:
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("Truncated .ufo v2 file.")
+    magic, version, _, _, directory_offset = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a .ufo v2 file.")
+    f.seek(directory_offset)
+    prefix = f.read(LENGTH.size)
+    if len(prefix) < LENGTH.size:
+        raise ValueError("Truncated .ufo v2 file.")
+    directory = json.loads(f.read(LENGTH.unpack(prefix)[0]))["tables"]
+    # Saved id blocks hold no tombstones: one int64 per row.
+    return [(entry["name"], len(entry["columns"]), entry["ids"][1] // 8) for entry in directory]
+
+
+def read_header(path: str, stamp: Tuple[int, int]) -> SavesEntry:
+    entry = SavesEntry(path, stamp)
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) == MAGIC:
+                entry.version = 2
+                f.seek(0)
+                entry.tables = _read_v2_tables(f)
+            else:
+                f.seek(0)
+                entry.tables = _read_v1_tables(f)
+    except (OSError, ValueError, KeyError, IndexError, TypeError, UnicodeDecodeError) as e:
+        entry.error = str(e)
+    return entry
+
+
+class SavesCatalog:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries: Dict[str, SavesEntry] = {}  # file name -> entry
+
+    def _scan(self) -> Tuple[Dict[str, Tuple[str, Tuple[int, int]]], set]:
+        files = {}
+        names = set()
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    names.add(item.name)
+                    if item.name.endswith(".ufo") and item.is_file():
+                        st = item.stat()
+                        files[item.name] = (item.path, (st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            pass
+        return files, names
+
+    def refresh(self) -> Tuple[List[SavesEntry], List[SavesEntry], List[SavesEntry]]:
+        # Rescans the directory and returns (added, changed, removed) entries;
+        # headers are read again only for new files and files whose
+        # modification time or size changed.
+        files, names = self._scan()
+        added, changed, removed = [], [], []
+        for filename in list(self.entries):
+            if filename not in files:
+                removed.append(self.entries.pop(filename))
+        for filename in sorted(files):
+            path, stamp = files[filename]
+            old = self.entries.get(filename)
+            pending = os.path.basename(Journal.path_for(path)) in names
+            if old is not None and old.stamp == stamp:
+                if old.pending != pending:
+                    old.pending = pending
+                    changed.append(old)
+                continue
+            entry = read_header(path, stamp)
+            entry.pending = pending
+            self.entries[filename] = entry
+            (added if old is None else changed).append(entry)
+        return added, changed, removed
+
+    def count(self) -> int:
+        return len(self._scan()[0])
@@ -0,0 +1,207 @@
+from typing import List, Optional
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .pyufodb import Relative_DB, COLUMN_TYPES
+from .storage import convert_file, detect_version, export_csv, import_csv
+
+# Command-line access to .ufo files without the GUI:
+#
+#   python -m src.cli create FILE TABLE COLUMN[:type] ...
+#   python -m src.cli import CSV FILE [--table NAME]
+#   python -m src.cli export FILE CSV [--table NAME] [--id]
+#   python -m src.cli query FILE "SELECT ..." [--format table|csv|json]
+#   python -m src.cli stats FILE [--json]
+#   python -m src.cli compact FILE [--format-version 1|2]
+#
+# Only the storage modules are imported at start-up (the query engine when a
+# query runs), never Tk, PIL or the AI client, so it starts in tens of
+# milliseconds and needs no display.
+
+
+class CommandError(Exception):
+    pass
+
+
+def _load(filename: str) -> Relative_DB:
+    if not os.path.exists(filename):
+        raise CommandError(f"File '{filename}' not found.")
+    db = Relative_DB()
+    if not db.load_from_file(filename):
+        raise CommandError(f"Failed to load '{filename}'.")
+    return db
+
+
+def _table_name(db: Relative_DB, table: Optional[str]) -> str:
+    if table is not None:
+        if table not in db.tables:
+            raise CommandError(f"Table '{table}' does not exist. Tables: {', '.join(db.tables) or 'none'}.")
+        return table
+    if len(db.tables) != 1:
+        raise CommandError(f"Choose a table with --table: {', '.join(db.tables) or 'none'}.")
+    return next(iter(db.tables))
+
+
+def cmd_create(args) -> None:
+    columns: List[str] = []
+    types = {}
+    for spec in args.columns:
+        name, _, type_name = spec.partition(":")
+        if type_name and type_name not in COLUMN_TYPES:
+            raise CommandError(f"Unknown column type '{type_name}'. Use one of: {', '.join(COLUMN_TYPES)}.")
+        columns.append(name)
+        types[name] = type_name or "str"
+    db = _load(args.file) if os.path.exists(args.file) else Relative_DB()
+    try:
+        db.create_table(args.table, columns, types)
+    except (RuntimeError, ValueError) as e:
+        raise CommandError(str(e))
+    if not db.save_to_file(args.file, args.format_version):
+        raise CommandError(f"Failed to write '{args.file}'.")
+    print(f"Created table {args.table} ({len(columns)} columns) in {args.file}")
+
+
+def cmd_import(args) -> None:
+    try:
+        count = import_csv(args.csv, args.file, args.table, args.delimiter)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        raise CommandError(f"Failed to import CSV: {e}")
+    if args.format_version == 2 and not convert_file(args.file, args.file, 2):
+        raise CommandError(f"Failed to convert '{args.file}' to format 2.")
+    print(f"Imported {count} rows into {args.file}")
+
+
+def cmd_export(args) -> None:
+    db = _load(args.file)
+    table = _table_name(db, args.table)
+    try:
+        count = export_csv(db, table, args.csv, args.delimiter, args.id)
+    except OSError as e:
+        raise CommandError(f"Failed to export CSV: {e}")
+    print(f"Exported {count} rows of {table} to {args.csv}")
+
+
+def cmd_query(args) -> None:
+    db = _load(args.file)
+    try:
+        result = db.query(args.text)
+    except ValueError as e:
+        raise CommandError(str(e))
+    if args.format == "json":
+        json.dump(result.as_dicts(), sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(result.columns)
+        writer.writerows(result.rows)
+    else:
+        print(result.format(args.max_rows))
+        print(f"({len(result)} rows)")
+
+
+def _stats(filename: str, db: Relative_DB) -> dict:
+    journal = filename + ".journal"
+    return {
+        "file": filename,
+        "format_version": detect_version(filename),
+        "size": os.path.getsize(filename),
+        "journal_size": os.path.getsize(journal) if os.path.exists(journal) else 0,
+        "tables": [{
+            "name": name,
+            "rows": len(table),
+            "columns": {column: table.types.get(column, "str") for column in table.columns},
+            "indexes": {column: index.kind for column, index in table.indexes.items()},
+            "formulas": len(table.formulas),
+        } for name, table in db.tables.items()],
+    }
+
+
+def cmd_stats(args) -> None:
+    stats = _stats(args.file, _load(args.file))
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=1))
+        return
+    print(f"{stats['file']}: format {stats['format_version']}, {stats['size']} bytes"
+          + (f", journal {stats['journal_size']} bytes" if stats["journal_size"] else ""))
+    for table in stats["tables"]:
+        print(f"  {table['name']}: {table['rows']} rows, {len(table['columns'])} columns, "
+              f"{len(table['indexes'])} indexes, {table['formulas']} formulas")
+        for column, type_name in table["columns"].items():
+            index = table["indexes"].get(column)
+            print(f"    {column}: {type_name}" + (f" ({index} index)" if index else ""))
+
+
+def cmd_compact(args) -> None:
+    # Loading replays the journal; saving drops tombstones and the journal.
+    before = os.path.getsize(args.file) if os.path.exists(args.file) else 0
+    journal = args.file + ".journal"
+    before += os.path.getsize(journal) if os.path.exists(journal) else 0
+    db = _load(args.file)
+    if not db.save_to_file(args.file, args.format_version or db.file_version):
+        raise CommandError(f"Failed to write '{args.file}'.")
+    print(f"Compacted {args.file}: {before} -> {os.path.getsize(args.file)} bytes")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Work with .ufo database files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="create a table (and the file if needed)")
+    create.add_argument("file")
+    create.add_argument("table")
+    create.add_argument("columns", nargs="+", metavar="COLUMN[:type]")
+    create.add_argument("--format-version", type=int, choices=(1, 2))
+    create.set_defaults(run=cmd_create)
+
+    imported = commands.add_parser("import", help="import a CSV file (first row = column names)")
+    imported.add_argument("csv")
+    imported.add_argument("file")
+    imported.add_argument("--table", default="sightings")
+    imported.add_argument("--delimiter", default=",")
+    imported.add_argument("--format-version", type=int, choices=(1, 2), default=1)
+    imported.set_defaults(run=cmd_import)
+
+    export = commands.add_parser("export", help="export a table to CSV")
+    export.add_argument("file")
+    export.add_argument("csv")
+    export.add_argument("--table")
+    export.add_argument("--delimiter", default=",")
+    export.add_argument("--id", action="store_true", help="include the id column")
+    export.set_defaults(run=cmd_export)
+
+    query = commands.add_parser("query", help="run a SELECT query")
+    query.add_argument("file")
+    query.add_argument("text")
+    query.add_argument("--format", choices=("table", "csv", "json"), default="table")
+    query.add_argument("--max-rows", type=int, default=200)
+    query.set_defaults(run=cmd_query)
+
+    stats = commands.add_parser("stats", help="show tables, row counts, types and indexes")
+    stats.add_argument("file")
+    stats.add_argument("--json", action="store_true")
+    stats.set_defaults(run=cmd_stats)
+
+    compact = commands.add_parser("compact", help="fold the journal into the file and drop deleted rows")
+    compact.add_argument("file")
+    compact.add_argument("--format-version", type=int, choices=(1, 2))
+    compact.set_defaults(run=cmd_compact)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args)
+    except CommandError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:  # output piped into e.g. head, which stopped reading
+        sys.stdout = open(os.devnull, "w")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from contextlib import contextmanager
+import itertools
+import json
+import queue
+import socket
+import threading
+
+from .server import DEFAULT_PORT
+
+# Client for src/server.py. A UFOClient talks to one database through a pool
+# of connections, so threads of an ingest job can share it; pipeline() sends
+# a batch of requests before reading any response, which costs one round trip
+# for the whole batch.
+#
+#   client = UFOClient("database")
+#   client.insert("sightings", {"city": "Austin", "shape": "disk"})
+#   client.query("SELECT city, COUNT(*) FROM sightings GROUP BY city").rows
+
+
+class RemoteError(RuntimeError):
+    pass
+
+
+class RemoteResult:
+    # Rows of a query or aggregate, shaped like query.QueryResult.
+    def __init__(self, columns: List[str], rows: List[list]):
+        self.columns = columns
+        self.rows = [tuple(row) for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+class Connection:
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, timeout: Optional[float] = 30.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+        self._ids = itertools.count(1)
+
+    def pipeline(self, requests: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Sends every request, then reads the responses (they arrive in order).
+        requests = [dict(request, id=next(self._ids)) for request in requests]
+        self.sock.sendall(b"".join(json.dumps(request).encode("utf-8") + b"\n" for request in requests))
+        responses = []
+        for request in requests:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("The server closed the connection.")
+            response = json.loads(line)
+            if response.get("id") != request["id"]:
+                raise ConnectionError("Response out of order.")
+            responses.append(response)
+        return responses
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+
+class UFOClient:
+    def __init__(self, database: str, host: str = "127.0.0.1", port: int = DEFAULT_PORT, pool_size: int = 4):
+        self.database = database
+        self.host = host
+        self.port = port
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        # Waits while pool_size connections are in use; idle ones are reused.
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Connection(self.host, self.port)
+            try:
+                yield conn
+            except (OSError, ValueError):
+                conn.close()  # the stream may be out of step; don't reuse it
+                raise
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def pipeline(self, requests: Iterable[Dict[str, Any]], raise_errors: bool = True) -> List[Any]:
+        # requests are dicts with "op" and its fields; returns their results,
+        # or the error responses as RemoteError instances if raise_errors is off.
+        requests = [dict(request, db=self.database) for request in requests]
+        with self.connection() as conn:
+            responses = conn.pipeline(requests)
+        results = []
+        for response in responses:
+            if response["ok"]:
+                results.append(response["result"])
+            elif raise_errors:
+                raise RemoteError(response["error"])
+            else:
+                results.append(RemoteError(response["error"]))
+        return results
+
+    def call(self, op: str, **fields) -> Any:
+        return self.pipeline([dict(fields, op=op)])[0]
+
+    def tables(self) -> Dict[str, List[str]]:
+        return self.call("tables")
+
+    def create_table(self, table: str, columns: List[str], types: Optional[Dict[str, str]] = None) -> None:
+        self.call("create_table", table=table, columns=columns, types=types)
+
+    def insert(self, table: str, data: Dict[str, Any]) -> int:
+        return self.call("insert", table=table, data=data)
+
+    def insert_many(self, table: str, rows: Iterable[Any], batch_size: int = 10000) -> int:
+        # Rows go out in batches, all pipelined on one connection.
+        rows = [row if isinstance(row, dict) else list(row) for row in rows]
+        batches = [{"op": "insert_many", "table": table, "rows": rows[i:i + batch_size]}
+                   for i in range(0, len(rows), batch_size)]
+        return sum(result["count"] for result in self.pipeline(batches))
+
+    def get(self, table: str, record_id: int) -> Optional[Dict[str, str]]:
+        return self.call("get", table=table, record_id=record_id)
+
+    def select_where(self, table: str, field: str, value: Any) -> List[Dict[str, str]]:
+        return self.call("select", table=table, field=field, value=value)
+
+    def count(self, table: str) -> int:
+        return self.call("count", table=table)
+
+    def update(self, table: str, record_id: int, data: Dict[str, Any]) -> None:
+        self.call("update", table=table, record_id=record_id, data=data)
+
+    def update_many(self, table: str, updates_by_id: Dict[int, Dict[str, Any]]) -> int:
+        return self.call("update_many", table=table,
+                         data={str(record_id): updates for record_id, updates in updates_by_id.items()})
+
+    def delete(self, table: str, record_id: int) -> bool:
+        return self.call("delete", table=table, record_id=record_id)
+
+    def query(self, text: str) -> RemoteResult:
+        result = self.call("query", text=text)
+        return RemoteResult(result["columns"], result["rows"])
+
+    def aggregate(self, table: str, specs: List[str], group_by: Optional[List[str]] = None) -> RemoteResult:
+        result = self.call("aggregate", table=table, specs=specs, group_by=group_by)
+        return RemoteResult(result["columns"], result["rows"])
+
+    def flush(self) -> None:
+        self.call("flush")
+
+    def metrics(self) -> Dict[str, Any]:
+        # The server's metrics.snapshot(); empty unless it runs with UFODB_METRICS=1.
+        return self.call("metrics")
@@ -1,81 +1,250 @@
 # commands.py
+import operator
 import re
+from collections import OrderedDict
+from itertools import repeat
+from .aggregate import SPEC_RE, AggregateSpec, aggregate
 
-def execute_command(command, table):
-    # Измененное регулярное выражение для обработки нескольких операндов
-    match = re.match(r"=(\s*\{.+?\}\w+\s*)(\s*[+\-*/]\s*\{.+?\}\w+\s*)*", command)
-    if not match:
-        raise ValueError("Invalid command format. Use format ={...}col [+|-|*|/]{...}col")
+# Формулы вида ={row}col [+|-|*|/] {row}col ... вычисляются слева направо.
+# Вместо номера строки можно указать диапазон {first:last}col (включительно) или
+# все строки {*}col / {i}col; "c = <формула>" записывает результат в столбец c.
+FORMULA_RE = re.compile(r"=(\s*\{[^}]+\}\w+\s*)(\s*[+\-*/]\s*\{[^}]+\}\w+\s*)*")
+ASSIGN_RE = re.compile(r"^\s*(\w+)\s*=\s*(\{.*)$")
+TOKEN_RE = re.compile(r"\{[^}]*\}\w+|[+\-*/]")
+CELL_RE = re.compile(r"{(\d+|\d+:\d+|\*|i)}(\w+)")
 
-    operands = []
-    operators = []
-    parts = re.split(r'\s*([+\-*/])\s*', match.group(0)[1:]) # Разделим на операнды и операторы
+FORMULA_CACHE_SIZE = 256 # Compiled formulas kept per process (least recently used are dropped)
+_formula_cache = OrderedDict()
 
-    for i, part in enumerate(parts):
-        if i % 2 == 0: # Операнд
-            operands.append(evaluate_cell_reference(part, table))
-        else: # Оператор
-            operators.append(part)
 
+def _divide(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Division by zero")
+    return a / b
 
-    result = operands[0]
-    for i in range(len(operators)):
-        operator = operators[i]
-        operand = operands[i+1]
-        if operator == '+':
-            result += operand
-        elif operator == '-':
-            result -= operand
-        elif operator == '*':
-            result *= operand
-        elif operator == '/':
-            if operand == 0:
-                raise ZeroDivisionError("Division by zero")
-            result /= operand
 
-    return result
+OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': _divide}
 
 
-def evaluate_cell_reference(cell_ref, table):
-    match = re.match(r"{(\d+)}(\w+)", cell_ref)
-    if not match:
-        raise ValueError("Invalid cell reference format.")
+def execute_command(command, table, db=None):
+    # Returns a value, a list of values for range formulas, or the number of
+    # rows written by an assignment (through db when given, so it is journaled).
+    return compile_formula(command, table.columns)(table, db)
 
-    row_index = int(match.group(1))
-    col_name = match.group(2).lower()  # Case-insensitive column names
 
-    try:
-        if col_name.isdigit(): # Check if column reference is numeric (id or index)
+def compile_formula(command, columns):
+    # Parsing and column-name resolution happen once per formula text and column
+    # layout; evaluating the cached closure only reads the referenced cells.
+    key = (command, tuple(columns))
+    formula = _formula_cache.get(key)
+    if formula is None:
+        formula = _compile(command, list(columns))
+        _formula_cache[key] = formula
+        if len(_formula_cache) > FORMULA_CACHE_SIZE:
+            _formula_cache.popitem(last=False)
+    else:
+        _formula_cache.move_to_end(key)
+    return formula
 
-            col_index = int(col_name)
-            if 0 <= col_index < len(table.columns + ["id"]):
-                value = table.records[row_index].fields.get( (table.columns + ["id"])[col_index] )
-            else:
-                raise IndexError("Column index out of range.")
 
-        elif col_name == "id": #Handle special "id" column
-            value = table.records[row_index].fields["id"]
+def _compile(command, columns):
+    # Aggregates over a whole column: =SUM(col), =AVG(col), =COUNT(DISTINCT col), ...
+    if command.startswith("=") and SPEC_RE.match(command[1:]):
+        spec = command[1:]
+        return lambda table, db=None: execute_aggregate(spec, table)
 
+    assignment = ASSIGN_RE.match(command)
+    if assignment:
+        return _compile_assignment(assignment.group(1), _compile_expression("=" + assignment.group(2), columns))
 
-        else: # Column reference is a name
-            if col_name in table.columns:
-                value = table.records[row_index].fields[col_name]
-            else:
-                raise ValueError(f"Column '{col_name}' not found.")
+    evaluate = _compile_expression(command, columns)
+    return lambda table, db=None: evaluate(table)[1]
 
 
+def _compile_expression(command, columns):
+    # Returns evaluate(table) -> (rows, result). For plain cell formulas rows is
+    # None and result a single value; with ranges rows is the range of the first
+    # range operand and result one value per row, single cells are broadcast.
+    match = FORMULA_RE.fullmatch(command) # Trailing text is an error, not silently dropped
+    if not match:
+        raise ValueError("Invalid command format. Use format ={...}col [+|-|*|/]{...}col")
 
-        try:
-            return int(value)  # Attempt converting to integer
-        except (ValueError, TypeError):
+    parts = TOKEN_RE.findall(match.group(0)[1:]) # Разделим на операнды и операторы
+    operands = [_compile_cell(parts[i], columns) for i in range(0, len(parts), 2)]
+    operators = [OPERATORS[parts[i]] for i in range(1, len(parts), 2)]
+
+    if not any(vector for _, vector in operands):
+        first = operands[0][0]
+        rest = [(apply, operand) for apply, (operand, _) in zip(operators, operands[1:])]
+
+        def evaluate(table):
+            result = first(table)
+            for apply, operand in rest:
+                result = apply(result, operand(table))
+            return None, result
+
+        return evaluate
+
+    def evaluate_rows(table):
+        rows = None
+        values = []
+        for getter, vector in operands:
+            if not vector:
+                values.append(repeat(getter(table)))
+                continue
+            span, column = getter(table)
+            if rows is None:
+                rows = span
+            elif len(span) != len(rows):
+                raise ValueError(f"Cannot combine ranges of {len(rows)} and {len(span)} rows.")
+            values.append(column)
+        # One pass over the columns: the maps are chained and consumed once.
+        result = values[0]
+        for apply, operand in zip(operators, values[1:]):
+            result = map(apply, result, operand)
+        return rows, list(result) if rows else []
+
+    return evaluate_rows
+
+
+def _compile_assignment(target, evaluate):
+    def assign(table, db=None):
+        rows, result = evaluate(table)
+        if rows is None: # A single value fills the whole column
+            rows = table._live_positions() if table._dead else range(len(table._ids))
+            result = [result] * len(rows)
+        column = _target_column(target, table, result, db)
+        updates = {table._ids[pos]: {column: value} for pos, value in zip(rows, result)}
+        if db is not None:
+            return db.update_many(table.name, updates)
+        return table.update_many(updates)
+
+    return assign
+
+
+def _target_column(target, table, values, db):
+    if target.lower() == "id":
+        raise ValueError("The id column cannot be assigned.")
+    for column in table.columns:
+        if column.lower() == target.lower():
+            return column
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        type_name = "int"
+    elif all(isinstance(value, (int, float)) for value in values):
+        type_name = "float"
+    else:
+        type_name = "str"
+    if db is not None:
+        db.add_column(table.name, target, type_name)
+    else:
+        table.add_column(target, type_name=type_name)
+    return target
+
+
+def formula_references(command, columns):
+    # (row, column) pairs a formula reads; row is None for ranges and aggregates,
+    # which read the whole column (COUNT(*) reads the id column).
+    if command.startswith("=") and SPEC_RE.match(command[1:]):
+        column = SPEC_RE.match(command[1:]).group(3)
+        return [(None, "id" if column == "*" else _resolve_column(column, columns))]
+    match = FORMULA_RE.fullmatch(command)
+    if not match:
+        raise ValueError("Invalid command format. Use format ={...}col [+|-|*|/]{...}col")
+    references = []
+    for token in TOKEN_RE.findall(match.group(0)[1:]):
+        cell = CELL_RE.match(token)
+        if cell:
+            rows = cell.group(1)
+            references.append((int(rows) if rows.isdigit() else None, _resolve_column(cell.group(2), columns)))
+    return references
+
+
+def _resolve_column(col_name, columns):
+    if col_name in columns:
+        return col_name
+    col_name = col_name.lower()  # Case-insensitive column names
+    if col_name.isdigit(): # Numeric column reference: position in columns + ["id"]
+        fields = columns + ["id"]
+        col_index = int(col_name)
+        if not 0 <= col_index < len(fields):
+            raise IndexError("Column index out of range.")
+        return fields[col_index]
+    if col_name == "id":
+        return col_name
+    for column in columns:
+        if column.lower() == col_name:
+            return column
+    raise ValueError(f"Column '{col_name}' not found.")
+
+
+def _compile_cell(cell_ref, columns):
+    match = CELL_RE.match(cell_ref)
+    if not match:
+        raise ValueError("Invalid cell reference format.")
+    rows = match.group(1)
+    field = _resolve_column(match.group(2), columns)
+
+    if rows.isdigit():
+        row_index = int(rows)
+
+        def cell(table):
+            data = table._ids if field == "id" else table._column(field)
             try:
-                return float(value) # If not int, try float
-            except (ValueError, TypeError):
-                 return value # Return as string if not a number
+                # Row numbers count live rows only; deleted ones are skipped, not compacted away
+                return _number(data[table._live_positions()[row_index] if table._dead else row_index])
+            except IndexError:
+                raise IndexError("Row index out of range.")
+
+        return cell, False
+
+    if rows in ("*", "i"):
+        first, last = 0, None
+    else:
+        first, last = (int(bound) for bound in rows.split(":"))
+        if last < first:
+            raise ValueError(f"Invalid row range {{{rows}}}.")
+
+    def cells(table):
+        # Returns the storage positions of the rows and their values.
+        data = table._ids if field == "id" else table._column(field)
+        count = len(table)
+        stop = count if last is None else last + 1
+        if stop > count:
+            raise IndexError("Row index out of range.")
+        if table._dead:
+            rows = table._live_positions()[first:stop]
+            values = [data[pos] for pos in rows]
+        else:
+            rows = range(first, stop)
+            values = data[first:stop]
+        if field != "id" and table.types.get(field, "str") == "str":
+            return rows, [_number(value) for value in values]
+        return rows, list(values)
+
+    return cells, True
+
+
+def _number(value):
+    if not isinstance(value, str): # Typed columns are already stored as numbers
+        return value
+    try:
+        return int(value)  # Attempt converting to integer
+    except ValueError:
+        try:
+            return float(value) # If not int, try float
+        except ValueError:
+            return value # Return as string if not a number
 
 
+def execute_aggregate(spec, table):
+    match = SPEC_RE.match(spec)
+    column = match.group(3)
+    if column != "*":
+        column = _resolve_column(column, table.columns) # Same names as cell references: any case, or a position
+    func = match.group(1) + (" DISTINCT" if match.group(2) else "")
+    return aggregate(table, [AggregateSpec(func, column)]).rows[0][0]
 
-    except IndexError:
-        raise IndexError("Row index out of range.")
-    except KeyError:
-        raise ValueError("Invalid column name or ID.") # More informative error message
\ No newline at end of file
+
+def evaluate_cell_reference(cell_ref, table):
+    getter, vector = _compile_cell(cell_ref, table.columns)
+    return getter(table)[1] if vector else getter(table)
@@ -0,0 +1,241 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import threading
+
+from .pyufodb import Relative_DB, Snapshot
+
+# Sharing one Relative_DB between threads (an ingest thread next to the GUI, a
+# worker pool). ConcurrentDB wraps the database with one reader/writer lock per
+# table, so any number of threads read a table at once while writes to it are
+# serialized, and work on different tables never waits. A catalog lock sits
+# above the table locks: every table operation holds it shared, while
+# operations on the whole database (create_table, transactions, snapshots,
+# flush and save) hold it exclusively.
+#
+# The locks are not reentrant: do not call back into the same ConcurrentDB
+# from inside transaction().
+
+
+class RWLock:
+    # Many readers or one writer. Waiting writers block new readers, so a
+    # steady stream of readers cannot starve them; when a writer is done the
+    # readers already waiting go first, so a stream of writers cannot starve
+    # readers either.
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_readers = 0
+        self._waiting_writers = 0
+        self._reader_turn = False
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            self._waiting_readers += 1
+            while self._writer or (self._waiting_writers and not self._reader_turn):
+                self._cond.wait()
+            self._waiting_readers -= 1
+            self._readers += 1
+            if not self._waiting_readers:
+                self._reader_turn = False
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers or self._reader_turn:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._reader_turn = self._waiting_readers > 0
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentDB:
+    def __init__(self, db: Optional[Relative_DB] = None):
+        self.db = db if db is not None else Relative_DB()
+        self._catalog = RWLock()
+        self._locks: Dict[str, RWLock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, table_name: str) -> RWLock:
+        with self._locks_guard:
+            lock = self._locks.get(table_name)
+            if lock is None:
+                lock = self._locks[table_name] = RWLock()
+            return lock
+
+    @contextmanager
+    def _writing(self, table_name: str) -> Iterator[None]:
+        with self._catalog.read_locked(), self._lock(table_name).write_locked():
+            yield
+
+    @contextmanager
+    def _reading(self, table_names: Iterable[str]) -> Iterator[None]:
+        # Reads skip tombstones and never move rows, so a shared lock on each
+        # table is enough. Locks are taken in name order.
+        names = sorted(set(table_names))
+        self._catalog.acquire_read()
+        held: List[RWLock] = []
+        try:
+            for name in names:
+                lock = self._lock(name)
+                lock.acquire_read()
+                held.append(lock)
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release_read()
+            self._catalog.release_read()
+
+    # --- whole database ------------------------------------------------------
+
+    def create_table(self, name: str, columns: List[str], types: Optional[Dict[str, str]] = None) -> None:
+        with self._catalog.write_locked():
+            self.db.create_table(name, columns, types)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Relative_DB]:
+        # Runs a block of changes alone and all or nothing; use the yielded
+        # Relative_DB inside the block.
+        with self._catalog.write_locked():
+            self.db.begin()
+            try:
+                yield self.db
+            except BaseException:
+                self.db.rollback()
+                raise
+            self.db.commit()
+
+    def snapshot(self, table_names: Optional[Iterable[str]] = None) -> Snapshot:
+        # Readers of a snapshot need no locks at all.
+        with self._catalog.write_locked():
+            return self.db.snapshot(table_names)
+
+    def table_names(self) -> List[str]:
+        with self._catalog.read_locked():
+            return list(self.db.tables)
+
+    def flush(self, progress=None, cancel=None) -> bool:
+        with self._catalog.write_locked():
+            return self.db.flush(progress, cancel)
+
+    def save_to_file(self, filename: str, version: Optional[int] = None, progress=None, cancel=None) -> bool:
+        with self._catalog.write_locked():
+            return self.db.save_to_file(filename, version, progress, cancel)
+
+    # --- reads ---------------------------------------------------------------
+
+    def get_record(self, table_name: str, record_id: int) -> Optional[Dict[str, str]]:
+        # Rows are returned as dicts: a UFORow view would read the table after
+        # the lock is released.
+        with self._reading([table_name]):
+            record = self.db._table(table_name).get_record(record_id)
+            return None if record is None else record.fields
+
+    def select_where(self, table_name: str, field_name: str, value: Any) -> List[Dict[str, str]]:
+        with self._reading([table_name]):
+            return [record.fields for record in self.db.select_where(table_name, field_name, value)]
+
+    def count(self, table_name: str) -> int:
+        with self._reading([table_name]):
+            return len(self.db._table(table_name))
+
+    def query(self, text: str):
+        from .query import parse
+        query = parse(text)
+        with self._reading([query.table] + [name for name, _, _ in query.joins]):
+            return self.db.query(text)
+
+    def join(self, left: str, right: str, left_column: str, right_column: str,
+             columns: Optional[List[str]] = None):
+        with self._reading([left, right]):
+            return self.db.join(left, right, left_column, right_column, columns)
+
+    def aggregate(self, table_name: str, specs: List[Any], group_by: Optional[List[str]] = None):
+        with self._reading([table_name]):
+            return self.db.aggregate(table_name, specs, group_by)
+
+    # --- writes --------------------------------------------------------------
+
+    def insert(self, table_name: str, record_data: Dict[str, str]) -> int:
+        with self._writing(table_name):
+            return self.db.insert(table_name, record_data)
+
+    def insert_many(self, table_name: str, rows: Iterable[Any]) -> range:
+        rows = list(rows)  # built outside the lock
+        with self._writing(table_name):
+            return self.db.insert_many(table_name, rows)
+
+    def update(self, table_name: str, record_id: int, updates: Dict[str, str]) -> None:
+        with self._writing(table_name):
+            self.db.update(table_name, record_id, updates)
+
+    def update_many(self, table_name: str, updates_by_id: Dict[int, Dict[str, str]]) -> int:
+        with self._writing(table_name):
+            return self.db.update_many(table_name, updates_by_id)
+
+    def delete_record(self, table_name: str, record_id: int) -> bool:
+        with self._writing(table_name):
+            return self.db.delete_record(table_name, record_id)
+
+    def add_column(self, table_name: str, column: str, type_name: str = "str") -> None:
+        with self._writing(table_name):
+            self.db.add_column(table_name, column, type_name)
+
+    def set_column_type(self, table_name: str, column: str, type_name: str) -> None:
+        with self._writing(table_name):
+            self.db.set_column_type(table_name, column, type_name)
+
+    def drop_column(self, table_name: str, column: str) -> None:
+        with self._writing(table_name):
+            self.db.drop_column(table_name, column)
+
+    def rename_column(self, table_name: str, old: str, new: str) -> None:
+        with self._writing(table_name):
+            self.db.rename_column(table_name, old, new)
+
+    def create_index(self, table_name: str, column: str, kind: str = "hash") -> None:
+        with self._writing(table_name):
+            self.db.create_index(table_name, column, kind)
+
+    def drop_index(self, table_name: str, column: str) -> bool:
+        with self._writing(table_name):
+            return self.db.drop_index(table_name, column)
+
+    def set_formula(self, table_name: str, record_id: int, column: str, formula: str) -> Dict[Tuple[int, str], Any]:
+        with self._writing(table_name):
+            return self.db.set_formula(table_name, record_id, column, formula)
+
+    def clear_formula(self, table_name: str, record_id: int, column: str) -> bool:
+        with self._writing(table_name):
+            return self.db.clear_formula(table_name, record_id, column)
+
+    def recalculate(self, table_name: str, changed: Optional[Iterable[Tuple[Any, str]]] = None) -> Dict[Tuple[int, str], Any]:
+        with self._writing(table_name):
+            return self.db.recalculate(table_name, changed)
@@ -1,9 +1,11 @@
 from customtkinter import *
 from tkinter import messagebox, simpledialog
 import os
-from .commands import execute_command
-from .pyufodb import Relative_DB
-from .CTkXYFrame import CTkXYFrame
+from .commands import ASSIGN_RE, execute_command
+from .query import is_query
+from .pyufodb import Relative_DB, COLUMN_TYPES
+from .background import BackgroundTask
+from .virtualGrid import VirtualGrid
 
 class DBEditor(CTkToplevel):
     def __init__(self, parent, db_file):
@@ -11,87 +13,217 @@ class DBEditor(CTkToplevel):
         self.transient(parent)
         self.title("DB Editor")
         self.db_file = db_file
-        self.db = Relative_DB()
-        if not self.db.load_from_file(self.db_file):
-            messagebox.showerror("Error", "Failed to load database file.")
-            self.destroy()
-            return
+        self.db = None
+        self.task = None # BackgroundTask while a load or save is running
+        self.controls = [] # widgets disabled while the editor is read-only
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.create_statusbar()
+        # The file is read on a worker thread so large databases don't freeze the app
+        self.run_task(f"Loading {os.path.basename(db_file)}...", self.load_database, self.on_loaded,
+                      on_cancel=self.destroy, on_error=self.on_load_error)
+
+    def load_database(self, progress, cancel):
+        db = Relative_DB()
+        if not db.load_from_file(self.db_file, progress, cancel):
+            raise IOError("Failed to load database file.")
+        return db
+
+    def on_loaded(self, db):
+        self.db = db
+        self.db.open_journal(self.db_file) # Saves append to <file>.journal instead of rewriting the file
         self.table_name = list(self.db.tables.keys())[0]
-        self.table = self.db.tables[self.table_name]
         self.create_toolbar()
         self.create_table_frame()
         self.populate_table()
         self.create_bottombar()
 
+    @property
+    def table(self):
+        # Looked up on every use: writes may replace the table with a copy (see Relative_DB.snapshot)
+        return self.db.tables[self.table_name]
+
+    def on_load_error(self, error):
+        messagebox.showerror("Error", "Failed to load database file.")
+        self.destroy()
+
+    def create_statusbar(self):
+        # Shown while a load or save runs in the background
+        self.statusbar = CTkFrame(self)
+        self.status_label = CTkLabel(self.statusbar, text="")
+        self.status_label.pack(side=LEFT, padx=5)
+        self.progress_bar = CTkProgressBar(self.statusbar)
+        self.progress_bar.pack(side=LEFT, fill=X, expand=True, padx=5)
+        CTkButton(self.statusbar, text="Cancel", width=80, command=self.cancel_task).pack(side=LEFT, padx=5)
+
+    def run_task(self, message, work, on_done, on_cancel=None, on_error=None):
+        # work(progress, cancel) runs on a worker thread; the callbacks run on the Tk thread
+        def finish(callback):
+            def finished(*args):
+                self.task = None
+                self.statusbar.pack_forget()
+                self.set_read_only(False)
+                if callback is not None:
+                    callback(*args)
+            return finished
+
+        self.set_read_only(True)
+        self.status_label.configure(text=message)
+        self.progress_bar.set(0)
+        self.statusbar.pack(side=BOTTOM, fill=X, padx=5, pady=5)
+        self.task = BackgroundTask(self, work, finish(on_done), on_error=finish(on_error or self.show_task_error),
+                                   on_progress=self.progress_bar.set, on_cancel=finish(on_cancel)).start()
+
+    def cancel_task(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.status_label.configure(text="Cancelling...")
+
+    def show_task_error(self, error):
+        messagebox.showerror("Error", str(error))
+
+    def set_read_only(self, read_only):
+        if hasattr(self, "table_frame"):
+            if read_only:
+                self.table_frame.end_edit()
+            self.table_frame.read_only = read_only
+        for widget in self.controls:
+            widget.configure(state="disabled" if read_only else "normal")
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel() # Stops a checkpoint early; the journal already holds every change
+        self.destroy()
+
+    def flush_changes(self, on_done=None):
+        # Appending to the journal is quick, but a flush may also rewrite the
+        # whole file, so it runs in the background with the editor read-only.
+        if self.db.needs_checkpoint():
+            self.db.prepare_save() # In-memory preparation stays on this thread; the worker only reads
+
+        def flushed(ok):
+            if not ok:
+                messagebox.showerror("Error", "Failed to write changes to disk.")
+            elif on_done is not None:
+                on_done()
+
+        def cancelled():
+            messagebox.showinfo("Save cancelled", "The changes are kept in the journal and will be written on the next save.")
+
+        self.run_task("Saving...", self.db.flush, flushed, on_cancel=cancelled)
+
     def create_toolbar(self):
         toolbar = CTkFrame(self)
         toolbar.pack(fill=X, padx=5, pady=5)
-        CTkButton(toolbar, text="Save", command=self.save_changes).pack(side=LEFT, padx=5)
-        CTkButton(toolbar, text="Add Row", command=self.add_row).pack(side=LEFT, padx=5)
-        CTkButton(toolbar, text="Add Column", command=self.add_column).pack(side=LEFT, padx=5)
+        for text, command in (("Save", self.save_changes), ("Add Row", self.add_row), ("Add Column", self.add_column)):
+            button = CTkButton(toolbar, text=text, command=command)
+            button.pack(side=LEFT, padx=5)
+            self.controls.append(button)
+        self.table_menu = CTkOptionMenu(toolbar, values=list(self.db.tables), command=self.switch_table)
+        self.table_menu.set(self.table_name)
+        self.table_menu.pack(side=RIGHT, padx=5)
+        self.controls.append(self.table_menu)
+
+    def switch_table(self, table_name):
+        if table_name == self.table_name:
+            return
+        self.table_frame.end_edit()
+        if (self.pending or self.pending_headers) and not messagebox.askyesno(
+                "Unsaved changes", "Discard the unsaved edits in this table?"):
+            self.table_menu.set(self.table_name)
+            return
+        self.table_name = table_name
+        self.pending = {}
+        self.pending_headers = {}
+        self.table_frame.reset()
+        self.result_label.configure(text="")
 
 
 
     def add_column(self):
-        new_column_name = simpledialog.askstring("Add Column", "Enter new column name:")
+        new_column_name = simpledialog.askstring("Add Column", "Enter new column name (name or name:int, name:float, name:bool):")
         if new_column_name:
+            column_type = "str"
+            name, _, suffix = new_column_name.rpartition(":")
+            if name and suffix in COLUMN_TYPES:
+                new_column_name, column_type = name, suffix
             if new_column_name in self.table.columns:
                 messagebox.showwarning("Column Exists", "A column with that name already exists.")
                 return
 
-            self.table.columns.append(new_column_name) # Add to table's columns
+            self.db.add_column(self.table_name, new_column_name, column_type) # Add to table's columns
 
-            # Update the database file (important!)
-            self.db.tables[self.table_name] = self.table  # Update the table in the database
-            self.db.save_to_file(self.db_file) # Save to ensure it remains consistent
-
-            self.populate_table() # Refresh display
+            self.table_frame.columns_inserted(len(self.table.columns) - 1) # Draw only the new column
+            self.flush_changes() # Journal the change to keep the file consistent
 
     def create_table_frame(self):
-        self.table_frame = CTkXYFrame(self)
+        # Only the visible cells are drawn, so large tables open instantly
+        self.table_frame = VirtualGrid(self, row_count=lambda: len(self.table.records),
+                                       columns=lambda: self.table.columns + ["id"],
+                                       cell_text=self.cell_text, edit_text=self.edit_text, cell_color=self.cell_color,
+                                       on_edit=self.on_cell_edit, on_row_double_click=self.confirm_delete_row,
+                                       on_header_double_click=self.confirm_delete_column)
         self.table_frame.pack(fill=BOTH, expand=True, padx=5, pady=5)
 
-        self.entry_grid = {}
+        self.pending = {} # (record id, column) -> text edited since the last save
+        self.pending_headers = {} # column index -> new column name
+
+    def cell_key(self, row, col_index):
+        return self.table.records[row].record_id, (self.table.columns + ["id"])[col_index]
+
+    def cell_text(self, row, col_index):
+        if row < 0:
+            return self.pending_headers.get(col_index, (self.table.columns + ["id"])[col_index])
+        record_id, column = self.cell_key(row, col_index)
+        if (record_id, column) in self.pending:
+            return self.pending[(record_id, column)]
+        return self.table.get_record(record_id).get_field(column)
+
+    def edit_text(self, row, col_index):
+        # Formula cells display their value but are edited as the formula
+        if row >= 0:
+            key = self.cell_key(row, col_index)
+            if key not in self.pending and key in self.table.formulas:
+                return self.table.formulas[key]
+        return self.cell_text(row, col_index)
+
+    def cell_color(self, row, col_index):
+        if row < 0:
+            return ("#c25700", "#ffb454") if col_index in self.pending_headers else None
+        key = self.cell_key(row, col_index)
+        if key in self.pending:
+            return ("#c25700", "#ffb454") # Unsaved edit
+        if key in self.table.formulas:
+            return ("#1f6aa5", "#6fb3ff")
+        return None
+
+    def on_cell_edit(self, row, col_index, text):
+        if col_index >= len(self.table.columns): # The id column is not editable
+            return
+        if row < 0:
+            self.pending_headers[col_index] = text
+        else:
+            self.pending[self.cell_key(row, col_index)] = text
+
+    def report_formula_errors(self):
+        errors = self.db.formula_errors(self.table_name)
+        if errors:
+            details = "\n".join(f"{column} (id {record_id}): {message}" for (record_id, column), message in errors.items())
+            messagebox.showwarning("Formula errors", details)
+
+    def recalculate_formulas(self, changed=None):
+        # Recomputes the formula cells that depend on the changed (id, column)
+        # cells, or all of them; returns True when any were written
+        if not self.table.formulas:
+            return False
+        return bool(self.db.recalculate(self.table_name, changed))
 
     def populate_table(self):
-        # Clear the inner frame's children, not the canvas
-        for child in self.table_frame.winfo_children():
-            child.destroy()
-
-        columns = self.table.columns + ["id"]
-
-        for j, col in enumerate(columns):
-            textbox = CTkTextbox(self.table_frame, width=100, height=25, wrap="word")  # Add to inner frame
-            textbox.insert("0.0", col)
-            textbox.grid(row=0, column=j, padx=2, pady=2, sticky="nsew")
-            self.entry_grid[(-1, j)] = textbox
-            textbox.bind("<Double-Button-1>", lambda event, col_index=j: self.confirm_delete_column(col_index))
-
-        for i, record in enumerate(self.table.records):
-            for j, col in enumerate(columns):
-                textbox = CTkTextbox(self.table_frame, width=100, height=25, wrap="word") # Add to inner frame
-                textbox.insert("0.0", record.get_field(col))
-                textbox.grid(row=i + 1, column=j, padx=2, pady=2, sticky="nsew")
-                self.entry_grid[(i, j)] = textbox
-                textbox.bind("<Double-Button-1>", lambda event, row_index=i: self.confirm_delete_row(row_index))
-
-        # Configure inner frame's rows and columns, not canvas
-        for i in range(len(self.table.records) + 1):
-            self.table_frame.rowconfigure(i, weight=1) 
-        for j in range(len(columns)):
-            self.table_frame.columnconfigure(j, weight=1)
-
-    def confirm_delete_row(self, row):
-        if messagebox.askyesno("Подтверждение удаления", "Вы уверены, что хотите удалить эту строку?"):
-            try:
-                record_id = int(self.entry_grid[(row - 1, len(self.table.columns))].get("1.0", "end-1c"))
-                if self.db.delete_record(self.table_name, record_id):
-                    self.populate_table()
-                    messagebox.showinfo("Успешно", "Запись успешно удалена.")
-                else:
-                    messagebox.showerror("Ошибка", "Не удалось удалить запись.")
-            except ValueError:
-                messagebox.showerror("Ошибка", "Неверный ID записи.")
+        # Unsaved edits are keyed by record id, so they survive a refresh
+        # unless their row or column is gone.
+        self.pending = {(record_id, column): text for (record_id, column), text in self.pending.items()
+                        if column in self.table.columns and self.table.get_record(record_id) is not None}
+        self.pending_headers = {j: name for j, name in self.pending_headers.items() if j < len(self.table.columns)}
+        self.table_frame.refresh()
 
     def confirm_delete_column(self, col_index):
         if messagebox.askyesno("Подтверждение удаления", "Вы уверены, что хотите удалить этот столбец?"):
@@ -102,26 +234,22 @@ class DBEditor(CTkToplevel):
                     messagebox.showwarning("Ошибка", "Нельзя удалить столбец 'id'.")
                     return
                 
-                del self.table.columns[col_index]
-
-                for record in self.table.records:
-                    if col_name in record.fields:
-                        del record.fields[col_name]
-
-
-                self.db.tables[self.table_name] = self.table  
-                self.db.save_to_file(self.db_file)
-                self.populate_table()
+                self.db.drop_column(self.table_name, col_name)
+                self.pending = {key: text for key, text in self.pending.items() if key[1] != col_name}
+                self.pending_headers = {j - (j > col_index): name for j, name in self.pending_headers.items() if j != col_index}
+                self.table_frame.columns_removed(col_index) # Later columns shift left
+                self.flush_changes()
                 messagebox.showinfo("Успешно", "Столбец успешно удален.")
 
             except IndexError:
                 messagebox.showerror("Ошибка", "Неверный индекс столбца.")
             
     def save_changes(self):
+        self.table_frame.end_edit()
         # Save column names (header row)
         updated_columns = []
         for j, col in enumerate(self.table.columns + ["id"]):  # Include "id"
-            new_col_name = self.entry_grid[(-1, j)].get("1.0", "end-1c") #get column name
+            new_col_name = self.pending_headers.get(j, col) #get column name
             updated_columns.append(new_col_name)
 
         #Check for duplicate and empty column names after edit
@@ -132,35 +260,79 @@ class DBEditor(CTkToplevel):
                 return # Stop saving if there are issues
             seen.add(name)
         # Proceed with saving column names and data if there are no errors
-        self.table.columns = updated_columns[:-1] # Update column list (exclude "id")
-
-        for i, record in enumerate(self.table.records):
-            updates = {}
-            for j, col in enumerate(self.table.columns):
-                 value = self.entry_grid.get((i,j)).get("1.0", "end-1c")
-                 updates[col] = value
-
-            try:
-                self.db.update(self.table_name, int(record.get_field('id')), updates)
-            except (ValueError, RuntimeError) as e:
-                messagebox.showerror("Error saving changes:", str(e))
-                return
+        renamed = dict(zip(self.table.columns, updated_columns[:-1])) # Exclude "id"
+        # Pending edits were keyed by the old column names
+        pending = {(record_id, renamed.get(column, column)): text for (record_id, column), text in self.pending.items()}
+
+        # Only cells that were actually edited are written, in one batch;
+        # text starting with "=" is stored as a formula cell.
+        updates = {}
+        formulas = {}
+        for (record_id, column), value in pending.items():
+            if value.startswith("="):
+                formulas[(record_id, column)] = value
+            else:
+                updates.setdefault(record_id, {})[column] = value
+
+        # All or nothing: a failure rolls the table back and keeps the edits pending
+        self.db.begin()
+        try:
+            # Through temporary names first, so columns can swap names (a -> b, b -> a)
+            changed = {old_name: new_name for old_name, new_name in renamed.items() if old_name != new_name}
+            temporary = {}
+            for old_name in changed:
+                temp_name = old_name + "~"
+                while temp_name in self.table.columns or temp_name in seen:
+                    temp_name += "~"
+                self.db.rename_column(self.table_name, old_name, temp_name)
+                temporary[temp_name] = changed[old_name]
+            for temp_name, new_name in temporary.items():
+                self.db.rename_column(self.table_name, temp_name, new_name)
+            self.db.update_many(self.table_name, updates)
+            for record_id, row in updates.items():
+                for column in row:
+                    self.db.clear_formula(self.table_name, record_id, column)
+            for (record_id, column), formula in formulas.items():
+                self.db.set_formula(self.table_name, record_id, column, formula)
+            edited = [(record_id, column) for record_id, row in updates.items() for column in row]
+            self.db.recalculate(self.table_name, edited)
+        except (ValueError, RuntimeError, IndexError) as e:
+            self.db.rollback()
+            self.table_frame.refresh()
+            messagebox.showerror("Error saving changes:", str(e))
+            return
+        except BaseException:
+            self.db.rollback() # Never leave the transaction open, whatever went wrong
+            raise
+        self.db.commit()
+        self.pending.clear()
+        self.pending_headers.clear()
+        self.table_frame.refresh()
+        self.report_formula_errors()
 
-        self.db.tables[self.table_name] = self.table  # Very important: update table in DB
-        self.db.save_to_file(self.db_file)
-        messagebox.showinfo("Success", "Changes saved successfully.")
+        self.flush_changes(lambda: messagebox.showinfo("Success", "Changes saved successfully."))
 
     def add_row(self):
         new_record_data = {col: "" for col in self.table.columns}
-        self.db.insert(self.table_name, new_record_data)
-        self.populate_table()
+        record_id = self.db.insert(self.table_name, new_record_data)
+        row = len(self.table.records) - 1
+        # Only formulas reading the new row's cells (ranges and aggregates over its columns) change
+        if self.recalculate_formulas([(record_id, column) for column in self.table.columns + ["id"]]):
+            self.populate_table()
+        else:
+            self.table_frame.rows_inserted(row) # Draw only the new row
+        self.table_frame.scroll_to(row)
 
     def confirm_delete_row(self, row_index):
         if messagebox.askyesno("Подтверждение удаления", "Вы уверены, что хотите удалить эту строку?"):
             try:
                 record_id = int(self.table.records[row_index].get_field("id")) # Get ID directly from the record
                 if self.db.delete_record(self.table_name, record_id):
-                    self.populate_table()
+                    self.pending = {key: text for key, text in self.pending.items() if key[0] != record_id}
+                    if self.recalculate_formulas():
+                        self.populate_table()
+                    else:
+                        self.table_frame.rows_removed(row_index) # Later rows shift up
                     messagebox.showinfo("Успешно", "Запись успешно удалена.")
                 else:
                     messagebox.showerror("Ошибка", "Не удалось удалить запись.")
@@ -178,12 +350,36 @@ class DBEditor(CTkToplevel):
         self.command_entry = CTkEntry(bottombar)
         self.command_entry.pack(side=LEFT, fill=X, expand=True, padx=5)
         self.command_entry.bind("<Return>", self.execute_bottombar_command) # Bind Enter key
+        self.controls.append(self.command_entry)
 
 
+    def show_query_result(self, command, result):
+        window = CTkToplevel(self)
+        window.title(command[:60])
+        window.geometry("700x400")
+        window.transient(self)
+        textbox = CTkTextbox(window, wrap="none", font=("Courier New", 12))
+        textbox.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        textbox.insert("0.0", result.format())
+        textbox.configure(state="disabled")
+
     def execute_bottombar_command(self, event=None):
         command = self.command_entry.get()
         try:
-            result = execute_command(command, self.table) # Pass the table to the command executor
-            self.result_label.configure(text=str(result))
+            if is_query(command): # SELECT ... queries go to the query engine
+                result = self.db.query(command)
+                self.result_label.configure(text=f"{len(result)} rows")
+                self.show_query_result(command, result)
+                return
+            result = execute_command(command, self.table, self.db) # Pass the table to the command executor
+            if ASSIGN_RE.match(command): # c = {i}a * {i}b wrote a whole column
+                self.populate_table()
+                self.flush_changes()
+                self.result_label.configure(text=f"{result} rows updated")
+            elif isinstance(result, list): # Range formula: one value per row
+                preview = ", ".join(str(value) for value in result[:5])
+                self.result_label.configure(text=f"{len(result)} values: {preview}" + (", ..." if len(result) > 5 else ""))
+            else:
+                self.result_label.configure(text=str(result))
         except (ValueError, TypeError, Exception) as e:  # Catch potential errors during command execution
             self.result_label.configure(text="Error: " + str(e))
@@ -0,0 +1,176 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .aggregate import SPEC_RE
+from .commands import compile_formula, formula_references
+from .pyufodb import UFOTable
+
+# Formula cells: a table cell can hold a formula (the same ={row}col syntax as
+# the editor's command bar, or an aggregate such as =SUM(col)) whose result is
+# stored as the cell's value. The formulas themselves live in table.formulas,
+# keyed by (record id, column), and are saved with the file.
+#
+# FormulaGraph links every formula cell to the cells it reads; a formula that
+# reads a whole column (aggregates, ranges) depends on every cell in it. After
+# an edit only the formula cells reachable from the changed cells are
+# evaluated again, in topological order. Cycles are rejected when a formula
+# is set; one that appears later (row references are positions, so deleting a
+# row can close a loop) only marks the cells on it as errors.
+
+Cell = Tuple[int, str]  # (record id, column)
+
+
+class FormulaGraph:
+    def __init__(self, table: UFOTable):
+        self.table = table
+        self.errors: Dict[Cell, str] = {}  # formula cells that failed in the last recalculation
+        self._built_for: Optional[tuple] = None
+        self._formulas: Dict[Cell, str] = {}
+        self._cell_dependents: Dict[Cell, Set[Cell]] = {}
+        self._column_dependents: Dict[str, Set[Cell]] = {}
+        self._order: Dict[Cell, int] = {}
+        self._cyclic: Set[Cell] = set()
+        self._broken: Dict[Cell, str] = {}  # formulas that no longer parse, e.g. after a column was renamed
+
+    def _shape(self) -> tuple:
+        # Row references count live rows, so inserts, deletes and compaction
+        # (next_id, _ids and _dead) as well as schema changes need a rebuild.
+        table = self.table
+        return table.next_id, len(table._ids), table._dead, tuple(table.columns)
+
+    def _ensure_built(self) -> None:
+        if self._built_for != self._shape() or self._formulas != self.table.formulas:
+            self._build(dict(self.table.formulas), strict=False)
+
+    def _build(self, formulas: Dict[Cell, str], strict: bool = True) -> None:
+        table = self.table
+        live = table._live_positions() if table._dead else range(len(table._ids))
+        cell_dependents: Dict[Cell, Set[Cell]] = {}
+        column_dependents: Dict[str, Set[Cell]] = {}
+        broken: Dict[Cell, str] = {}
+        for cell, text in formulas.items():
+            try:
+                references = formula_references(text, table.columns)
+            except (ValueError, IndexError) as e:
+                if strict:
+                    raise
+                broken[cell] = str(e)
+                continue
+            for row, column in references:
+                if row is None:
+                    column_dependents.setdefault(column, set()).add(cell)
+                elif row < len(live):
+                    cell_dependents.setdefault((table._ids[live[row]], column), set()).add(cell)
+
+        def dependents(cell: Cell) -> Set[Cell]:
+            return cell_dependents.get(cell, set()) | column_dependents.get(cell[1], set())
+
+        # Kahn's algorithm over the formula cells; whatever is left unordered
+        # sits on (or behind) a cycle.
+        indegree = dict.fromkeys(formulas, 0)
+        for cell in formulas:
+            for dependent in dependents(cell):
+                indegree[dependent] += 1
+        ready = [cell for cell, degree in indegree.items() if degree == 0]
+        order: Dict[Cell, int] = {}
+        while ready:
+            cell = ready.pop()
+            order[cell] = len(order)
+            for dependent in dependents(cell):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+        cyclic = {cell for cell in formulas if cell not in order}
+        # Cells that merely depend on a cycle are peeled off from the end.
+        trimmed = True
+        while trimmed:
+            trimmed = False
+            for cell in list(cyclic):
+                if not dependents(cell) & cyclic:
+                    cyclic.discard(cell)
+                    trimmed = True
+        if cyclic and strict:
+            names = ", ".join(f"{column} of id {record_id}" for record_id, column in sorted(cyclic)[:5])
+            raise ValueError(f"Circular reference between formula cells: {names}" + (", ..." if len(cyclic) > 5 else ""))
+        for cell in formulas:
+            order.setdefault(cell, len(order))
+
+        self._formulas = formulas
+        self._cell_dependents = cell_dependents
+        self._column_dependents = column_dependents
+        self._order = order
+        self._cyclic = cyclic
+        self._broken = broken
+        self._built_for = self._shape()
+
+    def set_formula(self, record_id: int, column: str, text: str) -> None:
+        table = self.table
+        if column not in table.columns:
+            raise RuntimeError(f"Column {column} does not exist in table {table.name}.")
+        if table.get_record(record_id) is None:
+            raise RuntimeError(f"Record with id {record_id} not found.")
+        text = text.strip()
+        references = formula_references(text, table.columns)
+        if not SPEC_RE.match(text[1:]) and any(row is None for row, _ in references):
+            raise ValueError("A range formula yields one value per row; assign it to a column instead.")
+        formulas = dict(table.formulas)
+        formulas[(record_id, column)] = text
+        self._build(formulas)  # raises before anything is stored if the formula closes a cycle
+        table.formulas[(record_id, column)] = text
+
+    def clear_formula(self, record_id: int, column: str) -> bool:
+        return self.table.formulas.pop((record_id, column), None) is not None
+
+    def dependents(self, changed: Iterable[Tuple[Any, str]]) -> Set[Cell]:
+        # Every formula cell reachable from the changed cells; (None, column)
+        # stands for a change to the whole column.
+        self._ensure_built()
+        affected: Set[Cell] = set()
+        stack = list(changed)
+        while stack:
+            record_id, column = stack.pop()
+            found = set(self._column_dependents.get(column, ()))
+            if record_id is None:
+                for (_, source_column), cells in self._cell_dependents.items():
+                    if source_column == column:
+                        found |= cells
+            else:
+                found |= self._cell_dependents.get((record_id, column), set())
+            for cell in found - affected:
+                affected.add(cell)
+                stack.append(cell)
+        return affected
+
+    def recalculate(self, changed: Optional[Iterable[Tuple[Any, str]]] = None,
+                    include_changed: bool = False) -> Dict[Cell, Any]:
+        # Evaluates the affected formula cells in dependency order, writes the
+        # results into the table and returns {cell: stored value}.
+        self._ensure_built()
+        table = self.table
+        if changed is None:
+            affected = set(table.formulas)
+        else:
+            changed = list(changed)
+            affected = self.dependents(changed)
+            if include_changed:
+                affected.update(cell for cell in changed if cell in table.formulas)
+        self.errors = {}
+        values: Dict[Cell, Any] = {}
+        for cell in sorted(affected, key=self._order.__getitem__):
+            record_id, column = cell
+            if cell in self._cyclic or cell in self._broken:
+                self.errors[cell] = self._broken.get(cell, "Circular reference.")
+                continue
+            try:
+                value = compile_formula(table.formulas[cell], table.columns)(table)
+                if isinstance(value, list):
+                    raise ValueError("A range formula yields one value per row.")
+                table.update_record(record_id, {column: value})
+            except (ValueError, TypeError, IndexError, ZeroDivisionError, RuntimeError) as e:
+                self.errors[cell] = str(e)
+                continue
+            values[cell] = table._native(table._index[record_id], column)
+        return values
+
+    def cells(self) -> List[Cell]:
+        self._ensure_built()
+        return sorted(self.table.formulas, key=self._order.__getitem__)
@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+
+
+class Journal:
+    # Append-only log of Relative_DB operations kept next to a .ufo file.
+    # Each flush appends one batch of JSON lines between a begin and a commit
+    # marker, both carrying the batch's sequence number. Operations outside
+    # such a pair were cut short by a crash and are ignored when the log is
+    # read, also when a later batch follows them.
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def path_for(filename: str) -> str:
+        return filename + ".journal"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, ops: List[Dict], lsn: int) -> None:
+        lines = [json.dumps({"op": "begin", "lsn": lsn})]
+        lines.extend(json.dumps(op, ensure_ascii=False) for op in ops)
+        lines.append(json.dumps({"op": "commit", "lsn": lsn}))
+        with open(self.path, 'ab') as f:
+            # A torn last line from an earlier crash must not swallow this batch.
+            if f.tell() and not self._ends_with_newline():
+                f.write(b'\n')
+            f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def read(self) -> List[Tuple[Optional[int], List[Dict]]]:
+        # Committed batches as (sequence number, operations); the number is
+        # None for batches written before they were numbered.
+        committed = []
+        batch = []
+        begun = None  # sequence number of the open batch's begin marker
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    batch = []
+                    begun = None
+                    continue
+                kind = op.get("op")
+                if kind == "begin":
+                    batch = []  # anything before it was never committed
+                    begun = op.get("lsn")
+                elif kind == "commit":
+                    lsn = op.get("lsn")
+                    if lsn is None or lsn == begun:
+                        committed.append((lsn, batch))
+                    batch = []
+                    begun = None
+                else:
+                    batch.append(op)
+        return committed
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,10 +1,40 @@
+import os
 import tkinter as tk
 import customtkinter as ctk
-from PIL import Image
-from .account import UserProfileApp
-from .ui import DatabaseApp 
+from .catalog import SavesCatalog
 from .otherFunc import openPrivacyPolicy, openTermsofUse
 
+# The account window and the database app (which brings the editor and the
+# AI client with it) are imported when first opened, not at start-up.
+
+SPLASH_SOURCE = "ufo.jpg"
+SPLASH_SIZE = (200, 200)
+SPLASH_CACHE = os.path.join("src", "cache", "ufo_200x200.png")
+
+
+def load_splash():
+    # ufo.jpg is decoded and scaled once and kept as a small PNG; later starts
+    # read that instead, until ufo.jpg changes.
+    from PIL import Image
+    try:
+        source_mtime = os.path.getmtime(SPLASH_SOURCE) if os.path.exists(SPLASH_SOURCE) else 0
+        if os.path.getmtime(SPLASH_CACHE) >= source_mtime:
+            image = Image.open(SPLASH_CACHE)
+            image.load()
+            return image
+    except OSError:
+        pass
+    image = Image.open(SPLASH_SOURCE)
+    image.draft("RGB", SPLASH_SIZE)  # JPEG: decode at a reduced scale
+    image = image.convert("RGB").resize(SPLASH_SIZE, Image.LANCZOS)
+    try:
+        os.makedirs(os.path.dirname(SPLASH_CACHE), exist_ok=True)
+        image.save(SPLASH_CACHE)
+    except OSError:
+        pass  # read-only install: scale again next time
+    return image
+
+
 class StartWindow(ctk.CTk):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -25,9 +55,8 @@ class StartWindow(ctk.CTk):
         frame.pack(pady=(50, 20))  
 
         try:
-            image = ctk.CTkImage(light_image=Image.open("ufo.jpg"),
-                                 dark_image=Image.open("ufo.jpg"),  
-                                 size=(200, 200))
+            splash = load_splash()
+            image = ctk.CTkImage(light_image=splash, dark_image=splash, size=SPLASH_SIZE)
         except Exception as e:
             print(f"Error loading image: {e}")
             image = None
@@ -36,7 +65,8 @@ class StartWindow(ctk.CTk):
             image_label = ctk.CTkLabel(frame, image=image, text="")
             image_label.pack(pady=(10, 10))
 
-        label = ctk.CTkLabel(frame, text="\nКол-во созданых DB:\n3\n", font=("Helvetica", 18), text_color="white")
+        db_count = SavesCatalog("src/saves").count()
+        label = ctk.CTkLabel(frame, text=f"\nКол-во созданых DB:\n{db_count}\n", font=("Helvetica", 18), text_color="white")
         label.pack(expand=True) 
 
         start_button = ctk.CTkButton(self, text="НАЧАТЬ", width=200, corner_radius=20, font=("Helvetica", 16), 
@@ -69,10 +99,12 @@ class StartWindow(ctk.CTk):
         account_canvas.bind("<Button-1>", lambda e: self.openAccount())
 
     def openAccount(self):
+        from .account import UserProfileApp
         self.profile_window = UserProfileApp(self) 
         self.profile_window.grab_set()
 
     def open_database_app(self):
+        from .ui import DatabaseApp
         database_app = DatabaseApp(self)
         self.withdraw()
 
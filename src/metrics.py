@@ -0,0 +1,268 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+from .pyufodb import Relative_DB, UFOTable
+
+# Operation metrics for Relative_DB and UFOTable: per operation and table, the
+# number of calls and failures, a latency histogram, and the rows (and for
+# load, save and flush the bytes) read or written.
+#
+#   from src import metrics
+#   metrics.enable()
+#   ...
+#   print(metrics.report())
+#   metrics.export_json("metrics.json")
+#
+# enable() wraps the methods on the classes and disable() puts the originals
+# back, so while metrics are off the engine runs its own code without a single
+# extra check. Set UFODB_METRICS=1 to enable them when pyufodb is imported.
+
+BUCKETS = 24  # latency histogram: < 1 us, < 2 us, < 4 us, ..., the last one open-ended
+
+
+class OperationStats:
+    __slots__ = ("calls", "errors", "total", "max", "rows", "bytes", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, elapsed: float, rows: int, nbytes: int, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.rows += rows
+        self.bytes += nbytes
+        self.histogram[min(int(elapsed * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the histogram bucket holding the percentile, in seconds.
+        wanted = fraction * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= wanted:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_s": self.total,
+            "mean_s": self.total / self.calls if self.calls else 0.0,
+            "p50_s": self.percentile(0.5),
+            "p99_s": self.percentile(0.99),
+            "max_s": self.max,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            # bucket i counts calls under 2**i microseconds
+            "histogram_us": {f"<{1 << i}" if i < BUCKETS - 1 else f">={1 << (i - 1)}": count
+                             for i, count in enumerate(self.histogram) if count},
+        }
+
+
+_stats: Dict[Tuple[str, str], OperationStats] = {}  # (operation, table) -> stats
+_lock = threading.Lock()
+_originals: Dict[Tuple[type, str], Callable] = {}
+_since: Optional[float] = None
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _count(result: Any) -> int:
+    return 0 if result is None else len(result)
+
+
+def _db_rows(db: Relative_DB) -> int:
+    return sum(len(table) for table in db.tables.values())
+
+
+def _saved(db, args, result, before) -> Tuple[int, int]:
+    return (_db_rows(db), _file_size(args[0])) if result else (0, 0)
+
+
+def _journal_size(db) -> int:
+    return db.journal.size() if db.journal is not None else 0
+
+
+# method -> (table of the call, rows and bytes of the call, state taken before
+# the call). The table is "arg" (the first argument), "self" (UFOTable.name) or
+# None for the whole database; the counter gets (self, args, result, before).
+_RELATIVE_DB = {
+    "insert": ("arg", lambda db, args, result, before: (1, 0), None),
+    "insert_many": ("arg", lambda db, args, result, before: (len(result), 0), None),
+    "select_where": ("arg", lambda db, args, result, before: (len(result), 0), None),
+    "select_range": ("arg", lambda db, args, result, before: (len(result), 0), None),
+    "update": ("arg", lambda db, args, result, before: (1, 0), None),
+    "update_many": ("arg", lambda db, args, result, before: (result, 0), None),
+    "delete_record": ("arg", lambda db, args, result, before: (int(result), 0), None),
+    "query": (None, lambda db, args, result, before: (len(result), 0), None),
+    "join": ("arg", lambda db, args, result, before: (len(result), 0), None),
+    "aggregate": ("arg", lambda db, args, result, before: (len(result), 0), None),
+    "save_to_file": (None, _saved, None),
+    "load_from_file": (None, _saved, None),
+    # rows: operations written; bytes: journal growth (0 when it ends in a checkpoint)
+    "flush": (None, lambda db, args, result, before: (before[0], max(0, _journal_size(db) - before[1])),
+              lambda db: (len(db._pending), _journal_size(db))),
+    "checkpoint": (None, lambda db, args, result, before: (_db_rows(db), _file_size(db.journal_base or "")), None),
+}
+
+_UFO_TABLE = {
+    "get_record": ("self", lambda table, args, result, before: (result is not None, 0), None),
+    "insert_record": ("self", lambda table, args, result, before: (1, 0), None),
+    "insert_many": ("self", lambda table, args, result, before: (len(result), 0), None),
+    "select_where": ("self", lambda table, args, result, before: (_count(result), 0), None),
+    "select_range": ("self", lambda table, args, result, before: (_count(result), 0), None),
+    "select_prefix": ("self", lambda table, args, result, before: (_count(result), 0), None),
+    "update_record": ("self", lambda table, args, result, before: (1, 0), None),
+    "update_many": ("self", lambda table, args, result, before: (result, 0), None),
+    "delete_record": ("self", lambda table, args, result, before: (int(result), 0), None),
+    # rows: tombstones dropped
+    "_compact": ("self", lambda table, args, result, before: (before, 0), lambda table: table._dead),
+}
+
+
+def _wrap(cls: type, name: str, table_of: Optional[str], counter: Callable, prepare: Optional[Callable]):
+    method = cls.__dict__[name]
+    operation = f"{cls.__name__}.{name.lstrip('_')}"
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Counters read the arguments by position, so keyword arguments are
+        # bound to theirs; the method itself gets the call unchanged.
+        positional = args
+        if kwargs:
+            try:
+                bound = signature.bind(self, *args, **kwargs)
+                bound.apply_defaults()
+                positional = tuple(bound.arguments.values())[1:]
+            except TypeError:
+                pass  # the call itself fails the same way below
+        if table_of == "self":
+            table = self.name
+        elif table_of == "arg":
+            table = positional[0] if positional else ""
+        else:
+            table = ""
+        before = prepare(self) if prepare is not None else None
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            _record(operation, table, time.perf_counter() - start, 0, 0, True)
+            raise
+        elapsed = time.perf_counter() - start
+        rows, nbytes = counter(self, positional, result, before)
+        _record(operation, table, elapsed, int(rows), nbytes, False)
+        return result
+
+    return method, wrapper
+
+
+def _record(operation: str, table: str, elapsed: float, rows: int, nbytes: int, failed: bool) -> None:
+    with _lock:
+        stats = _stats.get((operation, table))
+        if stats is None:
+            stats = _stats[(operation, table)] = OperationStats()
+        stats.add(elapsed, rows, nbytes, failed)
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    global _since
+    if _originals:
+        return
+    for cls, methods in ((Relative_DB, _RELATIVE_DB), (UFOTable, _UFO_TABLE)):
+        for name, (table_of, counter, prepare) in methods.items():
+            original, wrapper = _wrap(cls, name, table_of, counter, prepare)
+            _originals[(cls, name)] = original
+            setattr(cls, name, wrapper)
+    if _since is None:
+        _since = time.time()
+
+
+def disable() -> None:
+    # Collected numbers are kept until reset().
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def reset() -> None:
+    global _since
+    with _lock:
+        _stats.clear()
+    _since = time.time() if _originals else None
+
+
+def snapshot() -> Dict[str, Any]:
+    # Everything collected so far, slowest (by total time) first.
+    with _lock:
+        items = [(operation, table, stats.as_dict()) for (operation, table), stats in _stats.items()]
+    items.sort(key=lambda item: item[2]["total_s"], reverse=True)
+    return {
+        "enabled": enabled(),
+        "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(_since)) if _since else None,
+        "operations": [dict(operation=operation, table=table, **stats) for operation, table, stats in items],
+    }
+
+
+def export_json(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=1)
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds * 1e6:.0f} us"
+
+
+def _format_bytes(count: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+def report(limit: int = 20) -> str:
+    # Plain-text summary of the slowest operations, for the Statistics panel.
+    data = snapshot()
+    if not data["operations"]:
+        return "Metrics are on; no operations yet." if data["enabled"] else "Metrics are off."
+    lines: List[str] = [f"Since {data['since']}" + ("" if data["enabled"] else " (paused)")]
+    for entry in data["operations"][:limit]:
+        where = f" [{entry['table']}]" if entry["table"] else ""
+        line = (f"{entry['operation']}{where}: {entry['calls']} calls, total {_format_time(entry['total_s'])}, "
+                f"p50 {_format_time(entry['p50_s'])}, p99 {_format_time(entry['p99_s'])}, "
+                f"max {_format_time(entry['max_s'])}, {entry['rows']} rows")
+        if entry["bytes"]:
+            line += f", {_format_bytes(entry['bytes'])}"
+        if entry["errors"]:
+            line += f", {entry['errors']} failed"
+        lines.append(line)
+    if len(data["operations"]) > limit:
+        lines.append(f"... {len(data['operations']) - limit} more in the JSON export")
+    return "\n".join(lines)
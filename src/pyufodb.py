@@ -1,147 +1,1270 @@
-from typing import Dict, List, Any
-import os
-
-class UFORecords:
-    def __init__(self):
-        self.fields = {}
-
-    def get_field(self, field_name: str) -> str:
-        return self.fields.get(field_name, "")
-
-    def add(self, field_name: str, value: str) -> None:
-        self.fields[field_name] = value
-
-    def __repr__(self) -> str:
-        return str(self.fields)
-
-
-class UFOTable:
-    def __init__(self, table_name: str, columns: List[str]):
-        self.name = table_name
-        self.columns = columns
-        self.records = []
-        self.next_id = 1
-
-    def insert_record(self, record_data: Dict[str, str]) -> None:
-        new_record = UFORecords()
-        for key, value in record_data.items():
-            new_record.add(key, value)
-        new_record.add("id", str(self.next_id))
-        self.next_id += 1
-        self.records.append(new_record)
-
-    def select_all(self) -> None:
-        self._print_header()
-        for record in self.records:
-            self._print_record(record)
-
-    def select_where(self, field_name: str, value: str) -> List[UFORecords]:
-        return [record for record in self.records if record.get_field(field_name) == value]
-
-    def update_record(self, record_id: int, updates: Dict[str, str]) -> None:
-        try:
-            record = next(record for record in self.records if record.get_field("id") == str(record_id))
-            for field, value in updates.items():
-                record.add(field, value)
-        except StopIteration:
-            raise RuntimeError(f"Record with id {record_id} not found.")
-
-    def delete_record(self, record_id: int) -> bool:
-        try:
-            index = next(i for i, record in enumerate(self.records) if record.get_field("id") == str(record_id))
-            del self.records[index]
-            return True
-        except StopIteration:
-            return False
-
-    def _print_header(self) -> None:
-        print(f"| {'id':<10}", end="")
-        for col in self.columns:
-            print(f" | {col:<10}", end="")
-        print(" |")
-        print("-" * (13 + len(self.columns) * 13))
-
-    def _print_record(self, record: UFORecords) -> None:
-        print(f"| {record.get_field('id'):<10}", end="")
-        for col in self.columns:
-            print(f" | {record.get_field(col):<10}", end="")
-        print(" |")
-
-
-
-class Relative_DB: 
-    def __init__(self):
-        self.tables = {}
-
-    def create_table(self, name: str, columns: List[str]) -> None:
-        if name in self.tables:
-            raise RuntimeError(f"Table with name {name} already exists.")
-        self.tables[name] = UFOTable(name, columns)
-
-    def insert(self, table_name: str, record_data: Dict[str, str]) -> None:
-        if table_name not in self.tables:
-            raise RuntimeError(f"Table with name {table_name} does not exist.")
-        self.tables[table_name].insert_record(record_data)
-
-    def select(self, table_name: str) -> None:
-        if table_name not in self.tables:
-            raise RuntimeError(f"Table with name {table_name} does not exist.")
-        self.tables[table_name].select_all()
-
-    def update(self, table_name: str, record_id: int, updates: Dict[str, str]) -> None:
-        if table_name not in self.tables:
-            raise RuntimeError(f"Table with name {table_name} does not exist.")
-        self.tables[table_name].update_record(record_id, updates)
-
-    def delete_record(self, table_name: str, record_id: int) -> bool:
-        if table_name not in self.tables:
-            return False
-        return self.tables[table_name].delete_record(record_id)
-
-    def save_to_file(self, filename: str) -> bool:
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(str(len(self.tables)) + '\n')
-                for table_name, table in self.tables.items():
-                    f.write(table_name + '\n')
-                    f.write(str(len(table.columns)) + '\n')
-                    f.write('\n'.join(table.columns) + '\n')
-                    f.write(str(table.next_id) + '\n')
-                    f.write(str(len(table.records)) + '\n')
-                    for record in table.records:
-                        record_data = [record.get_field(col) for col in table.columns]
-                        f.write('|'.join(record_data) + '|' + record.get_field("id") + '\n')
-            return True
-        except (IOError, OSError) as e:
-            print(f"Error saving to file: {e}")
-            return False
-
-
-    def load_from_file(self, filename: str) -> bool:
-        if not os.path.exists(filename):
-            print(f"Error: File '{filename}' not found.")
-            return False
-
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                num_tables = int(f.readline().strip())
-                for _ in range(num_tables):
-                    table_name = f.readline().strip()
-                    num_columns = int(f.readline().strip())
-                    columns = [f.readline().strip() for _ in range(num_columns)]
-                    table = UFOTable(table_name, columns)
-                    table.next_id = int(f.readline().strip())
-                    num_records = int(f.readline().strip())
-                    for _ in range(num_records):
-                        line = f.readline().strip()
-                        record_data = line.split('|')
-                        record = UFORecords()
-                        for i, col in enumerate(table.columns):
-                            record.add(col, record_data[i])
-                        record.add("id", record_data[-1])
-                        table.records.append(record)
-                    self.tables[table_name] = table
-                return True
-        except (IOError, OSError, ValueError, IndexError) as e:
-            print(f"Error loading from file: {e}")
-            return False
\ No newline at end of file
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from bisect import bisect_left, bisect_right, insort
+from array import array
+from functools import partial
+import os
+import weakref
+
+from .journal import Journal
+
+# Column types and the array typecode used to store each natively; "str"
+# columns are kept as plain lists.
+COLUMN_TYPES = {"str": None, "int": 'q', "float": 'd', "bool": 'b'}
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1  # range of an "int" column ('q' array)
+TRUE_STRINGS = {"1", "true", "yes", "y", "on"}
+FALSE_STRINGS = {"", "0", "false", "no", "n", "off"}
+
+
+def convert_value(type_name: str, value: Any) -> Any:
+    if type_name == "str":
+        return value if isinstance(value, str) else ("" if value is None else str(value))
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 0.0 if type_name == "float" else 0
+    try:
+        if type_name == "int":
+            if isinstance(value, str):
+                value = value.strip()
+                try:
+                    value = int(value)
+                except ValueError:
+                    value = float(value)  # "3.0" or "1e3"
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError(value)  # would lose the fraction
+            number = int(value)
+            if not INT_MIN <= number <= INT_MAX:
+                raise ValueError(value)
+            return number
+        if type_name == "float":
+            return float(value)
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in TRUE_STRINGS:
+                return 1
+            if lowered in FALSE_STRINGS:
+                return 0
+            raise ValueError(value)
+        return 1 if value else 0
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Cannot store {value!r} in a column of type {type_name}.")
+
+
+def format_value(type_name: str, value: Any) -> str:
+    if type_name == "str":
+        return value
+    if type_name == "bool":
+        return "True" if value else "False"
+    return repr(value) if type_name == "float" else str(value)
+
+
+def _new_storage(type_name: str, values: Iterable[Any] = ()) -> Any:
+    typecode = COLUMN_TYPES[type_name]
+    return list(values) if typecode is None else array(typecode, values)
+
+
+class OperationCancelled(Exception):
+    # Raised by load_from_file / save_to_file when their cancel event is set.
+    pass
+
+
+def report_progress(progress, cancel, fraction: float) -> None:
+    # progress(fraction) is called with 0..1; cancel is a threading.Event (or
+    # anything with is_set()) polled at the same points.
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled()
+    if progress is not None:
+        progress(min(1.0, fraction))
+
+
+class UFORecords:
+    def __init__(self):
+        self.fields = {}
+
+    def get_field(self, field_name: str) -> str:
+        return self.fields.get(field_name, "")
+
+    def add(self, field_name: str, value: str) -> None:
+        self.fields[field_name] = value
+
+    def __repr__(self) -> str:
+        return str(self.fields)
+
+
+class HashIndex:
+    kind = "hash"
+
+    def __init__(self):
+        self.buckets: Dict[Any, set] = {}
+
+    def add(self, value: Any, record_id: int) -> None:
+        self.buckets.setdefault(value, set()).add(record_id)
+
+    def remove(self, value: Any, record_id: int) -> None:
+        bucket = self.buckets.get(value)
+        if bucket is not None:
+            bucket.discard(record_id)
+            if not bucket:
+                del self.buckets[value]
+
+    def bulk_load(self, pairs: Iterable[tuple]) -> None:
+        for value, record_id in pairs:
+            self.add(value, record_id)
+
+    def lookup(self, value: Any) -> List[int]:
+        return sorted(self.buckets.get(value, ()))
+
+    def copy(self) -> "HashIndex":
+        index = HashIndex()
+        index.buckets = {value: set(ids) for value, ids in self.buckets.items()}
+        return index
+
+
+class SortedIndex:
+    kind = "sorted"
+
+    def __init__(self):
+        self.entries: List[tuple] = []  # sorted (value, id) pairs
+
+    def add(self, value: Any, record_id: int) -> None:
+        insort(self.entries, (value, record_id))
+
+    def remove(self, value: Any, record_id: int) -> None:
+        i = bisect_left(self.entries, (value, record_id))
+        if i < len(self.entries) and self.entries[i] == (value, record_id):
+            del self.entries[i]
+
+    def bulk_load(self, pairs: Iterable[tuple]) -> None:
+        self.entries.extend(pairs)
+        self.entries.sort()
+
+    def lookup(self, value: Any) -> List[int]:
+        return self.range(value, value)
+
+    def range(self, low: Any = None, high: Any = None,
+              include_low: bool = True, include_high: bool = True) -> List[int]:
+        # (value,) sorts before every (value, id) pair and (value, inf) after.
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect_left(self.entries, (low,))
+        else:
+            start = bisect_right(self.entries, (low, float("inf")))
+        if high is None:
+            end = len(self.entries)
+        elif include_high:
+            end = bisect_right(self.entries, (high, float("inf")))
+        else:
+            end = bisect_left(self.entries, (high,))
+        return [record_id for _, record_id in self.entries[start:end]]
+
+    def prefix(self, prefix: str) -> List[int]:
+        return self.range(prefix, prefix + "\U0010ffff", include_high=False)
+
+    def copy(self) -> "SortedIndex":
+        index = SortedIndex()
+        index.entries = list(self.entries)
+        return index
+
+
+INDEX_KINDS = {"hash": HashIndex, "sorted": SortedIndex}
+
+
+class UFORow:
+    # Lightweight view of one row of a columnar UFOTable.
+    __slots__ = ("table", "record_id")
+
+    def __init__(self, table: "UFOTable", record_id: int):
+        self.table = table
+        self.record_id = record_id
+
+    def get_field(self, field_name: str) -> str:
+        return self.table._value(self.table._index[self.record_id], field_name)
+
+    def get_value(self, field_name: str) -> Any:
+        return self.table._native(self.table._index[self.record_id], field_name)
+
+    def add(self, field_name: str, value: str) -> None:
+        self.table.update_record(self.record_id, {field_name: value})
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        return {col: self.get_field(col) for col in self.table.columns + ["id"]}
+
+    def __repr__(self) -> str:
+        return str(self.fields)
+
+
+class _RowSequence:
+    # Read-only sequence of row views over the live rows; views are only built
+    # when indexed. Tombstones are skipped, so reading rows never compacts.
+    __slots__ = ("table",)
+
+    def __init__(self, table: "UFOTable"):
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table._index)
+
+    def __getitem__(self, i: int) -> UFORow:
+        table = self.table
+        pos = table._live_positions()[i] if table._dead else i
+        return UFORow(table, table._ids[pos])
+
+    def __iter__(self):
+        table = self.table
+        return (UFORow(table, record_id) for record_id in table._ids if record_id)
+
+
+class UFOTable:
+    # Rows are stored column by column: ids in an integer array, int/float/bool
+    # columns in typed arrays and text columns in lists. Deleted rows leave a
+    # tombstone (id 0); the columns are compacted once tombstones outnumber
+    # live rows (and at least COMPACT_MIN exist).
+    COMPACT_MIN = 64
+
+    def __init__(self, table_name: str, columns: List[str], types: Optional[Dict[str, str]] = None):
+        types = types or {}
+        for col, type_name in types.items():
+            if col not in columns:
+                raise RuntimeError(f"Column {col} does not exist in table {table_name}.")
+            if type_name not in COLUMN_TYPES:
+                raise ValueError(f"Unknown column type '{type_name}'. Use one of: {', '.join(COLUMN_TYPES)}.")
+        self.name = table_name
+        self.columns = columns
+        self.types: Dict[str, str] = {col: types.get(col, "str") for col in columns}
+        self.next_id = 1
+        self._ids = array('q')
+        self._data: Dict[str, Any] = {col: _new_storage(self.types[col]) for col in columns}
+        self._lazy: Dict[str, Any] = {}  # column -> loader, for memory-mapped files
+        self._index: Dict[int, int] = {}  # id -> position in _ids
+        self._dead = 0
+        self._live: Optional[array] = None  # positions of the live rows, built when tombstones exist
+        self.indexes: Dict[str, Any] = {}  # column -> HashIndex | SortedIndex
+        self.formulas: Dict[Tuple[int, str], str] = {}  # (id, column) -> formula, see formulas.py
+        self._shared = False  # held by a snapshot; see Relative_DB._writable
+        self._undo: Optional[List[Any]] = None  # undo log of the open transaction; see Relative_DB.begin
+
+    @property
+    def records(self) -> _RowSequence:
+        return _RowSequence(self)
+
+    def _live_positions(self) -> array:
+        # Kept up to date by inserts and deletes once built; rebuilt after
+        # anything else moves rows.
+        if self._live is None:
+            self._live = array('q', (i for i, record_id in enumerate(self._ids) if record_id))
+        return self._live
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _column(self, name: str) -> list:
+        data = self._data.get(name)
+        if data is None:
+            if name not in self.columns:
+                raise RuntimeError(f"Column {name} does not exist in table {self.name}.")
+            # Snapshot readers may load a column from several threads at once:
+            # the data is stored before the loader is dropped.
+            loader = self._lazy.get(name)
+            if loader is not None:
+                data = self._data[name] = loader()
+                self._lazy.pop(name, None)
+            else:
+                data = self._data.get(name)
+                if data is None:
+                    type_name = self.types.setdefault(name, "str")
+                    data = self._data[name] = _new_storage(type_name, [convert_value(type_name, "")] * len(self._ids))
+        return data
+
+    def _coerce(self, field_name: str, value: Any) -> Any:
+        if field_name == "id":
+            return int(value)
+        return convert_value(self.types.get(field_name, "str"), value)
+
+    def _text_values(self, column: str) -> Iterable[str]:
+        type_name = self.types.get(column, "str")
+        data = self._column(column)
+        return data if type_name == "str" else (format_value(type_name, value) for value in data)
+
+    def _materialize(self) -> None:
+        for col in list(self._lazy):
+            self._column(col)
+
+    def _value(self, pos: int, field_name: str) -> str:
+        if field_name == "id":
+            return str(self._ids[pos])
+        if field_name not in self.columns:
+            return ""
+        return format_value(self.types.get(field_name, "str"), self._column(field_name)[pos])
+
+    def _native(self, pos: int, field_name: str) -> Any:
+        if field_name == "id":
+            return self._ids[pos]
+        if field_name not in self.columns:
+            return ""
+        return self._column(field_name)[pos]
+
+    def _load_columns(self, ids: array, data: Dict[str, list], lazy: Optional[Dict[str, Any]] = None) -> None:
+        self._ids = ids
+        self._data = data
+        self._lazy = lazy or {}
+        self._index = {record_id: i for i, record_id in enumerate(ids)}
+        self._dead = 0
+        self._live = None
+        for column, index in self.indexes.items():
+            index.bulk_load(zip(self._index_values(column), ids))
+
+    def _index_values(self, column: str):
+        if column == "id":
+            return self._ids
+        return self._column(column)
+
+    def _position(self, record_id) -> Optional[int]:
+        try:
+            return self._index.get(int(record_id))
+        except (TypeError, ValueError):
+            return None
+
+    def _compact(self) -> None:
+        if self._undo is not None:
+            dead = [i for i, record_id in enumerate(self._ids) if not record_id]
+            self._undo.append(partial(self._uncompact, array('q', self._ids),
+                                      {col: [self._column(col)[i] for i in dead] for col in self.columns}))
+        keep = [i for i, record_id in enumerate(self._ids) if record_id]
+        self._ids = array('q', (self._ids[i] for i in keep))
+        for col in self.columns:
+            data = self._column(col)
+            self._data[col] = _new_storage(self.types.get(col, "str"), (data[i] for i in keep))
+        self._index = {record_id: i for i, record_id in enumerate(self._ids)}
+        self._dead = 0
+        self._live = None
+
+    def copy(self) -> "UFOTable":
+        # An independent table with the same rows, minus tombstones; self is
+        # only read, so copying a table that is shared with readers is safe.
+        table = UFOTable(self.name, list(self.columns), dict(self.types))
+        table.next_id = self.next_id
+        if self._dead:
+            keep = [i for i, record_id in enumerate(self._ids) if record_id]
+            table._load_columns(array('q', (self._ids[i] for i in keep)), {
+                col: _new_storage(self.types.get(col, "str"), (self._column(col)[i] for i in keep))
+                for col in self.columns})
+            for column, index in self.indexes.items():
+                table.create_index(column, index.kind)
+        else:
+            table._lazy = dict(self._lazy)  # loaders only read the mapped file
+            table._ids = array('q', self._ids)
+            table._data = {col: data[:] for col, data in list(self._data.items())}
+            table._index = dict(self._index)
+            table.indexes = {column: index.copy() for column, index in self.indexes.items()}
+        table.formulas = dict(self.formulas)
+        return table
+
+    # --- undo: each helper reverses one change, applied newest first --------
+
+    def _truncate(self, length: int, next_id: int) -> None:
+        if length < len(self._ids):
+            for pos in range(length, len(self._ids)):
+                record_id = self._ids[pos]
+                for column, index in self.indexes.items():
+                    index.remove(self._native(pos, column), record_id)
+                del self._index[record_id]
+            del self._ids[length:]
+            self._live = None
+            for col in self.columns:
+                del self._column(col)[length:]
+        self.next_id = next_id
+
+    def _restore_values(self, old: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for record_id, values in reversed(old):
+            pos = self._index[record_id]
+            for field, value in values.items():
+                data = self._column(field)
+                index = self.indexes.get(field)
+                if index is not None:
+                    index.remove(data[pos], record_id)
+                    index.add(value, record_id)
+                data[pos] = value
+
+    def _undelete(self, pos: int, record_id: int, formulas: Dict[Tuple[int, str], str]) -> None:
+        self._ids[pos] = record_id
+        self._index[record_id] = pos
+        self._dead -= 1
+        self._live = None
+        for column, index in self.indexes.items():
+            index.add(self._native(pos, column), record_id)
+        self.formulas.update(formulas)
+
+    def _uncompact(self, ids: array, dropped: Dict[str, list]) -> None:
+        # Puts the tombstones (and the values they hid) back where they were.
+        for col in self.columns:
+            live = iter(self._data[col])
+            gone = iter(dropped[col])
+            self._data[col] = _new_storage(self.types.get(col, "str"),
+                                           [next(live) if record_id else next(gone) for record_id in ids])
+        self._ids = ids
+        self._index = {record_id: i for i, record_id in enumerate(ids) if record_id}
+        self._dead = len(ids) - len(self._index)
+        self._live = None
+
+    def _restore_column(self, position: int, column: str, type_name: str, data: Any, loader: Any,
+                        index: Any, formulas: Dict[Tuple[int, str], str]) -> None:
+        self.columns.insert(position, column)
+        self.types[column] = type_name
+        if data is not None:
+            self._data[column] = data
+        if loader is not None:
+            self._lazy[column] = loader
+        if index is not None:
+            self.indexes[column] = index
+        self.formulas = formulas
+
+    def _restore_type(self, column: str, type_name: str, data: Any) -> None:
+        self._data[column] = data
+        self.types[column] = type_name
+
+    def _restore_index(self, column: str, index: Any) -> None:
+        if index is None:
+            self.indexes.pop(column, None)
+        else:
+            self.indexes[column] = index
+
+    def _remember_formula(self, cell: Tuple[int, str]) -> None:
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_formula, cell, self.formulas.get(cell)))
+
+    def _restore_formula(self, cell: Tuple[int, str], text: Optional[str]) -> None:
+        if text is None:
+            self.formulas.pop(cell, None)
+        else:
+            self.formulas[cell] = text
+
+    def add_column(self, column: str, default: Any = "", type_name: str = "str") -> None:
+        if column == "id" or column in self.columns:
+            raise RuntimeError(f"Column {column} already exists in table {self.name}.")
+        if type_name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type '{type_name}'. Use one of: {', '.join(COLUMN_TYPES)}.")
+        value = convert_value(type_name, default)
+        if self._undo is not None:
+            self._undo.append(partial(self.drop_column, column))
+        self.columns.append(column)
+        self.types[column] = type_name
+        self._data[column] = _new_storage(type_name, [value] * len(self._ids))
+
+    def set_column_type(self, column: str, type_name: str) -> None:
+        if column not in self.columns:
+            raise RuntimeError(f"Column {column} does not exist in table {self.name}.")
+        if type_name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type '{type_name}'. Use one of: {', '.join(COLUMN_TYPES)}.")
+        old_type = self.types.get(column, "str")
+        if old_type == type_name:
+            return
+        data = self._column(column)
+        if type_name == "str":
+            converted = _new_storage(type_name, (format_value(old_type, value) for value in data))
+        else:
+            converted = _new_storage(type_name, (convert_value(type_name, value) for value in data))
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_type, column, old_type, data))
+        self._data[column] = converted
+        self.types[column] = type_name
+        if column in self.indexes:
+            self.create_index(column, self.indexes[column].kind)
+
+    def drop_column(self, column: str) -> None:
+        if column not in self.columns:
+            raise RuntimeError(f"Column {column} does not exist in table {self.name}.")
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_column, self.columns.index(column), column,
+                                      self.types.get(column, "str"), self._data.get(column), self._lazy.get(column),
+                                      self.indexes.get(column), self.formulas))
+        self.columns.remove(column)
+        self.types.pop(column, None)
+        self._data.pop(column, None)
+        self._lazy.pop(column, None)
+        self.indexes.pop(column, None)
+        self.formulas = {cell: text for cell, text in self.formulas.items() if cell[1] != column}
+
+    def rename_column(self, old: str, new: str) -> None:
+        if old not in self.columns:
+            raise RuntimeError(f"Column {old} does not exist in table {self.name}.")
+        if new == "id" or new in self.columns:
+            raise RuntimeError(f"Column {new} already exists in table {self.name}.")
+        if self._undo is not None:
+            self._undo.append(partial(self.rename_column, new, old))
+        self._data[new] = self._column(old)
+        del self._data[old]
+        self.types[new] = self.types.pop(old, "str")
+        self.columns[self.columns.index(old)] = new
+        if old in self.indexes:
+            self.indexes[new] = self.indexes.pop(old)
+        self.formulas = {(record_id, new if col == old else col): text
+                         for (record_id, col), text in self.formulas.items()}
+
+    def create_index(self, column: str, kind: str = "hash") -> None:
+        if column != "id" and column not in self.columns:
+            raise RuntimeError(f"Column {column} does not exist in table {self.name}.")
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{kind}'. Use one of: {', '.join(INDEX_KINDS)}.")
+        if self._dead:
+            self._compact()
+        index = INDEX_KINDS[kind]()
+        index.bulk_load(zip(self._index_values(column), self._ids))
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_index, column, self.indexes.get(column)))
+        self.indexes[column] = index
+
+    def drop_index(self, column: str) -> bool:
+        if self._undo is not None and column in self.indexes:
+            self._undo.append(partial(self._restore_index, column, self.indexes[column]))
+        return self.indexes.pop(column, None) is not None
+
+    def _records_for(self, ids: Iterable[int]) -> List[UFORow]:
+        return [UFORow(self, record_id) for record_id in ids]
+
+    def _scan(self, field_name: str, predicate) -> List[UFORow]:
+        ids = self._ids
+        if field_name == "id":
+            return [UFORow(self, record_id) for record_id in ids if record_id and predicate(record_id)]
+        if field_name not in self.columns:
+            return []
+        data = self._column(field_name)
+        return [UFORow(self, ids[i]) for i, value in enumerate(data) if ids[i] and predicate(value)]
+
+    def get_record(self, record_id: int) -> Optional[UFORow]:
+        pos = self._position(record_id)
+        return None if pos is None else UFORow(self, self._ids[pos])
+
+    def insert_record(self, record_data: Dict[str, str], record_id: Optional[int] = None) -> int:
+        if record_id is None:
+            record_id = self.next_id
+        else:
+            record_id = convert_value("int", record_id)
+            if record_id in self._index:
+                raise RuntimeError(f"Record with id {record_id} already exists.")
+        # Everything that can fail happens before the first change.
+        values = {col: self._coerce(col, record_data.get(col, "")) for col in self.columns}
+        columns = [self._column(col) for col in self.columns]
+        pos = len(self._ids)
+        if self._undo is not None:
+            self._undo.append(partial(self._truncate, pos, self.next_id))
+        self.next_id = max(self.next_id, record_id + 1)
+        self._index[record_id] = pos
+        if self._live is not None:
+            self._live.append(pos)
+        self._ids.append(record_id)
+        for col, data in zip(self.columns, columns):
+            data.append(values[col])
+        for column, index in self.indexes.items():
+            index.add(record_id if column == "id" else values[column], record_id)
+        return record_id
+
+    # insert_many appends rows in chunks of this size, so arbitrary iterables
+    # are consumed with bounded memory.
+    INSERT_CHUNK = 10000
+
+    def insert_many(self, rows: Iterable[Any]) -> range:
+        # Rows are dicts keyed by column or sequences in column order.
+        first_id = self.next_id
+        start = len(self._ids)
+        if self._undo is not None:
+            self._undo.append(partial(self._truncate, start, first_id))
+        chunk = []
+        try:
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.INSERT_CHUNK:
+                    self._append_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._append_chunk(chunk)
+        except BaseException:
+            self._truncate(start, first_id)  # a bad row leaves none of the earlier chunks behind
+            raise
+        return range(first_id, self.next_id)
+
+    def _append_chunk(self, chunk: List[Any]) -> None:
+        columns = []
+        for j, col in enumerate(self.columns):
+            values = [row.get(col, "") if isinstance(row, dict) else (row[j] if j < len(row) else "")
+                      for row in chunk]
+            type_name = self.types.get(col, "str")
+            if type_name != "str" or not all(isinstance(value, str) for value in values):
+                values = [convert_value(type_name, value) for value in values]
+            columns.append(values)
+        first_id = self.next_id
+        new_ids = range(first_id, first_id + len(chunk))
+        start = len(self._ids)
+        self._ids.extend(new_ids)
+        if self._live is not None:
+            self._live.extend(range(start, start + len(chunk)))
+        self._index.update(zip(new_ids, range(start, start + len(chunk))))
+        self.next_id = first_id + len(chunk)
+        for col, values in zip(self.columns, columns):
+            self._column(col).extend(values)
+        for column, index in self.indexes.items():
+            values = new_ids if column == "id" else self._column(column)[start:]
+            index.bulk_load(zip(values, new_ids))
+
+    def select_all(self) -> None:
+        self._print_header()
+        for record in self.records:
+            self._print_record(record)
+
+    def select_where(self, field_name: str, value: Any) -> List[UFORow]:
+        try:
+            value = self._coerce(field_name, value)
+        except ValueError:
+            return []  # no stored value can equal something the column cannot hold
+        index = self.indexes.get(field_name)
+        if index is not None:
+            return self._records_for(index.lookup(value))
+        if field_name == "id":
+            record = self.get_record(value)
+            return [] if record is None else [record]
+        return self._scan(field_name, lambda v: v == value)
+
+    def select_range(self, field_name: str, low: Any = None, high: Any = None,
+                     include_low: bool = True, include_high: bool = True) -> List[UFORow]:
+        low = None if low is None else self._coerce(field_name, low)
+        high = None if high is None else self._coerce(field_name, high)
+        index = self.indexes.get(field_name)
+        if isinstance(index, SortedIndex):
+            return self._records_for(index.range(low, high, include_low, include_high))
+
+        def in_range(value):
+            if low is not None and (value < low if include_low else value <= low):
+                return False
+            if high is not None and (value > high if include_high else value >= high):
+                return False
+            return True
+
+        matches = self._scan(field_name, in_range)
+        matches.sort(key=lambda record: record.get_value(field_name))
+        return matches
+
+    def select_prefix(self, field_name: str, prefix: str) -> List[UFORow]:
+        index = self.indexes.get(field_name)
+        if isinstance(index, SortedIndex) and self.types.get(field_name, "str") == "str":
+            return self._records_for(index.prefix(prefix))
+        type_name = "int" if field_name == "id" else self.types.get(field_name, "str")
+        matches = self._scan(field_name, lambda v: format_value(type_name, v).startswith(prefix))
+        matches.sort(key=lambda record: record.get_field(field_name))
+        return matches
+
+    def update_record(self, record_id: int, updates: Dict[str, str]) -> None:
+        pos = self._position(record_id)
+        if pos is None:
+            raise RuntimeError(f"Record with id {record_id} not found.")
+        record_id = self._ids[pos]
+        updates = {field: self._coerce(field, value) for field, value in updates.items() if field != "id"}
+        columns = {field: self._column(field) for field in updates}  # an unknown column changes nothing
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_values, [(record_id, {field: data[pos]
+                                                                          for field, data in columns.items()})]))
+        for field, value in updates.items():
+            data = columns[field]
+            index = self.indexes.get(field)
+            if index is not None:
+                index.remove(data[pos], record_id)
+                index.add(value, record_id)
+            data[pos] = value
+
+    def update_many(self, updates_by_id: Dict[int, Dict[str, str]]) -> int:
+        # Resolve every id before touching any data so a bad id changes nothing.
+        positions = []
+        for record_id, updates in updates_by_id.items():
+            pos = self._position(record_id)
+            if pos is None:
+                raise RuntimeError(f"Record with id {record_id} not found.")
+            positions.append((pos, {field: self._coerce(field, value)
+                                    for field, value in updates.items() if field != "id"}))
+        for field in {field for _, updates in positions for field in updates}:
+            self._column(field)
+        if self._undo is not None:
+            self._undo.append(partial(self._restore_values, [(self._ids[pos], {field: self._data[field][pos]
+                                                                               for field in updates})
+                                                             for pos, updates in positions]))
+        for pos, updates in positions:
+            record_id = self._ids[pos]
+            for field, value in updates.items():
+                data = self._data[field]
+                index = self.indexes.get(field)
+                if index is not None:
+                    index.remove(data[pos], record_id)
+                    index.add(value, record_id)
+                data[pos] = value
+        return len(positions)
+
+    def delete_record(self, record_id: int) -> bool:
+        pos = self._position(record_id)
+        if pos is None:
+            return False
+        record_id = self._ids[pos]
+        if self._undo is not None:
+            self._undo.append(partial(self._undelete, pos, record_id, {
+                (record_id, column): self.formulas[(record_id, column)]
+                for column in self.columns if (record_id, column) in self.formulas}))
+        for column, index in self.indexes.items():
+            index.remove(self._native(pos, column), record_id)
+        del self._index[record_id]
+        self._ids[pos] = 0
+        if self._live is not None:
+            del self._live[bisect_left(self._live, pos)]
+        for column in self.columns:
+            self.formulas.pop((record_id, column), None)
+        self._dead += 1
+        if self._dead >= self.COMPACT_MIN and self._dead * 2 > len(self._ids):
+            self._compact()
+        return True
+
+    def _print_header(self) -> None:
+        print(f"| {'id':<10}", end="")
+        for col in self.columns:
+            print(f" | {col:<10}", end="")
+        print(" |")
+        print("-" * (13 + len(self.columns) * 13))
+
+    def _print_record(self, record: UFORow) -> None:
+        print(f"| {record.get_field('id'):<10}", end="")
+        for col in self.columns:
+            print(f" | {record.get_field(col):<10}", end="")
+        print(" |")
+
+
+class Snapshot:
+    # A read-only view of a database's tables as they were when snapshot() was
+    # called. The tables are never modified again: the database copies a table
+    # before its next write, so readers need no locks and never see a
+    # half-applied change, however long they scan.
+    def __init__(self, tables: Dict[str, "UFOTable"]):
+        self.tables = tables
+
+    def _table(self, table_name: str) -> UFOTable:
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table with name {table_name} does not exist.")
+        return self.tables[table_name]
+
+    def select_where(self, table_name: str, field_name: str, value: str) -> List[UFORow]:
+        return self._table(table_name).select_where(field_name, value)
+
+    def query(self, text: str):
+        from .query import execute
+        return execute(self, text)
+
+    def join(self, left: str, right: str, left_column: str, right_column: str,
+             columns: Optional[List[str]] = None):
+        from .query import join
+        return join(self, left, right, left_column, right_column, columns)
+
+    def aggregate(self, table_name: str, specs: List[Any], group_by: Optional[List[str]] = None):
+        from .aggregate import aggregate
+        return aggregate(self._table(table_name), specs, group_by)
+
+
+class Relative_DB: 
+    def __init__(self):
+        self.tables = {}
+        self.file_version = 1  # .ufo format used by save_to_file unless overridden
+        self.journal: Optional[Journal] = None
+        self.journal_base: Optional[str] = None
+        self._pending: List[Dict[str, Any]] = []  # operations not yet flushed to the journal
+        # Sequence number of the last journal batch the tables hold. It is
+        # saved in the base file, so loading skips the batches already in it.
+        self.journal_lsn = 0
+        self._formula_graphs: Dict[str, Any] = {}  # table -> formulas.FormulaGraph, built on first use
+        # Copy-on-write: a table held by a snapshot is marked shared and copied
+        # before it is written.
+        self._snapshots = weakref.WeakSet()
+        # While a transaction is open every table records how to reverse each
+        # change it makes, in this one undo log; see begin().
+        self._undo: Optional[List[Any]] = None
+        self._tx_pending: List[Dict[str, Any]] = []  # journal operations of the open transaction
+
+    def _log(self, op: str, **fields) -> None:
+        if self.journal is not None:
+            (self._tx_pending if self._undo is not None else self._pending).append({"op": op, **fields})
+
+    def _table(self, table_name: str) -> UFOTable:
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table with name {table_name} does not exist.")
+        return self.tables[table_name]
+
+    def _is_shared(self, table: UFOTable) -> bool:
+        return any(shared is table for snapshot in self._snapshots for shared in snapshot.tables.values())
+
+    def _writable(self, table_name: str) -> UFOTable:
+        # The table to modify: a private copy if readers may still hold it.
+        table = self._table(table_name)
+        if table._shared:
+            if self._is_shared(table):
+                if table._undo is not None:
+                    # Rolling back puts the untouched original back; the copy needs no undo.
+                    table._undo.append(partial(self.tables.__setitem__, table_name, table))
+                    table._undo = None
+                table = self.tables[table_name] = table.copy()
+            else:
+                table._shared = False
+        return table
+
+    def _share(self, tables: Dict[str, UFOTable]) -> Dict[str, UFOTable]:
+        # Shared tables are never modified, not even compacted, so tombstones
+        # go first (by copying when an older snapshot still holds the table).
+        for name in list(tables):
+            if tables[name]._dead:
+                tables[name] = self._writable(name)
+                tables[name]._compact()
+            tables[name]._shared = True
+        return tables
+
+    # --- transactions --------------------------------------------------------
+
+    def snapshot(self, table_names: Optional[Iterable[str]] = None) -> Snapshot:
+        # A consistent read-only view of all tables (or of the named ones; the
+        # rest stay free of copy-on-write). Take it on the thread that writes
+        # (or under its lock); the snapshot itself can then be read from any
+        # thread.
+        if self._undo is not None:
+            raise RuntimeError("Commit or roll back the open transaction first.")
+        names = list(self.tables) if table_names is None else list(table_names)
+        for name in names:
+            if name not in self.tables:
+                raise RuntimeError(f"Table with name {name} does not exist.")
+        snapshot = Snapshot(self._share({name: self.tables[name] for name in names}))
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def in_transaction(self) -> bool:
+        return self._undo is not None
+
+    def begin(self) -> None:
+        # Changes are applied in place and logged with how to reverse them, so
+        # a transaction costs in proportion to what it changes; rollback()
+        # undoes them newest first, returning every table to its state at
+        # begin(). Nothing reaches the journal before commit().
+        if self._undo is not None:
+            raise RuntimeError("A transaction is already open.")
+        self._undo = []
+        for table in self.tables.values():
+            table._undo = self._undo
+
+    def _end_transaction(self) -> List[Any]:
+        undo = self._undo
+        self._undo = None
+        for table in self.tables.values():
+            table._undo = None
+        return undo
+
+    def commit(self) -> None:
+        if self._undo is None:
+            raise RuntimeError("No transaction is open.")
+        self._end_transaction()
+        self._pending.extend(self._tx_pending)
+        self._tx_pending = []
+
+    def rollback(self) -> None:
+        if self._undo is None:
+            raise RuntimeError("No transaction is open.")
+        for undo in reversed(self._end_transaction()):
+            undo()
+        self._tx_pending = []
+
+    def create_table(self, name: str, columns: List[str], types: Optional[Dict[str, str]] = None) -> None:
+        if name in self.tables:
+            raise RuntimeError(f"Table with name {name} already exists.")
+        self.tables[name] = UFOTable(name, columns, types)
+        if self._undo is not None:
+            self._undo.append(partial(self._drop_table, name))
+        self._log("create_table", table=name, columns=list(columns), types=dict(types or {}))
+
+    def insert(self, table_name: str, record_data: Dict[str, str]) -> int:
+        record_id = self._writable(table_name).insert_record(record_data)
+        self._log("insert", table=table_name, id=record_id, data=dict(record_data))
+        return record_id
+
+    def insert_many(self, table_name: str, rows: Iterable[Any]) -> range:
+        table = self._writable(table_name)
+        if self.journal is None:
+            return table.insert_many(rows)
+        rows = list(rows)
+        ids = table.insert_many(rows)
+        self._log("insert_many", table=table_name, first_id=ids.start,
+                  rows=[row if isinstance(row, dict) else list(row) for row in rows])
+        return ids
+
+    def add_column(self, table_name: str, column: str, type_name: str = "str") -> None:
+        self._writable(table_name).add_column(column, type_name=type_name)
+        self._log("add_column", table=table_name, column=column, type=type_name)
+
+    def set_column_type(self, table_name: str, column: str, type_name: str) -> None:
+        self._writable(table_name).set_column_type(column, type_name)
+        self._log("set_column_type", table=table_name, column=column, type=type_name)
+
+    def drop_column(self, table_name: str, column: str) -> None:
+        self._writable(table_name).drop_column(column)
+        self._log("drop_column", table=table_name, column=column)
+
+    def rename_column(self, table_name: str, old: str, new: str) -> None:
+        self._writable(table_name).rename_column(old, new)
+        self._log("rename_column", table=table_name, old=old, new=new)
+
+    def select(self, table_name: str) -> None:
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table with name {table_name} does not exist.")
+        self.tables[table_name].select_all()
+
+    def select_where(self, table_name: str, field_name: str, value: str) -> List[UFORecords]:
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table with name {table_name} does not exist.")
+        return self.tables[table_name].select_where(field_name, value)
+
+    def select_range(self, table_name: str, field_name: str, low: Any = None, high: Any = None,
+                     include_low: bool = True, include_high: bool = True) -> List[UFORecords]:
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table with name {table_name} does not exist.")
+        return self.tables[table_name].select_range(field_name, low, high, include_low, include_high)
+
+    def create_index(self, table_name: str, column: str, kind: str = "hash") -> None:
+        self._writable(table_name).create_index(column, kind)
+        self._log("create_index", table=table_name, column=column, kind=kind)
+
+    def drop_index(self, table_name: str, column: str) -> bool:
+        if table_name not in self.tables:
+            return False
+        dropped = self._writable(table_name).drop_index(column)
+        if dropped:
+            self._log("drop_index", table=table_name, column=column)
+        return dropped
+
+    def query(self, text: str):
+        from .query import execute
+        return execute(self, text)
+
+    def join(self, left: str, right: str, left_column: str, right_column: str,
+             columns: Optional[List[str]] = None):
+        from .query import join
+        return join(self, left, right, left_column, right_column, columns)
+
+    def aggregate(self, table_name: str, specs: List[Any], group_by: Optional[List[str]] = None):
+        from .aggregate import aggregate
+        return aggregate(self._table(table_name), specs, group_by)
+
+    def _drop_table(self, name: str) -> None:
+        del self.tables[name]
+        self._formula_graphs.pop(name, None)
+
+    def _formula_graph(self, table_name: str):
+        from .formulas import FormulaGraph
+        table = self._writable(table_name)
+        graph = self._formula_graphs.get(table_name)
+        if graph is None or graph.table is not table:
+            graph = self._formula_graphs[table_name] = FormulaGraph(table)
+        return graph
+
+    def set_formula(self, table_name: str, record_id: int, column: str, formula: str) -> Dict[Tuple[int, str], Any]:
+        # Stores a formula in a cell and returns every cell value it changed.
+        graph = self._formula_graph(table_name)
+        graph.table._remember_formula((int(record_id), column))
+        graph.set_formula(int(record_id), column, formula)
+        self._log("set_formula", table=table_name, id=int(record_id), column=column, formula=formula)
+        return self._log_recalculated(table_name, graph.recalculate([(int(record_id), column)], include_changed=True))
+
+    def clear_formula(self, table_name: str, record_id: int, column: str) -> bool:
+        graph = self._formula_graph(table_name)
+        graph.table._remember_formula((int(record_id), column))
+        cleared = graph.clear_formula(int(record_id), column)
+        if cleared:
+            self._log("clear_formula", table=table_name, id=int(record_id), column=column)
+        return cleared
+
+    def recalculate(self, table_name: str, changed: Optional[Iterable[Tuple[Any, str]]] = None) -> Dict[Tuple[int, str], Any]:
+        # changed holds (id, column) cells or (None, column) for whole columns;
+        # None recomputes every formula cell of the table.
+        graph = self._formula_graph(table_name)
+        return self._log_recalculated(table_name, graph.recalculate(changed))
+
+    def formula_errors(self, table_name: str) -> Dict[Tuple[int, str], str]:
+        # Formula cells that could not be evaluated by the last recalculation.
+        graph = self._formula_graphs.get(table_name)
+        return {} if graph is None else dict(graph.errors)
+
+    def _log_recalculated(self, table_name: str, values: Dict[Tuple[int, str], Any]) -> Dict[Tuple[int, str], Any]:
+        if values:
+            data: Dict[str, Dict[str, Any]] = {}
+            for (record_id, column), value in values.items():
+                data.setdefault(str(record_id), {})[column] = value
+            self._log("update_many", table=table_name, data=data)
+        return values
+
+    def update(self, table_name: str, record_id: int, updates: Dict[str, str]) -> None:
+        self._writable(table_name).update_record(record_id, updates)
+        self._log("update", table=table_name, id=int(record_id), data=dict(updates))
+
+    def update_many(self, table_name: str, updates_by_id: Dict[int, Dict[str, str]]) -> int:
+        count = self._writable(table_name).update_many(updates_by_id)
+        if count:
+            self._log("update_many", table=table_name,
+                      data={str(record_id): dict(updates) for record_id, updates in updates_by_id.items()})
+        return count
+
+    def delete_record(self, table_name: str, record_id: int) -> bool:
+        if table_name not in self.tables:
+            return False
+        deleted = self._writable(table_name).delete_record(record_id)
+        if deleted:
+            self._log("delete", table=table_name, id=int(record_id))
+        return deleted
+
+    # --- write-ahead journal -------------------------------------------------
+
+    # Once the journal outgrows this many bytes (or the base file), the next
+    # flush() folds it back into the base file.
+    CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+    def open_journal(self, filename: str) -> None:
+        self.journal = Journal(Journal.path_for(filename))
+        self.journal_base = filename
+
+    def flush(self, progress=None, cancel=None) -> bool:
+        # progress / cancel are passed on to the checkpoint, if one is due; a
+        # cancelled checkpoint loses nothing since the journal already holds
+        # every change.
+        if self.journal is None:
+            raise RuntimeError("No journal is open. Call open_journal() first.")
+        if self._undo is not None:
+            raise RuntimeError("Commit or roll back the open transaction first.")
+        # Decided before appending, so callers can ask needs_checkpoint() first.
+        checkpoint = self.needs_checkpoint()
+        if self._pending:
+            try:
+                self.journal.append(self._pending, self.journal_lsn + 1)
+            except (IOError, OSError) as e:
+                print(f"Error writing journal: {e}")
+                return False
+            self.journal_lsn += 1
+            self._pending = []
+        if checkpoint:
+            return self.checkpoint(progress, cancel)
+        report_progress(progress, cancel, 1.0)
+        return True
+
+    def needs_checkpoint(self) -> bool:
+        # Whether the next flush() rewrites the base file, and so needs
+        # prepare_save() when it runs off the owning thread.
+        if self.journal is None:
+            return False
+        base_size = os.path.getsize(self.journal_base) if os.path.exists(self.journal_base) else 0
+        return self.journal.size() > max(self.CHECKPOINT_BYTES, base_size)
+
+    def checkpoint(self, progress=None, cancel=None) -> bool:
+        if self.journal is None:
+            raise RuntimeError("No journal is open. Call open_journal() first.")
+        return self.save_to_file(self.journal_base, progress=progress, cancel=cancel)
+
+    def _replay(self, op: Dict[str, Any]) -> None:
+        # Applies one journal operation. load_from_file replays only the
+        # batches newer than the base file, so each operation lands once; the
+        # existence checks keep journals written before batches were numbered
+        # loadable.
+        kind = op["op"]
+        if kind == "create_table":
+            if op["table"] not in self.tables:
+                self.tables[op["table"]] = UFOTable(op["table"], op["columns"], op.get("types"))
+            return
+        table = self.tables.get(op["table"])
+        if table is None:
+            return
+        if kind == "insert":
+            if table.get_record(op["id"]) is None:
+                table.insert_record(op["data"], op["id"])
+            else:
+                table.update_record(op["id"], op["data"])
+        elif kind == "insert_many":
+            for record_id, row in enumerate(op["rows"], op["first_id"]):
+                if not isinstance(row, dict):
+                    row = dict(zip(table.columns, row))
+                if table.get_record(record_id) is None:
+                    table.insert_record(row, record_id)
+                else:
+                    table.update_record(record_id, row)
+        elif kind == "update":
+            if table.get_record(op["id"]) is not None:
+                table.update_record(op["id"], op["data"])
+        elif kind == "update_many":
+            table.update_many({int(record_id): updates for record_id, updates in op["data"].items()
+                               if table.get_record(record_id) is not None})
+        elif kind == "delete":
+            table.delete_record(op["id"])
+        elif kind == "add_column":
+            if op["column"] not in table.columns:
+                table.add_column(op["column"], type_name=op.get("type", "str"))
+        elif kind == "set_column_type":
+            if op["column"] in table.columns:
+                table.set_column_type(op["column"], op["type"])
+        elif kind == "drop_column":
+            if op["column"] in table.columns:
+                table.drop_column(op["column"])
+        elif kind == "rename_column":
+            if op["old"] in table.columns and op["new"] not in table.columns:
+                table.rename_column(op["old"], op["new"])
+        elif kind == "set_formula":
+            if table.get_record(op["id"]) is not None and op["column"] in table.columns:
+                table.formulas[(op["id"], op["column"])] = op["formula"]
+        elif kind == "clear_formula":
+            table.formulas.pop((op["id"], op["column"]), None)
+        elif kind == "create_index":
+            table.create_index(op["column"], op["kind"])
+        elif kind == "drop_index":
+            table.drop_index(op["column"])
+
+    # Rows between progress reports (and cancellation checks) while loading or saving.
+    PROGRESS_ROWS = 10000
+
+    def prepare_save(self) -> None:
+        # Everything save_to_file changes in memory: lazily mapped columns must
+        # be read before the file they live in is replaced, and tombstones are
+        # compacted away. Call it on the owning thread before saving from a
+        # worker thread, so the worker only reads.
+        if self._undo is not None:
+            raise RuntimeError("Commit or roll back the open transaction first.")
+        for name, table in list(self.tables.items()):
+            table._materialize()
+            if table._dead:
+                self._writable(name)._compact()
+
+    def save_to_file(self, filename: str, version: Optional[int] = None, progress=None, cancel=None) -> bool:
+        version = version or self.file_version
+        self.prepare_save()
+        temp_name = filename + ".tmp"
+        try:
+            if version == 2:
+                from .storage import save_v2
+                save_v2(self, temp_name, progress, cancel)
+                os.replace(temp_name, filename)
+                self._after_checkpoint(filename)
+                return True
+            with open(temp_name, 'w', encoding='utf-8') as f:
+                f.write(str(len(self.tables)) + '\n')
+                total = sum(len(table._ids) for table in self.tables.values()) or 1
+                written = 0
+                for table_name, table in self.tables.items():
+                    f.write(table_name + '\n')
+                    f.write(str(len(table.columns)) + '\n')
+                    f.write('\n'.join(table.columns) + '\n')
+                    f.write(str(table.next_id) + '\n')
+                    f.write(str(len(table.records)) + '\n')
+                    columns = [table._text_values(col) for col in table.columns]
+                    for i, row in enumerate(zip(*columns, map(str, table._ids)), 1):
+                        f.write('|'.join(row) + '\n')
+                        if i % self.PROGRESS_ROWS == 0:
+                            report_progress(progress, cancel, (written + i) / total)
+                    written += len(table._ids)
+                # Column types and index definitions trail the tables, so older
+                # readers simply ignore them.
+                for table_name, table in self.tables.items():
+                    for column in table.columns:
+                        if table.types.get(column, "str") != "str":
+                            f.write('|'.join(("@type", table_name, column, table.types[column])) + '\n')
+                    for column, index in table.indexes.items():
+                        f.write('|'.join(("@index", table_name, column, index.kind)) + '\n')
+                    for (record_id, column), formula in table.formulas.items():
+                        f.write('|'.join(("@formula", table_name, str(record_id), column, formula)) + '\n')
+                f.write('|'.join(("@journal", str(self.journal_lsn))) + '\n')
+            report_progress(progress, cancel, 1.0)
+            os.replace(temp_name, filename)
+            self._after_checkpoint(filename)
+            return True
+        except (IOError, OSError) as e:
+            print(f"Error saving to file: {e}")
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            return False
+        except OperationCancelled:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+
+    def _after_checkpoint(self, filename: str) -> None:
+        # The base file now holds every change, so its journal is obsolete.
+        Journal(Journal.path_for(filename)).clear()
+        if self.journal is not None and self.journal_base == filename:
+            self._pending = []
+
+    def load_from_file(self, filename: str, progress=None, cancel=None) -> bool:
+        # A cancelled load raises OperationCancelled and leaves the database
+        # partly filled; load into a fresh Relative_DB and drop it.
+        if not os.path.exists(filename):
+            print(f"Error: File '{filename}' not found.")
+            return False
+
+        try:
+            from .storage import detect_version, load_v2
+            if detect_version(filename) == 2:
+                load_v2(self, filename, progress, cancel)
+                self.file_version = 2
+            else:
+                self._load_v1(filename, progress, cancel)
+                self.file_version = 1
+            journal = Journal(Journal.path_for(filename))
+            if journal.exists():
+                # A crash between replacing the base file and removing its
+                # journal leaves batches the base file already holds.
+                for lsn, ops in journal.read():
+                    if lsn is not None and lsn <= self.journal_lsn:
+                        continue
+                    for op in ops:
+                        self._replay(op)
+                    self.journal_lsn = max(self.journal_lsn, lsn or 0)
+            report_progress(progress, cancel, 1.0)
+            return True
+        except (IOError, OSError, ValueError, IndexError, KeyError) as e:
+            print(f"Error loading from file: {e}")
+            return False
+
+    def _load_v1(self, filename: str, progress=None, cancel=None) -> None:
+        size = os.path.getsize(filename) or 1
+        done = 0  # characters read, close enough to bytes for progress
+        with open(filename, 'r', encoding='utf-8') as f:
+            num_tables = int(f.readline().strip())
+            for _ in range(num_tables):
+                table_name = f.readline().strip()
+                num_columns = int(f.readline().strip())
+                columns = [f.readline().strip() for _ in range(num_columns)]
+                table = UFOTable(table_name, columns)
+                table.next_id = int(f.readline().strip())
+                num_records = int(f.readline().strip())
+                ids = array('q')
+                data = [[] for _ in columns]
+                appends = [col.append for col in data]
+                for i in range(1, num_records + 1):
+                    line = f.readline()
+                    done += len(line)
+                    if i % self.PROGRESS_ROWS == 0:
+                        report_progress(progress, cancel, done / size)
+                    record_data = line.strip().split('|')
+                    for append, value in zip(appends, record_data):
+                        append(value)
+                    if len(record_data) <= len(columns):
+                        raise IndexError(f"Malformed record in table {table_name}.")
+                    ids.append(int(record_data[-1]))
+                table._load_columns(ids, dict(zip(columns, data)))
+                self.tables[table_name] = table
+            meta = [line.rstrip('\n').split('|') for line in f]
+            for entry in meta:
+                if entry[0] == "@journal":
+                    self.journal_lsn = int(entry[1])
+            # Types first: values are converted once, before indexes are built on them.
+            for kind in ("@type", "@index", "@formula"):
+                for entry in meta:
+                    if entry[0] == kind and entry[1] in self.tables:
+                        if kind == "@type":
+                            self.tables[entry[1]].set_column_type(entry[2], entry[3])
+                        elif kind == "@index":
+                            self.tables[entry[1]].create_index(entry[2], entry[3])
+                        else:
+                            self.tables[entry[1]].formulas[(int(entry[2]), entry[3])] = '|'.join(entry[4:])
+
+
+if os.environ.get("UFODB_METRICS") == "1":
+    from . import metrics
+    metrics.enable()
@@ -0,0 +1,767 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from operator import itemgetter
+import re
+
+from .aggregate import AggregateSpec, aggregate
+from .pyufodb import Relative_DB, UFOTable, SortedIndex, format_value
+
+# A small SQL subset over Relative_DB:
+#
+#   [EXPLAIN] SELECT * | item, ... FROM table [[INNER] JOIN table ON col = col ...]
+#       [WHERE cond [AND|OR cond ...]] [GROUP BY col, ...]
+#       [ORDER BY item [ASC|DESC], ...] [LIMIT n]
+#
+# where an item is a column or an aggregate: SUM(col), AVG(col), MIN(col),
+# MAX(col), COUNT(*), COUNT(col) or COUNT(DISTINCT col).
+# where cond is `col <op> literal` (=, !=, <>, <, <=, >, >=), `col LIKE 'prefix%'`
+# or a parenthesised condition. Joined rows have qualified columns (table.col);
+# a bare name works wherever it is unambiguous. Queries are parsed into a tree of nodes, planned
+# into a pipeline of operators and executed by pulling rows through it.
+
+KEYWORDS = {"SELECT", "FROM", "WHERE", "AND", "OR", "ORDER", "GROUP", "BY", "ASC", "DESC", "LIMIT", "LIKE",
+            "EXPLAIN", "DISTINCT", "JOIN", "INNER", "ON"}
+AGGREGATE_NAMES = {"SUM", "AVG", "MIN", "MAX", "COUNT"}
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[(),*])
+      | (?P<name>[^\W\d][\w.]*|\d+[^\W\d][\w.]*)
+    )""", re.VERBOSE)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip().rstrip(";")
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise QueryError(f"Unexpected character at position {pos}: {text[pos:pos + 10]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace(value[0] * 2, value[0])
+        elif kind == "name" and value.upper() in KEYWORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+    return tokens
+
+
+# --- syntax tree ---------------------------------------------------------------
+
+class Compare:
+    def __init__(self, column: str, op: str, value: Any):
+        self.column = column
+        self.op = "!=" if op == "<>" else op
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"{self.column} {self.op} {self.value!r}"
+
+
+class And:
+    def __init__(self, terms: list):
+        self.terms = terms
+
+    def __repr__(self) -> str:
+        return "(" + " AND ".join(map(repr, self.terms)) + ")"
+
+
+class Or:
+    def __init__(self, terms: list):
+        self.terms = terms
+
+    def __repr__(self) -> str:
+        return "(" + " OR ".join(map(repr, self.terms)) + ")"
+
+
+class Query:
+    def __init__(self):
+        self.columns: List[str] = ["*"]
+        self.table = ""
+        self.joins: List[Tuple[str, str, str]] = []  # (table, column, column) of each JOIN ... ON
+        self.where = None
+        self.aggregates: List[AggregateSpec] = []
+        self.group_by: List[str] = []
+        self.order_by: List[Tuple[str, bool]] = []  # (column, descending)
+        self.limit: Optional[int] = None
+        self.explain = False
+
+
+class Parser:
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, kind: str = None, value: str = None) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.pos]
+        return (kind is None or token_kind == kind) and (value is None or token_value == value)
+
+    def take(self, kind: str = None, value: str = None) -> str:
+        if not self.peek(kind, value):
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of query"
+            raise QueryError(f"Expected {value or kind}, found {found!r}.")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def accept(self, kind: str = None, value: str = None) -> bool:
+        if self.peek(kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> Query:
+        query = Query()
+        query.explain = self.accept("keyword", "EXPLAIN")
+        self.take("keyword", "SELECT")
+        query.columns = self.select_list()
+        self.take("keyword", "FROM")
+        query.table = self.take("name")
+        while self.peek("keyword", "JOIN") or self.peek("keyword", "INNER"):
+            query.joins.append(self.join())
+        if self.accept("keyword", "WHERE"):
+            query.where = self.or_expr()
+        if self.accept("keyword", "GROUP"):
+            self.take("keyword", "BY")
+            query.group_by = [self.take("name")]
+            while self.accept("punct", ","):
+                query.group_by.append(self.take("name"))
+        if self.accept("keyword", "ORDER"):
+            self.take("keyword", "BY")
+            query.order_by = self.order_list()
+        query.aggregates = self.aggregates
+        if self.accept("keyword", "LIMIT"):
+            query.limit = int(self.take("number"))
+        if self.pos != len(self.tokens):
+            raise QueryError(f"Unexpected {self.tokens[self.pos][1]!r}.")
+        return query
+
+    def join(self) -> Tuple[str, str, str]:
+        self.accept("keyword", "INNER")
+        self.take("keyword", "JOIN")
+        table = self.take("name")
+        self.take("keyword", "ON")
+        first = self.take("name")
+        if self.take("op") != "=":
+            raise QueryError("JOIN ... ON supports only an equality between two columns.")
+        return table, first, self.take("name")
+
+    def select_list(self) -> List[str]:
+        self.aggregates = []
+        if self.accept("punct", "*"):
+            return ["*"]
+        columns = [self.item()]
+        while self.accept("punct", ","):
+            columns.append(self.item())
+        return columns
+
+    def item(self) -> str:
+        # A column name, or an aggregate call whose canonical name becomes the column.
+        is_call = self.peek("name") and self.pos + 1 < len(self.tokens) \
+            and self.tokens[self.pos + 1] == ("punct", "(") and self.tokens[self.pos][1].upper() in AGGREGATE_NAMES
+        if not is_call:
+            return self.take("name")
+        func = self.take("name").upper()
+        self.take("punct", "(")
+        if self.accept("keyword", "DISTINCT"):
+            func += " DISTINCT"
+        column = "*" if self.accept("punct", "*") else self.take("name")
+        self.take("punct", ")")
+        try:
+            spec = AggregateSpec(func, column)
+        except ValueError as e:
+            raise QueryError(str(e))
+        if spec.name not in [known.name for known in self.aggregates]:
+            self.aggregates.append(spec)
+        return spec.name
+
+    def order_list(self) -> List[Tuple[str, bool]]:
+        order = []
+        while True:
+            column = self.item()
+            descending = self.accept("keyword", "DESC")
+            if not descending:
+                self.accept("keyword", "ASC")
+            order.append((column, descending))
+            if not self.accept("punct", ","):
+                return order
+
+    def or_expr(self):
+        terms = [self.and_expr()]
+        while self.accept("keyword", "OR"):
+            terms.append(self.and_expr())
+        return terms[0] if len(terms) == 1 else Or(terms)
+
+    def and_expr(self):
+        terms = [self.condition()]
+        while self.accept("keyword", "AND"):
+            terms.append(self.condition())
+        return terms[0] if len(terms) == 1 else And(terms)
+
+    def condition(self):
+        if self.accept("punct", "("):
+            expr = self.or_expr()
+            self.take("punct", ")")
+            return expr
+        column = self.take("name")
+        if self.accept("keyword", "LIKE"):
+            return Compare(column, "LIKE", self.take("string"))
+        op = self.take("op")
+        return Compare(column, op, self.literal())
+
+    def literal(self) -> str:
+        for kind in ("string", "number", "name"):
+            if self.peek(kind):
+                return self.take(kind)
+        raise QueryError("Expected a value.")
+
+
+def parse(text: str) -> Query:
+    return Parser(text).parse()
+
+
+# --- predicates ------------------------------------------------------------------
+
+def _like(pattern: str) -> Callable[[Any], bool]:
+    regex = re.compile("^" + ".*".join(map(re.escape, pattern.split("%"))) + "$", re.DOTALL)
+    return lambda value: regex.match(value if isinstance(value, str) else str(value)) is not None
+
+
+COMPARATORS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def compile_predicate(expr, getter: Callable[[str], Callable[[Any], Any]]) -> Callable[[Any], bool]:
+    # getter(column) returns a function mapping a row handle to that column's value.
+    if isinstance(expr, And):
+        parts = [compile_predicate(term, getter) for term in expr.terms]
+        return lambda row: all(part(row) for part in parts)
+    if isinstance(expr, Or):
+        parts = [compile_predicate(term, getter) for term in expr.terms]
+        return lambda row: any(part(row) for part in parts)
+    get = getter(expr.column)
+    if expr.op == "LIKE":
+        like = _like(expr.value)
+        return lambda row: like(get(row))
+    compare = COMPARATORS[expr.op]
+    value = expr.value
+    return lambda row: compare(get(row), value)
+
+
+def coerce_literal(table: UFOTable, column: str, value: Any) -> Any:
+    # Literals are converted once to the column's type, so comparisons run on native values.
+    column = column.split(".")[-1]
+    try:
+        return table._coerce(column, value)
+    except ValueError as e:
+        raise QueryError(f"{e} (column '{column}')")
+
+
+# --- operators -------------------------------------------------------------------
+
+class Operator:
+    # Every operator yields tuples laid out as self.columns.
+    columns: List[str] = []
+    children: List["Operator"] = []
+
+    def __iter__(self) -> Iterator[tuple]:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+    def explain(self, depth: int = 0) -> str:
+        lines = ["  " * depth + self.describe()]
+        for child in self.children:
+            lines.append(child.explain(depth + 1))
+        return "\n".join(lines)
+
+
+class TableAccess(Operator):
+    # Reads rows straight from a table's column storage. `positions` picks the
+    # access path (full scan or index), `predicate` is the pushed-down filter
+    # evaluated on row positions before any tuple is built.
+    def __init__(self, table: UFOTable, path: str, positions: Callable[[], Iterator[int]],
+                 predicate: Optional[Callable[[int], bool]] = None, residual=None):
+        self.table = table
+        self.path = path
+        self.positions = positions
+        self.predicate = predicate
+        self.residual = residual
+        self.columns = table.columns + ["id"]
+        self.children = []
+
+    def describe(self) -> str:
+        text = f"{self.path} on {self.table.name}"
+        if self.residual is not None:
+            text += f" filter {self.residual!r}"
+        return text
+
+    def iter_positions(self) -> Iterator[int]:
+        predicate = self.predicate
+        for pos in self.positions():
+            if predicate is None or predicate(pos):
+                yield pos
+
+    def __iter__(self) -> Iterator[tuple]:
+        table = self.table
+        data = [table._column(col) for col in table.columns]
+        ids = table._ids
+        for pos in self.iter_positions():
+            yield tuple(col[pos] for col in data) + (ids[pos],)
+
+
+class Aggregate(Operator):
+    # Groups and aggregates the rows selected by a TableAccess; an unfiltered
+    # full scan hands the whole table to the (vectorized) aggregate engine.
+    def __init__(self, child: TableAccess, specs: List[AggregateSpec], group_by: List[str]):
+        self.child = child
+        self.children = [child]
+        self.specs = specs
+        self.group_by = group_by
+        self.columns = group_by + [spec.name for spec in specs]
+
+    def describe(self) -> str:
+        text = "Aggregate " + ", ".join(spec.name for spec in self.specs)
+        return text + (" GROUP BY " + ", ".join(self.group_by) if self.group_by else "")
+
+    def __iter__(self) -> Iterator[tuple]:
+        child = self.child
+        positions = None
+        if child.path != "TableScan" or child.predicate is not None:
+            positions = list(child.iter_positions())
+        try:
+            return iter(aggregate(child.table, self.specs, self.group_by, positions).rows)
+        except ValueError as e:
+            raise QueryError(str(e))
+
+
+class HashJoin(Operator):
+    # Equi-join. The input with fewer (estimated) rows is loaded into a hash
+    # table on its key and the other one is streamed past it, so memory grows
+    # with the smaller side only. Rows are laid out as left + right either way.
+    def __init__(self, left: Operator, right: Operator, left_key: int, right_key: int):
+        self.left = left
+        self.right = right
+        self.children = [left, right]
+        left_columns, right_columns = _qualified_columns(left), _qualified_columns(right)
+        self.columns = left_columns + right_columns
+        self.types = _column_types(left) + _column_types(right)
+        self.left_key = left_key
+        self.right_key = right_key
+        self.build_left = _estimate_rows(left) <= _estimate_rows(right)
+        left_type, right_type = self.types[left_key], self.types[len(left_columns) + right_key]
+        # Keys of different types are matched on their text form.
+        self.key_types = (left_type, right_type) if left_type != right_type else None
+        self.skip_empty = "str" in (left_type, right_type)  # empty text is missing, as NULL would be in SQL
+
+    def describe(self) -> str:
+        left, right = self.columns[self.left_key], self.columns[len(_qualified_columns(self.left)) + self.right_key]
+        return f"HashJoin {left} = {right} (build {'left' if self.build_left else 'right'})"
+
+    def _keys(self, rows: Iterator[tuple], key: int, type_name: str) -> Iterator[Tuple[Any, tuple]]:
+        convert = self.key_types is not None
+        skip_empty = self.skip_empty
+        for row in rows:
+            value = row[key]
+            if convert:
+                value = format_value(type_name, value)
+            if skip_empty and value == "":
+                continue
+            yield value, row
+
+    def __iter__(self) -> Iterator[tuple]:
+        left_type, right_type = self.key_types or (None, None)
+        sides = [(self.left, self.left_key, left_type), (self.right, self.right_key, right_type)]
+        if not self.build_left:
+            sides.reverse()
+        (build, build_key, build_type), (probe, probe_key, probe_type) = sides
+        buckets: Dict[Any, List[tuple]] = {}
+        for value, row in self._keys(build, build_key, build_type):
+            bucket = buckets.get(value)
+            if bucket is None:
+                buckets[value] = [row]
+            else:
+                bucket.append(row)
+        get = buckets.get
+        build_left = self.build_left
+        for value, row in self._keys(probe, probe_key, probe_type):
+            matches = get(value)
+            if matches:
+                for match in matches:
+                    yield match + row if build_left else row + match
+
+
+def _qualified_columns(op: Operator) -> List[str]:
+    if isinstance(op, TableAccess):
+        return [f"{op.table.name}.{column}" for column in op.columns]
+    return op.columns
+
+
+def _column_types(op: Operator) -> List[str]:
+    if isinstance(op, TableAccess):
+        return [op.table.types.get(column, "str") for column in op.table.columns] + ["int"]
+    return op.types
+
+
+def _estimate_rows(op: Operator) -> int:
+    if isinstance(op, TableAccess):
+        return 1 if op.path.startswith("PrimaryKeyLookup") else len(op.table)
+    if isinstance(op, HashJoin):
+        return max(_estimate_rows(op.left), _estimate_rows(op.right))
+    return 0
+
+
+class Filter(Operator):
+    def __init__(self, child: Operator, expr):
+        self.child = child
+        self.children = [child]
+        self.columns = child.columns
+        self.expr = expr
+        self.predicate = compile_predicate(expr, lambda column: itemgetter(_column_position(child.columns, column)))
+
+    def describe(self) -> str:
+        return f"Filter {self.expr!r}"
+
+    def __iter__(self) -> Iterator[tuple]:
+        return filter(self.predicate, self.child)
+
+
+class Sort(Operator):
+    def __init__(self, child: Operator, order_by: List[Tuple[str, bool]]):
+        self.child = child
+        self.children = [child]
+        self.columns = child.columns
+        self.order_by = order_by
+
+    def describe(self) -> str:
+        return "Sort " + ", ".join(f"{col} {'DESC' if desc else 'ASC'}" for col, desc in self.order_by)
+
+    def __iter__(self) -> Iterator[tuple]:
+        rows = list(self.child)
+        # Stable sorts applied from the last key to the first give a multi-key order.
+        for column, descending in reversed(self.order_by):
+            rows.sort(key=itemgetter(_column_position(self.columns, column)), reverse=descending)
+        return iter(rows)
+
+
+class Limit(Operator):
+    def __init__(self, child: Operator, count: int):
+        self.child = child
+        self.children = [child]
+        self.columns = child.columns
+        self.count = count
+
+    def describe(self) -> str:
+        return f"Limit {self.count}"
+
+    def __iter__(self) -> Iterator[tuple]:
+        count = self.count
+        if count <= 0:
+            return
+        for i, row in enumerate(self.child, 1):
+            yield row
+            if i >= count:
+                return
+
+
+class Project(Operator):
+    def __init__(self, child: Operator, columns: List[str]):
+        self.child = child
+        self.children = [child]
+        self.columns = columns
+        self.positions = [_column_position(child.columns, col) for col in columns]
+
+    def describe(self) -> str:
+        return "Project " + ", ".join(self.columns)
+
+    def __iter__(self) -> Iterator[tuple]:
+        positions = self.positions
+        for row in self.child:
+            yield tuple(row[i] for i in positions)
+
+
+def _column_position(columns: List[str], column: str) -> int:
+    if column in columns:
+        return columns.index(column)
+    # Allow qualified names (table.column) to match bare columns and vice versa.
+    bare = column.split(".")[-1]
+    matches = [i for i, name in enumerate(columns) if name.split(".")[-1] == bare]
+    if len(matches) == 1:
+        return matches[0]
+    if matches:
+        raise QueryError(f"Column '{column}' is ambiguous.")
+    raise QueryError(f"Column '{column}' not found.")
+
+
+# --- planner ---------------------------------------------------------------------
+
+def _conjuncts(expr) -> list:
+    if expr is None:
+        return []
+    if isinstance(expr, And):
+        return [term for sub in expr.terms for term in _conjuncts(sub)]
+    return [expr]
+
+
+RANGE_OPS = {"<", "<=", ">", ">="}
+
+
+def _access_path(table: UFOTable, conjuncts: list):
+    # Picks the cheapest way to read the table: a primary-key or index equality
+    # lookup first, then a sorted-index range or prefix scan, else a full scan.
+    # Returns (description, ids or None, used conjuncts, sorted_by column).
+    for term in conjuncts:
+        if isinstance(term, Compare) and term.op == "=":
+            if term.column == "id" and "id" not in table.indexes:
+                record = table.get_record(term.value)
+                return f"PrimaryKeyLookup id = {term.value!r}", \
+                    (lambda: [] if record is None else [record.record_id]), [term], None
+            index = table.indexes.get(term.column)
+            if index is not None:
+                return f"{type(index).__name__}Lookup {term!r}", \
+                    (lambda index=index, value=term.value: index.lookup(value)), [term], None
+    for column, index in table.indexes.items():
+        if not isinstance(index, SortedIndex):
+            continue
+        bounds = [term for term in conjuncts
+                  if isinstance(term, Compare) and term.column == column and term.op in RANGE_OPS]
+        if bounds:
+            low = high = None
+            include_low = include_high = True
+            for term in bounds:
+                inclusive = term.op in (">=", "<=")
+                if term.op in (">", ">="):
+                    if low is None or term.value > low:
+                        low, include_low = term.value, inclusive
+                    elif term.value == low:
+                        include_low = include_low and inclusive
+                elif high is None or term.value < high:
+                    high, include_high = term.value, inclusive
+                elif term.value == high:
+                    include_high = include_high and inclusive
+            # Every bound is enforced by the range, so all of them are consumed.
+            return f"SortedIndexRange {column} in {'[' if include_low else '('}{low!r}, " \
+                   f"{high!r}{']' if include_high else ')'}", \
+                (lambda: index.range(low, high, include_low, include_high)), bounds, column
+        for term in conjuncts:
+            if isinstance(term, Compare) and term.column == column and term.op == "LIKE" \
+                    and table.types.get(column, "str") == "str" \
+                    and term.value.endswith("%") and "%" not in term.value[:-1]:
+                prefix = term.value[:-1]
+                return f"SortedIndexPrefix {column} LIKE {term.value!r}", \
+                    (lambda: index.prefix(prefix)), [term], column
+    return "TableScan", None, [], None
+
+
+def _get_table(db: Relative_DB, name: str) -> UFOTable:
+    if name not in db.tables:
+        raise QueryError(f"Table '{name}' does not exist.")
+    return db.tables[name]  # scans skip deleted rows, so a read never compacts
+
+
+def _table_access(table: UFOTable, conjuncts: list) -> Tuple[TableAccess, Optional[str]]:
+    path, ids, used, sorted_by = _access_path(table, conjuncts)
+    residual_terms = [term for term in conjuncts if term not in used]
+    residual = None
+    if residual_terms:
+        residual = residual_terms[0] if len(residual_terms) == 1 else And(residual_terms)
+
+    if ids is None:
+        positions = lambda: (pos for pos, record_id in enumerate(table._ids) if record_id)
+    else:
+        positions = lambda: (table._index[record_id] for record_id in ids())
+    predicate = None
+    if residual is not None:
+        predicate = compile_predicate(residual, lambda column: _position_getter(table, column))
+    return TableAccess(table, path, positions, predicate, residual), sorted_by
+
+
+def plan(db: Relative_DB, query: Query) -> Operator:
+    if query.joins:
+        return _plan_join(db, query)
+    table = _get_table(db, query.table)
+    for term in _walk(query.where):
+        # table.column is the column itself, so indexes and row getters see the bare name.
+        _owner([table], term.column)
+        term.column = term.column.rpartition(".")[2]
+        if term.op != "LIKE":
+            term.value = coerce_literal(table, term.column, term.value)
+
+    op: Operator
+    op, sorted_by = _table_access(table, _conjuncts(query.where))
+
+    if query.aggregates or query.group_by:
+        for column in query.group_by + [spec.column for spec in query.aggregates if spec.column != "*"]:
+            _column_position(table.columns + ["id"], column)
+        aggregated = {spec.name for spec in query.aggregates}
+        if query.columns == ["*"]:
+            raise QueryError("SELECT * cannot be combined with GROUP BY.")
+        for column in query.columns:
+            if column not in aggregated and column not in query.group_by:
+                raise QueryError(f"Column '{column}' must appear in GROUP BY or be aggregated.")
+        op = Aggregate(op, query.aggregates, query.group_by)
+        if query.order_by:
+            op = Sort(op, query.order_by)
+        if query.limit is not None:
+            op = Limit(op, query.limit)
+        return Project(op, query.columns)
+
+    # A sorted-index scan already yields rows in ascending order of its column.
+    if query.order_by and query.order_by != [(sorted_by, False)]:
+        op = Sort(op, query.order_by)
+    if query.limit is not None:
+        op = Limit(op, query.limit)
+    if query.columns != ["*"]:
+        op = Project(op, query.columns)
+    return op
+
+
+def _owner(tables: List[UFOTable], column: str) -> UFOTable:
+    prefix, _, bare = column.rpartition(".")
+    owners = [table for table in tables
+              if (not prefix or table.name == prefix) and bare in table.columns + ["id"]]
+    if len(owners) > 1:
+        raise QueryError(f"Column '{column}' is ambiguous.")
+    if not owners:
+        raise QueryError(f"Column '{column}' not found.")
+    return owners[0]
+
+
+def _unqualified(expr):
+    if isinstance(expr, (And, Or)):
+        return type(expr)([_unqualified(term) for term in expr.terms])
+    return Compare(expr.column.rpartition(".")[2], expr.op, expr.value)
+
+
+def _join_keys(left_columns: List[str], right_columns: List[str], first: str, second: str) -> Tuple[int, int]:
+    for left, right in ((first, second), (second, first)):
+        try:
+            return _column_position(left_columns, left), _column_position(right_columns, right)
+        except QueryError:
+            continue
+    raise QueryError(f"JOIN condition {first} = {second} must compare a column from each side.")
+
+
+def _plan_join(db: Relative_DB, query: Query) -> Operator:
+    names = [query.table] + [name for name, _, _ in query.joins]
+    if len(set(names)) != len(names):
+        raise QueryError("A table can appear only once in a join.")
+    if query.aggregates or query.group_by:
+        raise QueryError("GROUP BY and aggregates are not supported with JOIN.")
+    tables = [_get_table(db, name) for name in names]
+
+    # A condition on a single table is pushed down to that table's access
+    # path (so its indexes apply); the rest filter the joined rows.
+    pushed: Dict[str, list] = {name: [] for name in names}
+    residual_terms = []
+    for term in _conjuncts(query.where):
+        owners = set()
+        for compare in _walk(term):
+            table = _owner(tables, compare.column)
+            owners.add(table.name)
+            if compare.op != "LIKE":
+                compare.value = coerce_literal(table, compare.column, compare.value)
+        if len(owners) == 1:
+            pushed[owners.pop()].append(_unqualified(term))
+        else:
+            residual_terms.append(term)
+
+    op: Operator = _table_access(tables[0], pushed[tables[0].name])[0]
+    for (_, first, second), table in zip(query.joins, tables[1:]):
+        right = _table_access(table, pushed[table.name])[0]
+        left_key, right_key = _join_keys(_qualified_columns(op), _qualified_columns(right), first, second)
+        op = HashJoin(op, right, left_key, right_key)
+    if residual_terms:
+        op = Filter(op, residual_terms[0] if len(residual_terms) == 1 else And(residual_terms))
+    if query.order_by:
+        op = Sort(op, query.order_by)
+    if query.limit is not None:
+        op = Limit(op, query.limit)
+    if query.columns != ["*"]:
+        op = Project(op, query.columns)
+    return op
+
+
+def _walk(expr) -> Iterator[Compare]:
+    if isinstance(expr, (And, Or)):
+        for term in expr.terms:
+            yield from _walk(term)
+    elif expr is not None:
+        yield expr
+
+
+def _position_getter(table: UFOTable, column: str) -> Callable[[int], Any]:
+    if column == "id":
+        return table._ids.__getitem__
+    if column not in table.columns:
+        raise QueryError(f"Column '{column}' not found.")
+    return table._column(column).__getitem__
+
+
+class QueryResult:
+    def __init__(self, columns: List[str], rows: List[tuple], plan_text: str):
+        self.columns = columns
+        self.rows = rows
+        self.plan = plan_text
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def format(self, max_rows: int = 200) -> str:
+        rows = [[str(value) for value in row] for row in self.rows[:max_rows]]
+        widths = [max([len(col)] + [len(row[i]) for row in rows]) for i, col in enumerate(self.columns)]
+        lines = [" | ".join(col.ljust(width) for col, width in zip(self.columns, widths)),
+                 "-+-".join("-" * width for width in widths)]
+        lines += [" | ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+        if len(self.rows) > max_rows:
+            lines.append(f"... {len(self.rows) - max_rows} more rows")
+        return "\n".join(lines)
+
+
+def is_query(text: str) -> bool:
+    return re.match(r"\s*(SELECT|EXPLAIN)\b", text, re.IGNORECASE) is not None
+
+
+def _run(db: Relative_DB, query: Query) -> QueryResult:
+    op = plan(db, query)
+    if query.explain:
+        return QueryResult(["plan"], [(line,) for line in op.explain().split("\n")], op.explain())
+    return QueryResult(op.columns, list(op), op.explain())
+
+
+def execute(db: Relative_DB, text: str) -> QueryResult:
+    return _run(db, parse(text))
+
+
+def join(db: Relative_DB, left: str, right: str, left_column: str, right_column: str,
+         columns: Optional[List[str]] = None) -> QueryResult:
+    # left ⋈ right on left.left_column = right.right_column, same as
+    # SELECT ... FROM left JOIN right ON left.left_column = right.right_column.
+    query = Query()
+    query.table = left
+    query.joins = [(right, f"{left}.{left_column}", f"{right}.{right_column}")]
+    if columns:
+        query.columns = list(columns)
+    return _run(db, query)
@@ -0,0 +1,238 @@
+from typing import Any, Callable, Dict, Optional
+import argparse
+import asyncio
+import json
+import os
+
+from . import metrics
+from .concurrency import ConcurrentDB
+from .pyufodb import Relative_DB
+
+# Headless server: serves the .ufo databases of a directory (src/saves by
+# default) to any number of local clients, so several jobs share one
+# in-memory copy instead of each loading the file.
+#
+#   python -m src.server [--host 127.0.0.1] [--port 7707] [--saves src/saves]
+#
+# The protocol is newline-delimited JSON over TCP. A request names the
+# database (the file name without .ufo) and an operation:
+#
+#   {"id": 1, "db": "database", "op": "insert", "table": "sightings", "data": {...}}
+#   -> {"id": 1, "ok": true, "result": 7}
+#   -> {"id": 1, "ok": false, "error": "..."}
+#
+# "id" only pairs a response with its request; get, update and delete name
+# their row with "record_id".
+#
+# Clients may pipeline: requests on one connection run in order and their
+# responses come back in the same order, without waiting for each other.
+# Writes are applied at once but only acknowledged after the journal holding
+# them is flushed. One flush runs at a time and the writes that arrive while
+# it runs share the next one (group commit). A database is loaded on first use and its journal folded back on
+# shutdown. Don't open a served file in the editor at the same time.
+# Run with UFODB_METRICS=1 to collect operation metrics, read with {"op": "metrics"}.
+
+DEFAULT_PORT = 7707
+MAX_LINE = 64 * 1024 * 1024  # largest request, e.g. an insert_many batch
+WRITE_OPS = {"create_table", "insert", "insert_many", "update", "update_many", "delete", "flush"}
+
+
+def _result(result) -> Dict[str, Any]:
+    return {"columns": result.columns, "rows": [list(row) for row in result.rows]}
+
+
+def _insert_many(db: ConcurrentDB, request: Dict[str, Any]) -> Dict[str, int]:
+    ids = db.insert_many(request["table"], request["rows"])
+    return {"first_id": ids.start, "count": len(ids)}
+
+
+# op -> handler(db, request); each runs on a worker thread under ConcurrentDB's locks.
+OPERATIONS: Dict[str, Callable[[ConcurrentDB, Dict[str, Any]], Any]] = {
+    "tables": lambda db, r: {name: db.db.tables[name].columns for name in db.table_names()},
+    "create_table": lambda db, r: db.create_table(r["table"], r["columns"], r.get("types")),
+    "insert": lambda db, r: db.insert(r["table"], r["data"]),
+    "insert_many": _insert_many,
+    "get": lambda db, r: db.get_record(r["table"], r["record_id"]),
+    "select": lambda db, r: db.select_where(r["table"], r["field"], r["value"]),
+    "count": lambda db, r: db.count(r["table"]),
+    "update": lambda db, r: db.update(r["table"], r["record_id"], r["data"]),
+    "update_many": lambda db, r: db.update_many(r["table"], {int(record_id): updates
+                                                             for record_id, updates in r["data"].items()}),
+    "delete": lambda db, r: db.delete_record(r["table"], r["record_id"]),
+    "query": lambda db, r: _result(db.query(r["text"])),
+    "aggregate": lambda db, r: _result(db.aggregate(r["table"], r["specs"], r.get("group_by"))),
+    "flush": lambda db, r: None,
+    "metrics": lambda db, r: metrics.snapshot(),  # for the whole server; see metrics.py
+}
+
+
+class ServedDatabase:
+    def __init__(self, path: str, db: ConcurrentDB):
+        self.path = path
+        self.db = db
+        self._next_flush: Optional[asyncio.Task] = None  # collects writes until it starts
+        self._last_flush: Optional[asyncio.Task] = None
+
+    def durable(self) -> "asyncio.Future":
+        # Resolves once every write applied so far is in the journal.
+        if self._next_flush is None:
+            self._next_flush = self._last_flush = asyncio.get_running_loop().create_task(
+                self._flush(self._last_flush))
+        return asyncio.shield(self._next_flush)
+
+    async def _flush(self, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        self._next_flush = None  # writes from now on wait for the next flush
+        if not await asyncio.get_running_loop().run_in_executor(None, self.db.flush):
+            raise IOError(f"Failed to write the journal of {self.path}.")
+
+    def close(self) -> None:
+        # Folds the journal into the file, so the next load starts clean.
+        if self.db.db.journal is not None:
+            self.db.flush()
+            self.db.db.checkpoint()
+
+
+class UFOServer:
+    def __init__(self, saves_dir: str = "src/saves"):
+        self.saves_dir = saves_dir
+        self.databases: Dict[str, ServedDatabase] = {}
+        self._opening: Dict[str, asyncio.Task] = {}
+
+    def _load(self, name: str) -> ServedDatabase:
+        path = os.path.join(self.saves_dir, name + ".ufo")
+        db = Relative_DB()
+        if not db.load_from_file(path):
+            raise RuntimeError(f"Failed to load database '{name}'.")
+        db.open_journal(path)
+        return ServedDatabase(path, ConcurrentDB(db))
+
+    async def database(self, name: Any) -> ServedDatabase:
+        if not isinstance(name, str) or not name or os.path.basename(name) != name:
+            raise ValueError(f"Invalid database name {name!r}.")
+        served = self.databases.get(name)
+        if served is not None:
+            return served
+        if not os.path.exists(os.path.join(self.saves_dir, name + ".ufo")):
+            raise RuntimeError(f"Database '{name}' not found.")
+        # Concurrent first requests share one load.
+        task = self._opening.get(name)
+        if task is None:
+            task = self._opening[name] = asyncio.ensure_future(
+                asyncio.get_running_loop().run_in_executor(None, self._load, name))
+        try:
+            served = await asyncio.shield(task)
+        finally:
+            self._opening.pop(name, None)
+        self.databases[name] = served
+        return served
+
+    async def execute(self, request: Dict[str, Any]) -> "asyncio.Future":
+        # Applies one request and returns a future for its response: already
+        # resolved for reads, resolved after the next flush for writes.
+        loop = asyncio.get_running_loop()
+        response = loop.create_future()
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            op = request.get("op")
+            handler = OPERATIONS.get(op)
+            if handler is None:
+                raise ValueError(f"Unknown operation {op!r}. Use one of: {', '.join(OPERATIONS)}.")
+            served = await self.database(request.get("db"))
+            result = await loop.run_in_executor(None, handler, served.db, request)
+        except KeyError as e:
+            response.set_result({"id": request_id, "ok": False, "error": f"Missing field {e}."})
+            return response
+        except Exception as e:  # a malformed request must not take the connection down
+            response.set_result({"id": request_id, "ok": False, "error": str(e)})
+            return response
+        if op not in WRITE_OPS:
+            response.set_result({"id": request_id, "ok": True, "result": result})
+            return response
+
+        def flushed(flush: "asyncio.Future") -> None:
+            if flush.cancelled() or flush.exception() is not None:
+                error = "Server shut down." if flush.cancelled() else str(flush.exception())
+                response.set_result({"id": request_id, "ok": False, "error": error})
+            else:
+                response.set_result({"id": request_id, "ok": True, "result": result})
+
+        served.durable().add_done_callback(flushed)
+        return response
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        responses: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send(responses, writer))
+        try:
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                    except ValueError as e:
+                        failed = asyncio.get_running_loop().create_future()
+                        failed.set_result({"id": None, "ok": False, "error": f"Invalid JSON: {e}"})
+                        responses.put_nowait(failed)
+                    else:
+                        responses.put_nowait(await self.execute(request))
+            except (ConnectionError, ValueError):  # ValueError: a request longer than MAX_LINE
+                pass
+            # Send what is still owed before closing.
+            responses.put_nowait(None)
+            await sender
+        except asyncio.CancelledError:  # the server is shutting down
+            pass
+        finally:
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, responses: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        # Responses go out in request order; the socket is drained only when
+        # no more are ready, so pipelined responses share a write.
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            try:
+                writer.write(json.dumps(await response).encode("utf-8") + b"\n")
+                if responses.empty():
+                    await writer.drain()
+            except ConnectionError:
+                break
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                    ready: Optional[Callable[[int], None]] = None) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for served in self.databases.values():
+                served.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the .ufo databases of a directory over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--saves", default="src/saves")
+    args = parser.parse_args()
+    server = UFOServer(args.saves)
+    try:
+        asyncio.run(server.serve(args.host, args.port,
+                                 ready=lambda port: print(f"Serving {args.saves} on {args.host}:{port}")))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
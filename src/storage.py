@@ -0,0 +1,256 @@
+from typing import Dict, List
+from array import array
+import csv
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+
+from .journal import Journal
+from .pyufodb import Relative_DB, UFOTable, COLUMN_TYPES, report_progress
+
+# Binary .ufo v2 layout (all integers little-endian):
+#
+#   header     MAGIC | u16 version | u16 reserved | u32 table count | u64 directory offset
+#   blocks     u64 payload length | payload            (one per id list / column)
+#   directory  u64 payload length | UTF-8 JSON         (tables, columns, block offsets, journal_lsn)
+#
+# An id block is a raw int64 array; int, float and bool column blocks are raw
+# int64, float64 and int8 arrays. A text column block is a u64 value count,
+# an int64 array of end offsets and the concatenated UTF-8 values. Formula cells
+# are listed in the directory as [id, column, formula] triples.
+MAGIC = b"UFO2"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIQ")
+LENGTH = struct.Struct("<Q")
+
+
+def detect_version(filename: str) -> int:
+    with open(filename, 'rb') as f:
+        return VERSION if f.read(len(MAGIC)) == MAGIC else 1
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _native_array(buffer, typecode: str = 'q') -> array:
+    values = array(typecode)
+    values.frombytes(buffer)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _encode_text(values: List[str]) -> bytes:
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = array('q')
+    end = 0
+    for item in encoded:
+        end += len(item)
+        offsets.append(end)
+    return LENGTH.pack(len(encoded)) + _little_endian(offsets) + b"".join(encoded)
+
+
+def _decode_text(buffer) -> List[str]:
+    count = LENGTH.unpack_from(buffer, 0)[0]
+    start = LENGTH.size + count * 8
+    offsets = _native_array(buffer[LENGTH.size:start])
+    blob = bytes(buffer[start:])
+    text = blob.decode('utf-8')
+    values = []
+    begin = 0
+    if len(text) == len(blob):
+        # Pure ASCII: byte offsets are character offsets, slice the decoded text.
+        for end in offsets:
+            values.append(text[begin:end])
+            begin = end
+    else:
+        for end in offsets:
+            values.append(blob[begin:end].decode('utf-8'))
+            begin = end
+    return values
+
+
+def _encode_column(table: UFOTable, column: str) -> bytes:
+    if table.types.get(column, "str") == "str":
+        return _encode_text(table._column(column))
+    return _little_endian(table._column(column))
+
+
+def _column_loader(buffer, location: List[int], type_name: str):
+    typecode = COLUMN_TYPES[type_name]
+    if typecode is None:
+        return lambda: _decode_text(_block(buffer, location))
+    return lambda: _native_array(_block(buffer, location), typecode)
+
+
+class _BlockWriter:
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def write(self, payload: bytes) -> List[int]:
+        offset = self.f.tell()
+        self.f.write(LENGTH.pack(len(payload)))
+        self.f.write(payload)
+        self.count += 1
+        return [offset, len(payload)]
+
+
+def save_v2(db: Relative_DB, filename: str, progress=None, cancel=None) -> None:
+    directory = []
+    total = sum(len(table.columns) + 1 for table in db.tables.values()) or 1
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(db.tables), 0))
+        blocks = _BlockWriter(f)
+
+        def column_block(table: UFOTable, col: str) -> List[int]:
+            location = blocks.write(_encode_column(table, col))
+            report_progress(progress, cancel, blocks.count / total)
+            return location
+
+        for table_name, table in db.tables.items():
+            if table._dead:
+                table._compact()
+            entry = {
+                "name": table_name,
+                "columns": list(table.columns),
+                "next_id": table.next_id,
+                "rows": len(table._ids),
+                "ids": blocks.write(_little_endian(table._ids)),
+                "types": {col: table.types.get(col, "str") for col in table.columns},
+                "blocks": {col: column_block(table, col) for col in table.columns},
+                "indexes": {col: index.kind for col, index in table.indexes.items()},
+                "formulas": [[record_id, col, text] for (record_id, col), text in table.formulas.items()],
+            }
+            directory.append(entry)
+        directory_offset = blocks.write(json.dumps({"tables": directory, "journal_lsn": db.journal_lsn})
+                                        .encode('utf-8'))[0]
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(db.tables), directory_offset))
+
+
+def _block(buffer, location: List[int]):
+    offset, length = location
+    start = offset + LENGTH.size
+    return memoryview(buffer)[start:start + length]
+
+
+def read_directory(buffer) -> Dict:
+    try:
+        magic, version, _, _, directory_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a .ufo v2 file.")
+        length = LENGTH.unpack_from(buffer, directory_offset)[0]
+    except struct.error as e:
+        raise ValueError(f"Truncated .ufo v2 file: {e}")
+    return json.loads(bytes(_block(buffer, [directory_offset, length])))
+
+
+def load_v2(db: Relative_DB, filename: str, progress=None, cancel=None) -> None:
+    with open(filename, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    tables = {}
+    contents = read_directory(buffer)
+    directory = contents["tables"]
+    for i, entry in enumerate(directory):
+        report_progress(progress, cancel, i / len(directory))
+        types = entry.get("types", {})
+        table = UFOTable(entry["name"], entry["columns"], types)
+        table.next_id = entry["next_id"]
+        # Column blocks stay in the mapping and are decoded on first access.
+        table._load_columns(_native_array(_block(buffer, entry["ids"])), {}, lazy={
+            col: _column_loader(buffer, location, types.get(col, "str"))
+            for col, location in entry["blocks"].items()
+        })
+        for col, kind in entry["indexes"].items():
+            table.create_index(col, kind)
+        table.formulas = {(record_id, col): text for record_id, col, text in entry.get("formulas", [])}
+        tables[entry["name"]] = table
+    db.tables.update(tables)
+    db.journal_lsn = contents.get("journal_lsn", 0)
+
+
+def convert_file(source: str, destination: str, version: int = VERSION) -> bool:
+    db = Relative_DB()
+    if not db.load_from_file(source):
+        return False
+    return db.save_to_file(destination, version=version)
+
+
+def _clean_csv_value(value: str) -> str:
+    # v1 rows are '|'-separated lines, so separators and line breaks cannot be stored.
+    return value.replace('|', '/').replace('\r', ' ').replace('\n', ' ')
+
+
+def import_csv(csv_path: str, ufo_path: str, table_name: str = "sightings",
+               delimiter: str = ",", encoding: str = "utf-8-sig") -> int:
+    # Streams a CSV file (first row = column names) into a v1 .ufo file without
+    # holding the rows in memory: records go to a scratch file first because the
+    # row count has to be written before them. Returns the number of rows.
+    rows_path = ufo_path + ".rows"
+    temp_path = ufo_path + ".tmp"
+    try:
+        with open(csv_path, 'r', encoding=encoding, newline='') as source, \
+                open(rows_path, 'w', encoding='utf-8') as rows_file:
+            reader = csv.reader(source, delimiter=delimiter)
+            header = next(reader, None)
+            if not header:
+                raise ValueError(f"CSV file '{csv_path}' has no header row.")
+            columns = []
+            for i, name in enumerate(header):
+                name = _clean_csv_value(name).strip() or f"column{i + 1}"
+                while name in columns or name == "id":
+                    name += "_"
+                columns.append(name)
+            width = len(columns)
+            count = 0
+            for row in reader:
+                if not row:
+                    continue
+                count += 1
+                values = [_clean_csv_value(value) for value in row[:width]]
+                values += [""] * (width - len(values))
+                values.append(str(count))
+                rows_file.write('|'.join(values) + '\n')
+        with open(temp_path, 'w', encoding='utf-8') as f, open(rows_path, 'r', encoding='utf-8') as rows_file:
+            f.write(f"1\n{table_name}\n{width}\n")
+            f.write('\n'.join(columns) + '\n')
+            f.write(f"{count + 1}\n{count}\n")
+            shutil.copyfileobj(rows_file, f)
+        os.replace(temp_path, ufo_path)
+        Journal(Journal.path_for(ufo_path)).clear()
+        return count
+    finally:
+        for path in (rows_path, temp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def export_csv(db: Relative_DB, table_name: str, csv_path: str, delimiter: str = ",",
+               include_id: bool = False, encoding: str = "utf-8") -> int:
+    # Writes a table as CSV (first row = column names), column values in their
+    # text form. Returns the number of rows.
+    table = db._table(table_name)
+    if table._dead:
+        table._compact()
+    columns = [table._text_values(col) for col in table.columns]
+    if include_id:
+        columns.append(map(str, table._ids))
+    temp_path = csv_path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding=encoding, newline='') as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            writer.writerow(table.columns + (["id"] if include_id else []))
+            writer.writerows(zip(*columns))
+        os.replace(temp_path, csv_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return len(table._ids)
@@ -4,13 +4,18 @@ import time
 import os
 from src.pyufodb import Relative_DB
 from src.otherFunc import githubLink, AuthorLink
-from src.dbEditor import DBEditor
-from .ai import create_ai_frame
+from src.storage import import_csv
+from src.catalog import SavesCatalog
 import shutil
 from tkinter import filedialog
 
+# The editor (with the query engine) and the AI window (with gradio_client)
+# are imported when first opened, so the file manager comes up without them.
+
 
 class DatabaseApp(CTkToplevel):
+    FILE_POLL_MS = 2000
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.title("Database Interface")
@@ -19,6 +24,7 @@ class DatabaseApp(CTkToplevel):
         self.gradient_colors = [(78, 84, 200), (143, 148, 251)]
         self.current_color_index = 0
         self.create_db_frame = None 
+        self.file_poll_id = None
 
         self.load_frame()
 
@@ -147,6 +153,7 @@ class DatabaseApp(CTkToplevel):
         ai_window.lift() 
 
 
+        from .ai import create_ai_frame
         ai_frame = create_ai_frame(ai_window)
         ai_frame.pack(fill=BOTH, expand=True)
 
@@ -176,55 +183,95 @@ class DatabaseApp(CTkToplevel):
         if not os.path.exists(self.saves_dir):
             os.makedirs(self.saves_dir)
 
+        # Rows are kept per file and patched from the catalog's changes
+        # instead of being rebuilt on every refresh.
+        self.catalog = SavesCatalog(self.saves_dir)
+        self.file_rows = {}
         self.refresh_file_list()
+        self.poll_file_list()
 
-    def refresh_file_list(self):
-        for widget in self.file_list_frame.winfo_children():
-            widget.destroy()
+    def poll_file_list(self):
+        if self.file_poll_id is not None:
+            self.after_cancel(self.file_poll_id)
+        if not self.winfo_exists():
+            return
+        self.refresh_file_list()
+        self.file_poll_id = self.after(self.FILE_POLL_MS, self.poll_file_list)
 
+    def refresh_file_list(self):
         if not os.path.exists(self.saves_dir):
             os.makedirs(self.saves_dir)
 
-        for filename in os.listdir(self.saves_dir):
-            if filename.endswith(".ufo"):
-                filepath = os.path.join(self.saves_dir, filename)
-                timestamp = os.path.getmtime(filepath)
-                formatted_time = time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
-
-                file_frame = CTkFrame(self.file_list_frame, height=30)
-                file_frame.pack(fill=X, padx=2, pady=2)
-
-                file_label = CTkLabel(file_frame, text=filename[:-4], anchor="w")
-                file_label.pack(side=LEFT, fill=X, expand=True, padx=5)
-                CTkLabel(file_frame, text=formatted_time, width=100, anchor="e").pack(side=RIGHT, padx=5)
-
-                file_label.bind("<Button-1>", lambda event, fp=filepath: self.open_db_editor(fp))
-                file_label.bind("<Enter>", lambda event: file_label.configure(cursor="hand2"))
-                file_label.bind("<Leave>", lambda event: file_label.configure(cursor=""))
-                
-                try:
-                    delete_button = CTkButton(file_frame, text="X", width=25, height=25,
-                                                command=lambda fp=filepath: self.delete_database(fp))
-                except TclError:
-                    delete_button = CTkButton(file_frame, text="X", width=25, height=25,
-                                                command=lambda fp=filepath: self.delete_database(fp))
-                delete_button.pack(side=RIGHT, padx=(0, 5))
+        added, changed, removed = self.catalog.refresh()
+        for entry in removed:
+            self.file_rows.pop(entry.path).destroy()
+        for entry in changed:
+            self.file_rows[entry.path].info_label.configure(text=self.file_info(entry))
+        for entry in added:
+            self.file_rows[entry.path] = self.create_file_row(entry)
+
+    def file_info(self, entry):
+        formatted_time = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime))
+        if entry.error:
+            return f"unreadable  {formatted_time}"
+        pending = "*" if entry.pending else ""
+        return f"{len(entry.tables)} tbl, {entry.rows}{pending} rows  {formatted_time}"
+
+    def create_file_row(self, entry):
+        filepath = entry.path
+        file_frame = CTkFrame(self.file_list_frame, height=30)
+        file_frame.pack(fill=X, padx=2, pady=2)
+
+        file_label = CTkLabel(file_frame, text=entry.name, anchor="w")
+        file_label.pack(side=LEFT, fill=X, expand=True, padx=5)
+        file_frame.info_label = CTkLabel(file_frame, text=self.file_info(entry), width=100, anchor="e")
+        file_frame.info_label.pack(side=RIGHT, padx=5)
+
+        file_label.bind("<Button-1>", lambda event, fp=filepath: self.open_db_editor(fp))
+        file_label.bind("<Enter>", lambda event: file_label.configure(cursor="hand2"))
+        file_label.bind("<Leave>", lambda event: file_label.configure(cursor=""))
+
+        try:
+            delete_button = CTkButton(file_frame, text="X", width=25, height=25,
+                                        command=lambda fp=filepath: self.delete_database(fp))
+        except TclError:
+            delete_button = CTkButton(file_frame, text="X", width=25, height=25,
+                                        command=lambda fp=filepath: self.delete_database(fp))
+        delete_button.pack(side=RIGHT, padx=(0, 5))
+        return file_frame
 
     def delete_database(self, filepath):
         if messagebox.askyesno("Подтверждение", f"Вы уверены, что хотите удалить базу данных {os.path.basename(filepath)}?"):
             try:
                 os.remove(filepath)
+                if os.path.exists(filepath + ".journal"):
+                    os.remove(filepath + ".journal")
                 messagebox.showinfo("Успешно", "База данных удалена.")
                 self.refresh_file_list() 
             except OSError as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить базу данных: {e}")            
 
     def load_file_dialog(self):
-        file_path = filedialog.askopenfilename(title="Select a UFO file", filetypes=[("UFO Files", "*.ufo")])
+        file_path = filedialog.askopenfilename(title="Select a UFO or CSV file",
+                                               filetypes=[("UFO Files", "*.ufo"), ("CSV Files", "*.csv")])
         if file_path:
-            self.copy_file_to_saves(file_path)
+            if file_path.lower().endswith(".csv"):
+                self.import_csv_to_saves(file_path)
+            else:
+                self.copy_file_to_saves(file_path)
             self.refresh_file_list()
 
+    def import_csv_to_saves(self, file_path):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        dest_path = os.path.join(self.saves_dir, f"{name}.ufo")
+        if os.path.exists(dest_path) and not messagebox.askyesno("Подтверждение", f"Файл {name}.ufo уже существует. Заменить?"):
+            return
+        try:
+            count = import_csv(file_path, dest_path)
+            messagebox.showinfo("Файл загружен", f"Импортировано строк: {count}.")
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось импортировать CSV: {e}")
+
     def copy_file_to_saves(self, file_path):
         filename = os.path.basename(file_path)
         dest_path = os.path.join(self.saves_dir, filename)
@@ -236,6 +283,7 @@ class DatabaseApp(CTkToplevel):
 
     
     def open_db_editor(self, db_file):
+        from .dbEditor import DBEditor
         DBEditor(self, db_file)
 
 if __name__ == "__main__":
@@ -0,0 +1,322 @@
+import customtkinter
+from tkinter import Canvas, font
+
+
+class VirtualGrid(customtkinter.CTkFrame):
+    """
+    Table grid that only draws the cells in view.
+
+    Cells are rectangles and text items on one Canvas. Items are created for
+    the visible area only and re-used while scrolling, so a million-row table
+    opens as fast as a hundred-row one. One entry widget is laid over the cell
+    being edited.
+
+    The grid keeps no data of its own: it asks row_count(), columns() and
+    cell_text(row, column) for whatever is on screen. Row -1 is the header.
+    """
+
+    CLICK_DELAY = 250  # ms; a single click waits this long so a double click can win
+
+    def __init__(self, master, row_count, columns, cell_text, edit_text=None, cell_color=None,
+                 on_edit=None, on_row_double_click=None, on_header_double_click=None,
+                 column_width=110, row_height=26, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_count = row_count
+        self.columns = columns
+        self.cell_text = cell_text
+        self.edit_text = edit_text or cell_text  # text put in the editor, e.g. a cell's formula
+        self.cell_color = cell_color  # optional (row, column) -> text color
+        self.on_edit = on_edit  # (row, column, text), called when an edit is committed
+        self.on_row_double_click = on_row_double_click
+        self.on_header_double_click = on_header_double_click
+        self.column_width = column_width
+        self.row_height = row_height
+
+        self.first_row = 0
+        self.x_offset = 0
+        self.editing = None  # (row, column) under the entry widget
+        self.read_only = False  # clicks neither edit nor delete while set
+        self._edit_original = ""
+        self._pending_click = None
+        self._pool = []  # pooled [(rect, text), ...] per screen row; screen row 0 is the header
+
+        self.font = font.Font(family="Arial", size=11)
+        self.max_chars = max(1, (column_width - 10) // self.font.measure("0"))
+
+        self.canvas = Canvas(self, borderwidth=0, highlightthickness=0,
+                             bg=self._apply_appearance_mode(self.cget("fg_color")))
+        self.vsb = customtkinter.CTkScrollbar(self, orientation="vertical", command=self.yview)
+        self.hsb = customtkinter.CTkScrollbar(self, orientation="horizontal", command=self.xview)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.hsb.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.entry = customtkinter.CTkEntry(self.canvas, corner_radius=0, border_width=1, font=("Arial", 13))
+        self.entry.bind("<Return>", lambda event: self._move_edit(1, 0))
+        self.entry.bind("<Tab>", lambda event: self._move_edit(0, 1))
+        self.entry.bind("<Escape>", lambda event: self.end_edit(commit=False))
+        self.entry.bind("<FocusOut>", lambda event: self.end_edit())
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.canvas.bind("<MouseWheel>", lambda event: self.scroll_rows(self._wheel_units(event.delta)))
+        self.canvas.bind("<Shift-MouseWheel>", lambda event: self.scroll_x(self._wheel_units(event.delta)))
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.canvas.bind("<Shift-Button-4>", lambda event: self.scroll_x(-1))
+        self.canvas.bind("<Shift-Button-5>", lambda event: self.scroll_x(1))
+
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self.canvas.config(bg=self._apply_appearance_mode(self.cget("fg_color")))
+        self.redraw()
+
+    @staticmethod
+    def _wheel_units(delta):
+        # Windows reports multiples of 120 per notch, macOS small raw deltas.
+        return -3 * int(delta / 120) if abs(delta) >= 120 else -delta
+
+    # --- geometry -----------------------------------------------------------
+
+    def _visible_rows(self):
+        return max(0, self.canvas.winfo_height() - self.row_height) // self.row_height
+
+    def _cell_at(self, x, y):
+        columns = len(self.columns())
+        column = (x + self.x_offset) // self.column_width
+        if y < self.row_height:
+            row = -1
+        else:
+            row = self.first_row + (y - self.row_height) // self.row_height
+            if row >= self.row_count():
+                return None
+        return (row, column) if column < columns else None
+
+    def _cell_origin(self, row, column):
+        y = 0 if row < 0 else self.row_height * (row - self.first_row + 1)
+        return column * self.column_width - self.x_offset, y
+
+    # --- drawing ------------------------------------------------------------
+
+    def _ensure_pool(self, screen_rows, screen_columns):
+        for items in self._pool:
+            while len(items) < screen_columns:
+                items.append((self.canvas.create_rectangle(0, 0, 0, 0),
+                              self.canvas.create_text(0, 0, anchor="w", font=self.font)))
+        while len(self._pool) < screen_rows:
+            self._pool.append([(self.canvas.create_rectangle(0, 0, 0, 0),
+                                self.canvas.create_text(0, 0, anchor="w", font=self.font))
+                               for _ in range(screen_columns)])
+
+    def _clip(self, text):
+        text = text.replace("\n", " ")
+        return text if len(text) <= self.max_chars else text[:self.max_chars - 1] + "…"
+
+    def redraw(self, from_row=None, from_column=None):
+        # With from_row / from_column only cells at or after that row / column
+        # are drawn again, unless the view itself has to move.
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        columns = self.columns()
+        row_count = self.row_count()
+        visible_rows = self._visible_rows()
+        view = (self.first_row, self.x_offset)
+        self.first_row = max(0, min(self.first_row, row_count - visible_rows))
+        self.x_offset = max(0, min(self.x_offset, len(columns) * self.column_width - width))
+
+        screen_rows = height // self.row_height + 2
+        screen_columns = width // self.column_width + 2
+        partial = (from_row is not None or from_column is not None) and view == (self.first_row, self.x_offset) \
+            and len(self._pool) >= screen_rows and all(len(items) >= screen_columns for items in self._pool)
+        self._ensure_pool(screen_rows, screen_columns)
+
+        theme = customtkinter.ThemeManager.theme
+        colors = {
+            "cell": self._apply_appearance_mode(theme["CTkEntry"]["fg_color"]),
+            "header": self._apply_appearance_mode(theme["CTkFrame"]["top_fg_color"]),
+            "border": self._apply_appearance_mode(theme["CTkEntry"]["border_color"]),
+            "text": self._apply_appearance_mode(theme["CTkEntry"]["text_color"]),
+        }
+        first_column, shift = divmod(self.x_offset, self.column_width)
+        for screen_row, items in enumerate(self._pool):
+            row = -1 if screen_row == 0 else self.first_row + screen_row - 1
+            shown = screen_row < screen_rows and row < row_count
+            for screen_column, (rect, text) in enumerate(items):
+                column = first_column + screen_column
+                if partial and not ((from_row is not None and row >= from_row)
+                                    or (from_column is not None and column >= from_column)):
+                    continue
+                if not shown or screen_column >= screen_columns or column >= len(columns):
+                    self.canvas.itemconfigure(rect, state="hidden")
+                    self.canvas.itemconfigure(text, state="hidden")
+                    continue
+                x = screen_column * self.column_width - shift
+                y = screen_row * self.row_height
+                self.canvas.coords(rect, x, y, x + self.column_width, y + self.row_height)
+                self.canvas.coords(text, x + 5, y + self.row_height / 2)
+                color = self.cell_color(row, column) if self.cell_color else None
+                self.canvas.itemconfigure(rect, state="normal", outline=colors["border"],
+                                          fill=colors["header" if row < 0 else "cell"])
+                self.canvas.itemconfigure(text, state="normal", text=self._clip(self.cell_text(row, column)),
+                                          fill=self._apply_appearance_mode(color) if color else colors["text"])
+        self._update_scrollbars(row_count, visible_rows, len(columns) * self.column_width, width)
+        if self.editing is not None:
+            self._place_entry()
+
+    def _update_scrollbars(self, row_count, visible_rows, total_width, width):
+        if row_count > visible_rows:
+            self.vsb.set(self.first_row / row_count, (self.first_row + visible_rows) / row_count)
+        else:
+            self.vsb.set(0, 1)
+        if total_width > width > 0:
+            self.hsb.set(self.x_offset / total_width, (self.x_offset + width) / total_width)
+        else:
+            self.hsb.set(0, 1)
+
+    def refresh(self):
+        self.redraw()
+
+    def reset(self):
+        # The data source was replaced: drop the editor and scroll back to the top left.
+        self.end_edit(commit=False)
+        self.first_row = 0
+        self.x_offset = 0
+        self.redraw()
+
+    # --- patches --------------------------------------------------------------
+    # Called after the data source changed; only the cells that moved or
+    # changed are drawn again, and an open editor follows its cell.
+
+    def rows_inserted(self, row, count=1):
+        if self.editing is not None and self.editing[0] >= row:
+            self.editing = (self.editing[0] + count, self.editing[1])
+        self.redraw(from_row=row)
+
+    def rows_removed(self, row, count=1):
+        if self.editing is not None and self.editing[0] >= row:
+            if self.editing[0] < row + count:
+                self.end_edit(commit=False)
+            else:
+                self.editing = (self.editing[0] - count, self.editing[1])
+        self.redraw(from_row=row)
+
+    def columns_inserted(self, column, count=1):
+        if self.editing is not None and self.editing[1] >= column:
+            self.editing = (self.editing[0], self.editing[1] + count)
+        self.redraw(from_column=column)
+
+    def columns_removed(self, column, count=1):
+        if self.editing is not None and self.editing[1] >= column:
+            if self.editing[1] < column + count:
+                self.end_edit(commit=False)
+            else:
+                self.editing = (self.editing[0], self.editing[1] - count)
+        self.redraw(from_column=column)
+
+    # --- scrolling ----------------------------------------------------------
+
+    def scroll_rows(self, count):
+        self.end_edit()
+        self.first_row += count
+        self.redraw()
+
+    def scroll_x(self, columns):
+        self.end_edit()
+        self.x_offset += columns * self.column_width
+        self.redraw()
+
+    def scroll_to(self, row):
+        visible_rows = max(1, self._visible_rows())
+        first_row = self.first_row
+        if row < self.first_row:
+            self.first_row = row
+        elif row >= self.first_row + visible_rows:
+            self.first_row = row - visible_rows + 1
+        if self.first_row != first_row:
+            self.redraw()
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.end_edit()
+            self.first_row = int(float(args[1]) * self.row_count())
+            self.redraw()
+        elif args[0] == "scroll":
+            step = max(1, self._visible_rows()) if args[2] == "pages" else 1
+            self.scroll_rows(int(args[1]) * step)
+
+    def xview(self, *args):
+        if args[0] == "moveto":
+            self.end_edit()
+            self.x_offset = int(float(args[1]) * len(self.columns()) * self.column_width)
+            self.redraw()
+        elif args[0] == "scroll":
+            self.scroll_x(int(args[1]))
+
+    # --- editing ------------------------------------------------------------
+
+    def _on_click(self, event):
+        self.end_edit()
+        cell = self._cell_at(event.x, event.y)
+        if cell is not None and not self.read_only:
+            self._pending_click = self.after(self.CLICK_DELAY, lambda: self.begin_edit(*cell))
+
+    def _on_double_click(self, event):
+        if self._pending_click is not None:
+            self.after_cancel(self._pending_click)
+            self._pending_click = None
+        cell = self._cell_at(event.x, event.y)
+        if cell is None or self.read_only:
+            return
+        row, column = cell
+        if row < 0 and self.on_header_double_click:
+            self.on_header_double_click(column)
+        elif row >= 0 and self.on_row_double_click:
+            self.on_row_double_click(row)
+
+    def _place_entry(self):
+        row, column = self.editing
+        x, y = self._cell_origin(row, column)
+        if row >= 0 and not self.first_row <= row < self.first_row + self._visible_rows():
+            self.entry.place_forget()
+            return
+        self.entry.place(x=x, y=y)
+
+    def begin_edit(self, row, column):
+        self._pending_click = None
+        self.end_edit()
+        if row >= 0:
+            self.scroll_to(row)
+        self.editing = (row, column)
+        self._edit_original = self.edit_text(row, column)
+        self.entry.configure(width=self.column_width, height=self.row_height)
+        self.entry.delete(0, "end")
+        self.entry.insert(0, self._edit_original)
+        self._place_entry()
+        self.entry.focus_set()
+        self.entry.select_range(0, "end")
+
+    def end_edit(self, commit=True):
+        if self.editing is None:
+            return
+        row, column = self.editing
+        text = self.entry.get()
+        self.editing = None  # before place_forget: losing focus calls end_edit again
+        self.entry.place_forget()
+        if commit and text != self._edit_original and self.on_edit:
+            self.on_edit(row, column, text)
+        self.redraw()
+
+    def _move_edit(self, rows, columns):
+        if self.editing is None:
+            return "break"
+        row, column = self.editing
+        self.end_edit()
+        row, column = row + rows, column + columns
+        if column >= len(self.columns()):
+            row, column = row + 1, 0
+        if row < self.row_count():
+            self.begin_edit(row, column)
+        return "break"
@@ -0,0 +1,51 @@
+from src.commands import evaluate_cell_reference, execute_command
+from src.pyufodb import Relative_DB
+
+
+def _db():
+    db = Relative_DB()
+    db.create_table("t", ["a", "b"], {"a": "int"})
+    db.insert_many("t", [[i, f"{i * 10}"] for i in range(1, 7)])
+    db.delete_record("t", 2)
+    db.delete_record("t", 4)
+    return db
+
+
+def test_row_numbers_skip_deleted_rows_without_compacting():
+    db = _db()
+    table = db.tables["t"]
+    assert execute_command("={0}a + {1}a", table) == 1 + 3
+    assert execute_command("={1:2}a * {1:2}b", table) == [3 * 30, 5 * 50]
+    assert evaluate_cell_reference("{*}a", table) == [1, 3, 5, 6]
+    assert execute_command("={3}id", table) == 6
+    assert table._dead == 2
+
+
+def test_assignment_writes_live_rows_only():
+    db = _db()
+    table = db.tables["t"]
+    assert execute_command("c = {*}a * {*}a", table, db) == 4
+    assert execute_command("d = {0}a", table, db) == 4
+    assert [(row.get_value("c"), row.get_value("d")) for row in table.records] == [(1, 1), (9, 1), (25, 1), (36, 1)]
+    assert table._dead == 2
+
+
+def test_formula_cells_follow_live_row_numbers():
+    db = _db()
+    db.set_formula("t", 6, "b", "={1}a * {2}a")
+    assert db.tables["t"].get_record(6).get_field("b") == "15"
+    db.update("t", 3, {"a": "4"})
+    assert db.recalculate("t", [(3, "a")]) == {(6, "b"): "20"}
+    assert db.tables["t"].get_record(6).get_field("b") == "20"
+    assert db.tables["t"]._dead == 2
+
+
+def test_aggregate_columns_resolve_like_cell_references():
+    db = Relative_DB()
+    db.create_table("t", ["Sum", "Total"], {"Sum": "int", "Total": "int"})
+    db.insert_many("t", [[1, 10], [2, 20]])
+    table = db.tables["t"]
+    assert execute_command("=SUM(total)", table) == 30
+    assert execute_command("=sum(sum)", table) == 3
+    assert execute_command("=MAX(1)", table) == 20
+    assert execute_command("=COUNT(DISTINCT SUM)", table) == 2
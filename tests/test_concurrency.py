@@ -0,0 +1,13 @@
+from src.concurrency import ConcurrentDB
+
+
+def test_reads_after_a_delete_leave_the_table_alone():
+    db = ConcurrentDB()
+    db.create_table("t", ["a"])
+    db.insert_many("t", [[f"v{i % 3}"] for i in range(30)])
+    db.delete_record("t", 1)
+    table = db.db.tables["t"]
+    assert len(db.select_where("t", "a", "v1")) == 10
+    assert db.query("SELECT COUNT(*) FROM t WHERE a = 'v0'").rows == [(9,)]
+    assert db.aggregate("t", ["COUNT(*)"]).rows == [(29,)]
+    assert table._dead == 1
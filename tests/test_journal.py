@@ -0,0 +1,56 @@
+from src.journal import Journal
+from src.pyufodb import Relative_DB
+
+
+def test_ops_without_commit_are_dropped_when_a_batch_follows(tmp_path):
+    journal = Journal(str(tmp_path / "db.ufo.journal"))
+    journal.append([{"op": "delete", "table": "t", "id": 1}], 1)
+    # A crash after whole operation lines but before the commit marker.
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "begin", "lsn": 2}\n{"op": "delete", "table": "t", "id": 2}\n')
+        f.write('{"op": "delete", "table": "t", "id": 3}\n')
+    journal.append([{"op": "delete", "table": "t", "id": 4}], 2)
+    assert journal.read() == [(1, [{"op": "delete", "table": "t", "id": 1}]),
+                              (2, [{"op": "delete", "table": "t", "id": 4}])]
+
+
+def test_uncommitted_ops_are_not_replayed(tmp_path):
+    path = str(tmp_path / "db.ufo")
+    db = Relative_DB()
+    db.create_table("t", ["a"])
+    db.insert_many("t", [["x"], ["y"], ["z"]])
+    db.save_to_file(path)
+    db.open_journal(path)
+    db.update("t", 1, {"a": "committed"})
+    db.flush()
+    with open(Journal.path_for(path), "a", encoding="utf-8") as f:
+        f.write('{"op": "begin", "lsn": 2}\n{"op": "delete", "table": "t", "id": 2}\n')
+
+    db = Relative_DB()
+    assert db.load_from_file(path)
+    db.open_journal(path)
+    db.update("t", 3, {"a": "later"})
+    db.flush()
+
+    db = Relative_DB()
+    assert db.load_from_file(path)
+    assert [row.get_field("a") for row in db.tables["t"].records] == ["committed", "y", "later"]
+
+
+def test_failed_insert_many_is_not_journaled(tmp_path):
+    path = str(tmp_path / "db.ufo")
+    db = Relative_DB()
+    db.create_table("t", ["a", "n"], {"n": "int"})
+    db.save_to_file(path)
+    db.open_journal(path)
+    db.tables["t"].INSERT_CHUNK = 2
+    try:
+        db.insert_many("t", [["x", "1"], ["y", "2"], ["z", "three"]])
+    except ValueError:
+        pass
+    db.insert_many("t", [["w", "4"]])
+    db.flush()
+
+    db = Relative_DB()
+    assert db.load_from_file(path)
+    assert [row.get_field("a") for row in db.tables["t"].records] == ["w"]
@@ -0,0 +1,26 @@
+import pytest
+
+from src import metrics
+from src.pyufodb import Relative_DB
+
+
+@pytest.fixture
+def enabled():
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_keyword_arguments_are_counted(enabled, tmp_path):
+    path = str(tmp_path / "db.ufo")
+    db = Relative_DB()
+    db.create_table("t", ["a"])
+    db.insert(table_name="t", record_data={"a": "x"})
+    assert db.save_to_file(filename=path)
+    assert Relative_DB().load_from_file(filename=path)
+    stats = {(entry["operation"], entry["table"]): entry for entry in metrics.snapshot()["operations"]}
+    assert stats[("Relative_DB.insert", "t")]["rows"] == 1
+    assert stats[("Relative_DB.save_to_file", "")]["bytes"] > 0
+    assert stats[("Relative_DB.load_from_file", "")]["rows"] == 1
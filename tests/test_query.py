@@ -0,0 +1,48 @@
+import pytest
+
+from src.aggregate import aggregate
+from src.pyufodb import Relative_DB
+from src.query import QueryError
+
+
+@pytest.fixture
+def db():
+    db = Relative_DB()
+    db.create_table("s", ["shape", "n"], {"n": "int"})
+    db.insert_many("s", [[f"sh{i % 5}", i] for i in range(1, 101)])
+    db.create_index("s", "shape")
+    return db
+
+
+def test_queries_skip_deleted_rows_without_compacting(db):
+    db.delete_record("s", 1)
+    db.delete_record("s", 6)
+    table = db.tables["s"]
+    assert table._dead == 2
+    assert [row[0] for row in db.query("SELECT id FROM s WHERE shape = 'sh1' ORDER BY id LIMIT 2")] == [11, 16]
+    assert len(db.query("SELECT * FROM s WHERE n < 11")) == 8
+    assert table._dead == 2
+
+
+def test_qualified_where_column_uses_the_index(db):
+    result = db.query("SELECT shape FROM s WHERE s.shape = 'sh1' AND s.n < 20")
+    assert len(result) == 4
+    assert "HashIndexLookup" in db.query("EXPLAIN SELECT shape FROM s WHERE s.shape = 'sh1'").plan
+    with pytest.raises(QueryError):
+        db.query("SELECT shape FROM s WHERE t.shape = 'sh1'")
+    with pytest.raises(QueryError):
+        db.query("SELECT shape FROM s WHERE missing = 'x'")
+
+
+@pytest.mark.parametrize("use_numpy", [False, None])
+def test_aggregates_skip_deleted_rows_without_compacting(db, use_numpy):
+    for record_id in (1, 6, 7):
+        db.delete_record("s", record_id)
+    table = db.tables["s"]
+    result = aggregate(table, ["COUNT(*)", "SUM(n)", "MIN(n)"], ["shape"], use_numpy=use_numpy)
+    rows = {row[0]: row[1:] for row in result.rows}
+    assert rows["sh1"] == (18, sum(range(11, 101, 5)), 11)
+    assert rows["sh2"] == (19, sum(range(2, 101, 5)) - 7, 2)
+    assert aggregate(table, ["COUNT(*)"], use_numpy=use_numpy).rows == [(97,)]
+    assert db.query("SELECT COUNT(*) FROM s WHERE shape = 'sh1'").rows == [(18,)]
+    assert table._dead == 3
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.client import UFOClient
+from src.pyufodb import Relative_DB
+from src.server import UFOServer
+
+
+@pytest.fixture
+def client(tmp_path):
+    db = Relative_DB()
+    db.create_table("t", ["name"])
+    db.insert_many("t", [[f"row{i}"] for i in range(1, 6)])
+    db.save_to_file(str(tmp_path / "db.ufo"))
+
+    started = threading.Event()
+    running = {}
+
+    async def serve():
+        running["loop"] = asyncio.get_running_loop()
+        running["task"] = asyncio.current_task()
+        await UFOServer(str(tmp_path)).serve(port=0, ready=lambda port: (running.update(port=port), started.set()))
+
+    def run():
+        try:
+            asyncio.run(serve())  # also cancels the connection handlers left behind
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    client = UFOClient("db", port=running["port"])
+    yield client
+    client.close()
+    running["loop"].call_soon_threadsafe(running["task"].cancel)
+    thread.join(10)
+
+
+def test_get_update_delete_address_the_requested_record(client):
+    # Request ids count up from 1 per connection; they must not stand in for the record.
+    client.count("t")
+    assert client.get("t", 4)["name"] == "row4"
+    client.update("t", 4, {"name": "changed"})
+    assert client.delete("t", 5)
+    assert client.select_where("t", "name", "changed") == [{"name": "changed", "id": "4"}]
+    assert client.get("t", 5) is None
+    assert [row["name"] for row in client.select_where("t", "name", "row1")] == ["row1"]
+    assert client.count("t") == 4
@@ -0,0 +1,50 @@
+import pytest
+
+from src.pyufodb import UFOTable, convert_value
+
+
+def _consistent(table):
+    assert all(len(table._column(col)) == len(table._ids) for col in table.columns)
+    assert len(table._index) == len(table._ids) - table._dead
+
+
+def test_int_outside_int64_is_rejected():
+    assert convert_value("int", str(2 ** 63 - 1)) == 2 ** 63 - 1
+    for value in (2 ** 63, str(-2 ** 63 - 1), 1e19):
+        with pytest.raises(ValueError):
+            convert_value("int", value)
+
+
+def test_failed_writes_change_nothing():
+    table = UFOTable("t", ["name", "n"], {"n": "int"})
+    table.insert_record({"name": "a", "n": "1"})
+    table.insert_record({"name": "b", "n": "2"})
+    with pytest.raises(ValueError):
+        table.insert_record({"name": "c", "n": 2 ** 64})
+    with pytest.raises(ValueError):
+        table.insert_record({"name": "c"}, record_id=2 ** 64)
+    with pytest.raises(ValueError):
+        table.update_record(1, {"name": "changed", "n": 2 ** 64})
+    with pytest.raises(RuntimeError):
+        table.update_record(1, {"name": "changed", "missing": "x"})
+    with pytest.raises(ValueError):
+        table.update_many({1: {"name": "changed"}, 2: {"n": 2 ** 64}})
+    _consistent(table)
+    assert len(table) == 2 and table.next_id == 3
+    assert table.get_record(1).fields == {"name": "a", "n": "1", "id": "1"}
+
+
+def test_insert_many_with_a_bad_row_inserts_nothing():
+    table = UFOTable("t", ["name", "n"], {"n": "int"})
+    table.create_index("n", "sorted")
+    table.create_index("name", "sorted")
+    table.INSERT_CHUNK = 10
+    rows = [[i, str(i)] for i in range(25)] + [["bad", "x"]]
+    with pytest.raises(ValueError):
+        table.insert_many(rows)
+    _consistent(table)
+    assert len(table) == 0 and table.next_id == 1
+    assert table.indexes["n"].entries == [] and table.indexes["name"].entries == []
+    # Non-text values in a text column are stored as text, as insert_record does.
+    assert table.insert_many(rows[:25]) == range(1, 26)
+    assert table.select_where("name", "7")[0].get_value("n") == 7